@@ -0,0 +1,110 @@
+"""
+Compare how many concurrent slow clients a WSGI and an ASGI deployment serve.
+
+Every client opens its own connection and uploads a session in small pieces
+with a pause between them, as a tablet on a weak network would, then waits
+for the classification. A synchronous worker is held for the whole upload;
+the async endpoints only take a pool thread once the body has arrived.
+
+Example, one process each:
+
+    cd licenta
+    gunicorn licenta.wsgi -w 1 --threads 8 -b 127.0.0.1:8001
+    uvicorn licenta.asgi:application --workers 1 --port 8002
+
+    python benchmark_async.py http://127.0.0.1:8001/api/predict/ \\
+                              http://127.0.0.1:8002/api/async/predict/ \\
+                              --clients 200 --chunks 20 --delay 0.05
+
+Only the standard library is needed on the client side.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from urllib.parse import urlsplit
+
+DEFAULT_DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sample_data.json')
+
+
+async def slow_request(url, body, chunks, delay, timeout):
+    """POST ``body`` in ``chunks`` pieces, ``delay`` seconds apart; return (status, seconds)."""
+    parts = urlsplit(url)
+    path = parts.path + ('?' + parts.query if parts.query else '')
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    try:
+        writer.write((
+            f"POST {path} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode())
+        step = max(1, -(-len(body) // chunks))
+        for start in range(0, len(body), step):
+            writer.write(body[start:start + step])
+            await writer.drain()
+            await asyncio.sleep(delay)
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        status = int(status_line.split()[1]) if status_line else None
+    finally:
+        writer.close()
+    return status, time.perf_counter() - started
+
+
+async def run(url, body, clients, chunks, delay, timeout):
+    async def one():
+        try:
+            return await slow_request(url, body, chunks, delay, timeout)
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+            return None, None
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies = sorted(seconds for status, seconds in results if status == 200)
+    return {
+        'url': url,
+        'ok': len(latencies),
+        'failed': clients - len(latencies),
+        'wall_seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': 1000 * statistics.median(latencies) if latencies else None,
+        'p95_ms': 1000 * latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+    }
+
+
+def print_report(report):
+    def ms(value):
+        return f"{value:8.0f}" if value is not None else "       -"
+    print(
+        f"{report['url']}\n"
+        f"  ok {report['ok']:5d}  failed {report['failed']:5d}  "
+        f"wall {report['wall_seconds']:6.2f}s  {report['requests_per_second']:7.1f} req/s  "
+        f"p50 {ms(report['p50_ms'])} ms  p95 {ms(report['p95_ms'])} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('urls', nargs='+', help="Prediction endpoints to compare, run one after another.")
+    parser.add_argument('--data-file', default=DEFAULT_DATA_FILE, help="Session JSON to upload.")
+    parser.add_argument('--clients', type=int, default=100, help="Concurrent connections.")
+    parser.add_argument('--chunks', type=int, default=20, help="Pieces each body is sent in.")
+    parser.add_argument('--delay', type=float, default=0.05, help="Seconds between pieces.")
+    parser.add_argument('--timeout', type=float, default=120.0, help="Seconds to wait for a response.")
+    args = parser.parse_args()
+
+    with open(args.data_file) as fh:
+        body = json.dumps(json.load(fh)).encode()
+    print(f"{args.clients} clients, {len(body)} byte body in {args.chunks} chunks, {args.delay}s apart")
+    for url in args.urls:
+        print_report(asyncio.run(run(url, body, args.clients, args.chunks, args.delay, args.timeout)))
+
+
+if __name__ == "__main__":
+    main()
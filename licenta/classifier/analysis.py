@@ -0,0 +1,168 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .charts import minmax_indices
+
+# Bump when the computation changes, so cached results are not reused.
+ANALYSIS_VERSION = 1
+KEY_PREFIX = 'classifier:analysis:'
+DEFAULT_TIMEOUT = 24 * 60 * 60
+DEFAULT_MAX_RATE = 120.0
+MIN_SAMPLES = 32
+# Band searched for the repetition frequency, in Hz.
+MIN_FREQUENCY = 0.2
+MAX_FREQUENCY = 10.0
+SPECTRUM_WIDTH = 300
+# Unity axes of HeadPosition: x lateral, y vertical, z forward/backward.
+DIRECTIONS = {'x': 'Lateral', 'y': 'Vertical', 'z': 'Anteroposterior'}
+
+
+def analysis_settings():
+    config = getattr(settings, 'CLASSIFIER_ANALYSIS', {})
+    return {
+        'CACHE': config.get('CACHE', 'default'),
+        'TIMEOUT': config.get('TIMEOUT', DEFAULT_TIMEOUT),
+        'MAX_RATE': config.get('MAX_RATE', DEFAULT_MAX_RATE),
+    }
+
+
+class AnalysisError(ValueError):
+    """The session cannot be analysed (too few timed samples)."""
+
+
+def sample_times(timestamps):
+    """Seconds since the first sample, for sorted datetime64 timestamps.
+
+    Recordings often stamp dateTime with a coarser resolution than the frame
+    rate, so runs of samples share a value. Those samples are spread evenly
+    up to the next distinct stamp; the last run gets the session's average
+    spacing. With one sample per stamp this returns the stamps unchanged.
+    """
+    seconds = (timestamps - timestamps[0]) / np.timedelta64(1, 'ms') / 1000.0
+    n = len(seconds)
+    starts = np.flatnonzero(np.r_[True, np.diff(seconds) > 0])
+    if len(starts) < 2:
+        raise AnalysisError("The session needs at least two distinct dateTime values.")
+    spacing = (seconds[starts[-1]] - seconds[0]) / starts[-1]
+    anchors = np.r_[starts, n]
+    times = np.r_[seconds[starts], seconds[starts[-1]] + (n - starts[-1]) * spacing]
+    return np.interp(np.arange(n), anchors, times)
+
+
+def resample(times, values, max_rate=DEFAULT_MAX_RATE):
+    """Linearly interpolate (N, k) ``values`` at ``times`` onto a uniform grid.
+
+    The rate is the session's average sampling rate (robust to the jitter
+    of millisecond stamps), capped at ``max_rate``. Returns
+    ``(rate, uniform values)``.
+    """
+    rate = min((len(times) - 1) / times[-1], max_rate)
+    grid = np.arange(0.0, times[-1], 1.0 / rate)
+    uniform = np.empty((len(grid), values.shape[1]))
+    for k in range(values.shape[1]):
+        uniform[:, k] = np.interp(grid, times, values[:, k])
+    return rate, uniform
+
+
+def dominant_frequency(uniform, rate):
+    """Strongest repetition in MIN_FREQUENCY..MAX_FREQUENCY Hz over all columns.
+
+    Each column is standardised and Hann-windowed, so position and
+    orientation contribute equally; their power spectra are summed.
+    Returns ``(frequency, share of band power in the peak bin, freqs, power)``.
+    """
+    centred = uniform - uniform.mean(axis=0)
+    scale = centred.std(axis=0)
+    centred = centred[:, scale > 0] / scale[scale > 0]
+    freqs = np.fft.rfftfreq(len(centred), d=1.0 / rate)
+    band = (freqs >= MIN_FREQUENCY) & (freqs <= min(MAX_FREQUENCY, rate / 2))
+    if not centred.shape[1] or not band.any():
+        return None, 0.0, freqs[band], np.zeros(band.sum())
+    window = np.hanning(len(centred))[:, None]
+    power = (np.abs(np.fft.rfft(centred * window, axis=0)) ** 2).sum(axis=1)[band]
+    peak = int(np.argmax(power))
+    total = power.sum()
+    return float(freqs[band][peak]), float(power[peak] / total) if total else 0.0, freqs[band], power
+
+
+def directional_bias(positions, rate):
+    """Share of head-velocity energy along each axis and the dominant one."""
+    velocity = np.diff(positions, axis=0) * rate
+    energy = (velocity ** 2).sum(axis=0)
+    total = energy.sum()
+    shares = energy / total if total else np.zeros(3)
+    axis = 'xyz'[int(np.argmax(shares))]
+    return {
+        'direction': DIRECTIONS[axis] if total else None,
+        'shares': {a: float(s) for a, s in zip('xyz', shares)},
+        'mean_speed': float(np.linalg.norm(velocity, axis=1).mean()),
+    }
+
+
+def analyse_session(arrays, max_rate=None):
+    """Movement analysis of a storage.SessionArrays.
+
+    Samples with a parseable dateTime and both HeadPosition and HeadForward
+    are put in time order, resampled to a uniform rate and measured:
+    dominant repetition frequency (FFT), amplitude variance of the head
+    position, and directional bias of the head velocity. Raises
+    AnalysisError when there is not enough timed data.
+    """
+    max_rate = max_rate or analysis_settings()['MAX_RATE']
+    rows = np.flatnonzero(arrays.valid('HeadPosition', 'HeadForward') & ~np.isnat(arrays.timestamps))
+    if len(rows) < 2:
+        raise AnalysisError("The session has too few timed head samples.")
+    rows = rows[np.argsort(arrays.timestamps[rows], kind='stable')]
+    values = np.hstack([arrays.stream('HeadPosition')[rows], arrays.stream('HeadForward')[rows]])
+    times = sample_times(arrays.timestamps[rows])
+    rate, uniform = resample(times, values, max_rate)
+    if len(uniform) < MIN_SAMPLES:
+        raise AnalysisError(f"The session is too short to analyse ({len(uniform)} resampled points).")
+
+    frequency, peak_share, freqs, power = dominant_frequency(uniform, rate)
+    positions = uniform[:, :3]
+    variance = positions.var(axis=0)
+    keep = minmax_indices(power, SPECTRUM_WIDTH) if len(power) else np.arange(0)
+    return {
+        'version': ANALYSIS_VERSION,
+        'samples': int(len(rows)),
+        'duration_seconds': float(times[-1]),
+        'sampling_rate': float(rate),
+        'resampled_points': int(len(uniform)),
+        'repetition_frequency': frequency,
+        'periodicity': peak_share,
+        'amplitude_variance': {
+            'total': float(variance.sum()),
+            **{a: float(v) for a, v in zip('xyz', variance)},
+        },
+        'directional_bias': directional_bias(positions, rate),
+        'spectrum': {
+            'frequency': freqs[keep].tolist(),
+            'power': power[keep].tolist(),
+        },
+    }
+
+
+def cached_analysis(reference, load_arrays):
+    """analyse_session for the stored session ``reference`` (see views._set_explore_payload).
+
+    References name immutable content (a content hash or a history row), so
+    the result is cached under the reference and the analysis settings it
+    depends on, and ``load_arrays`` is only called on a miss. Failures are cached too, as ``{'error': message}``.
+    """
+    config = analysis_settings()
+    cache = caches[config['CACHE']]
+    max_rate = config['MAX_RATE']
+    key = f"{KEY_PREFIX}{ANALYSIS_VERSION}:{max_rate:g}:{reference}"
+    result = cache.get(key)
+    if result is None:
+        arrays = load_arrays()
+        if arrays is None:
+            return None
+        try:
+            result = analyse_session(arrays, max_rate)
+        except AnalysisError as e:
+            result = {'error': str(e)}
+        cache.set(key, result, config['TIMEOUT'])
+    return result
@@ -1,68 +1,65 @@
 import json
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from joblib import load
-import os
 import numpy as np
-from .models import calculate_statistics
+from .batching import batching_metrics, get_batcher
+from .cache import model_scope, result_cache
+from .features import BlockSession, DEFAULT_FEATURE_SET, extract, load_block
+from .inference import cascade, predict_with_confidence, result_records
+from .live import LiveStream, live_settings, StreamBusy
+from .registry import registry
+from .streaming import iter_json_array, stream_statistics
 
-# Loading the models
-model_path = os.path.join(os.path.dirname(__file__), 'classifier_model.joblib')
-try:
-    model = load(model_path)
-except FileNotFoundError:
-    model = None
+def _score(model_name, model, features):
+    # Coalesced with concurrent requests when micro-batching is enabled.
+    batcher = get_batcher(model_name)
+    if batcher is not None:
+        return batcher.predict(features)
+    return predict_with_confidence(model, features)
 
-extra_model_path = os.path.join(os.path.dirname(__file__), 'classifier_model_extra.pkl')
-try:
-    extra_model = load(extra_model_path)
-except FileNotFoundError:
-    extra_model = None
+def _merge_feature_sets(*feature_sets):
+    merged = []
+    for feature_set in feature_sets:
+        merged.extend(name for name in feature_set if name not in merged)
+    return tuple(merged)
+
+def _read_session(request, feature_set):
+    """The posted session, with ``count``, ``digest`` and ``features()``.
+
+    The default features are computed while streaming the body; other
+    feature sets need every sample, so the body is decoded at once.
+    """
+    if feature_set == DEFAULT_FEATURE_SET:
+        return stream_statistics(request)
+    return BlockSession(load_block(json.loads(request.body), feature_set), feature_set)
+
+def _score_session(model_name, model, session):
+    """Cached features and prediction for one streamed session."""
+    def compute():
+        features = session.features().reshape(1, -1)
+        return result_records(features, *_score(model_name, model, features))[0]
+    return result_cache.lookup(model_scope(model_name), session.digest, compute)
 
 @csrf_exempt
 def predict_api(request):
     if request.method == "POST":
         try:
-            data = json.loads(request.body)
-            
-            raw_head_positions = []
-            processed_positions = [] 
+            session = _read_session(request, registry.feature_set('standard'))
             
-            for entry in data:
-                try:
-                    pos = entry['HeadPosition']
-                    forw = entry['HeadForward']
-                    
-                    poz_ml = [float(pos['x']), float(pos['y']), float(pos['z'])]
-                    forz_ml = [float(forw['x']), float(forw['y']), float(forw['z'])]
-                    processed_positions.append(poz_ml + forz_ml)
-                    
-                    raw_head_positions.append({'x': float(pos['x']), 'y': float(pos['y']), 'z': float(pos['z'])})
-                except (KeyError, ValueError) as e:
-                    continue
-            
-            if not processed_positions:
+            if not session.count:
                 return JsonResponse({"error": "No valid position data found in the request for classification"}, status=400)
-                
-            if not raw_head_positions:
-                return JsonResponse({"error": "No valid head position data found"}, status=400)
 
-            processed_positions_np = np.array(processed_positions)
-            features = calculate_statistics(processed_positions_np).reshape(1, -1)
-            
+            model = registry.predictor('standard')
             if model is None:
                 return JsonResponse({"error": "Model not loaded. Please check the server configuration."}, status=500)
             
-            prediction = model.predict(features)
-            prediction_proba = model.predict_proba(features)[0]
-            prediction_label = "Atypical" if prediction[0] == 1 else "Typical"
-            
-            confidence = prediction_proba[1] if prediction[0] == 1 else prediction_proba[0]
-            confidence_percentage = round(confidence * 100, 1)
+            result = _score_session('standard', model, session)
+            prediction_label = "Atypical" if result["prediction"] == 1 else "Typical"
+            confidence_percentage = result["confidence"]
             return JsonResponse({
                 "status": "success",
                 "model_type": "standard",
-                "prediction": int(prediction[0]),
+                "prediction": result["prediction"],
                 "prediction_label": prediction_label,
                 "confidence": confidence_percentage
             })
@@ -78,48 +75,23 @@ def predict_api(request):
 def predict_extra_api(request):
     if request.method == "POST":
         try:
-            data = json.loads(request.body)
-            
-            raw_head_positions = []
-            processed_positions = [] 
-            
-            for entry in data:
-                try:
-                    pos = entry['HeadPosition']
-                    forw = entry['HeadForward']
-                    
-                    poz_ml = [float(pos['x']), float(pos['y']), float(pos['z'])]
-                    forz_ml = [float(forw['x']), float(forw['y']), float(forw['z'])]
-                    processed_positions.append(poz_ml + forz_ml)
-                    
-
-                    raw_head_positions.append({'x': float(pos['x']), 'y': float(pos['y']), 'z': float(pos['z'])})
-                except (KeyError, ValueError) as e:
-                    continue
+            session = _read_session(request, registry.feature_set('extra'))
             
-            if not processed_positions:
+            if not session.count:
                 return JsonResponse({"error": "No valid position data found in the request for classification"}, status=400)
-                
-            if not raw_head_positions:
-                return JsonResponse({"error": "No valid head position data found"}, status=400)
-            
-            processed_positions_np = np.array(processed_positions)
-            features = calculate_statistics(processed_positions_np).reshape(1, -1)
-            
+
+            extra_model = registry.predictor('extra')
             if extra_model is None:
                 return JsonResponse({"error": "Extra model not loaded. Please check the server configuration."}, status=500)
             
-            prediction = extra_model.predict(features)
-            prediction_proba = extra_model.predict_proba(features)[0]
-            prediction_label = "Autism" if prediction[0] == 1 else "Non-Autism"
-            
-            confidence = prediction_proba[1] if prediction[0] == 1 else prediction_proba[0]
-            confidence_percentage = round(confidence * 100, 1)
+            result = _score_session('extra', extra_model, session)
+            prediction_label = "Autism" if result["prediction"] == 1 else "Non-Autism"
+            confidence_percentage = result["confidence"]
             
             return JsonResponse({
                 "status": "success",
                 "model_type": "extra",
-                "prediction": int(prediction[0]),
+                "prediction": result["prediction"],
                 "prediction_label": prediction_label,
                 "confidence": confidence_percentage
             })
@@ -130,3 +102,285 @@ def predict_extra_api(request):
             return JsonResponse({"error": f"Error processing request: {str(e)}"}, status=500)
     else:
         return JsonResponse({"error": "Only POST requests are accepted"}, status=405)
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+MODEL_LABELS = {
+    'standard': ('Typical', 'Atypical'),
+    'extra': ('Non-Autism', 'Autism'),
+}
+BATCH_MODELS = ('standard', 'extra', 'cascade')
+
+def _prediction_fields(model_type, prediction, confidence):
+    return {
+        "prediction": int(prediction),
+        "prediction_label": MODEL_LABELS[model_type][int(prediction)],
+        "confidence": confidence,
+    }
+
+def _secondary_fields(secondary):
+    # None for sessions the primary model did not flag as Atypical.
+    return _prediction_fields('extra', *secondary) if secondary is not None else None
+
+def _cascade_models():
+    # Without the extra model the cascade still answers, with no secondary
+    # result; only a missing primary model is an error.
+    return registry.predictor('standard'), registry.predictor('extra')
+
+def _iter_batch_items(request):
+    """Yield (item, error) for each session in a JSON array or NDJSON body."""
+    if request.content_type in NDJSON_CONTENT_TYPES:
+        for line in request:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line), None
+            except json.JSONDecodeError:
+                yield None, "Invalid JSON line"
+    else:
+        for item in iter_json_array(request):
+            yield item, None
+
+def _fill_batch_result(result, model_type, record):
+    result["status"] = "success"
+    if model_type == 'cascade':
+        result.update(_prediction_fields('standard', record["prediction"], record["confidence"]))
+        result["secondary"] = _secondary_fields(record["secondary"])
+    else:
+        result.update(_prediction_fields(model_type, record["prediction"], record["confidence"]))
+
+@csrf_exempt
+def predict_batch_api(request):
+    """Score many sessions with one predict_proba call.
+
+    The body is a JSON array (or NDJSON, one session per line) whose items are
+    either a list of samples or an object {"id": ..., "samples": [...]}.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST requests are accepted"}, status=405)
+
+    model_type = request.GET.get('model', 'standard')
+    if model_type not in BATCH_MODELS:
+        return JsonResponse({"error": f"Unknown model '{model_type}'. Use one of: {', '.join(BATCH_MODELS)}"}, status=400)
+    if model_type == 'cascade':
+        primary, secondary = _cascade_models()
+        batch_model = primary
+    else:
+        batch_model = registry.predictor(model_type)
+    if batch_model is None:
+        return JsonResponse({"error": "Model not loaded. Please check the server configuration."}, status=500)
+
+    scope = model_scope('standard', 'extra') if model_type == 'cascade' else model_scope(model_type)
+    if model_type == 'cascade':
+        feature_set = registry.feature_set('standard')
+        secondary_set = registry.feature_set('extra')
+    else:
+        feature_set = secondary_set = registry.feature_set(model_type)
+    needed = _merge_feature_sets(feature_set, secondary_set)
+    results = []
+    feature_rows = []
+    secondary_rows = []
+    scored = []
+    try:
+        for index, (item, error) in enumerate(_iter_batch_items(request)):
+            result = {"index": index}
+            if isinstance(item, dict):
+                result["id"] = item.get('id')
+                item = item.get('samples')
+            results.append(result)
+            if error is None:
+                try:
+                    block = load_block(item, needed)
+                except ValueError as e:
+                    error = str(e)
+                else:
+                    if not block.count:
+                        error = "No valid position data found for classification"
+            if error is not None:
+                result.update({"status": "error", "error": error})
+                continue
+            digest = block.digest(needed)
+            cached = result_cache.get(scope, digest)
+            if cached is not None:
+                _fill_batch_result(result, model_type, cached)
+                continue
+            feature_rows.append(extract(block, feature_set))
+            if secondary_set != feature_set:
+                secondary_rows.append(extract(block, secondary_set))
+            scored.append((result, digest))
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format"}, status=400)
+
+    if feature_rows:
+        features = np.vstack(feature_rows)
+        try:
+            if model_type == 'cascade':
+                secondary_features = np.vstack(secondary_rows) if secondary_rows else None
+                records = result_records(features, *cascade(primary, secondary, features, secondary_features))
+            else:
+                records = result_records(features, *predict_with_confidence(batch_model, features))
+        except Exception as e:
+            return JsonResponse({"error": f"Error processing request: {str(e)}"}, status=500)
+        for (result, digest), record in zip(scored, records):
+            result_cache.set(scope, digest, record)
+            _fill_batch_result(result, model_type, record)
+
+    return JsonResponse({
+        "status": "success",
+        "model_type": model_type,
+        "count": len(results),
+        "results": results,
+    })
+
+@csrf_exempt
+def predict_cascade_api(request):
+    """Standard classification plus, for Atypical sessions, the disability-type
+    classification, from one parse of the body and one feature computation."""
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST requests are accepted"}, status=405)
+    try:
+        feature_set = registry.feature_set('standard')
+        secondary_set = registry.feature_set('extra')
+        session = _read_session(request, _merge_feature_sets(feature_set, secondary_set))
+
+        if not session.count:
+            return JsonResponse({"error": "No valid position data found in the request for classification"}, status=400)
+
+        primary, secondary = _cascade_models()
+        if primary is None:
+            return JsonResponse({"error": "Model not loaded. Please check the server configuration."}, status=500)
+
+        def compute():
+            if feature_set == secondary_set:
+                features = session.features().reshape(1, -1)
+                return result_records(features, *cascade(primary, secondary, features))[0]
+            features = session.features(feature_set).reshape(1, -1)
+            secondary_features = session.features(secondary_set).reshape(1, -1)
+            return result_records(features, *cascade(primary, secondary, features, secondary_features))[0]
+        record = result_cache.lookup(model_scope('standard', 'extra'), session.digest, compute)
+        return JsonResponse({
+            "status": "success",
+            "model_type": "cascade",
+            **_prediction_fields('standard', record["prediction"], record["confidence"]),
+            "secondary": _secondary_fields(record["secondary"]),
+        })
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format"}, status=400)
+    except Exception as e:
+        return JsonResponse({"error": f"Error processing request: {str(e)}"}, status=500)
+
+def _estimate(model_type, features):
+    """Prediction fields for one feature row, from one model or the cascade."""
+    features = np.asarray(features, dtype=np.float64).reshape(1, -1)
+    if model_type == 'cascade':
+        primary, secondary = _cascade_models()
+        if primary is None:
+            raise RuntimeError("Model not loaded. Please check the server configuration.")
+        predictions, confidences, secondaries = cascade(primary, secondary, features)
+        return {
+            **_prediction_fields('standard', predictions[0], confidences[0]),
+            "secondary": _secondary_fields(secondaries[0]),
+        }
+    model = registry.predictor(model_type)
+    if model is None:
+        raise RuntimeError("Model not loaded. Please check the server configuration.")
+    predictions, confidences = _score(model_type, model, features)
+    return _prediction_fields(model_type, predictions[0], confidences[0])
+
+@csrf_exempt
+def live_start_api(request):
+    """Open a live stream; samples are then POSTed in chunks to api/live/<stream_id>/."""
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST requests are accepted"}, status=405)
+    model_type = request.GET.get('model', 'standard')
+    if model_type not in BATCH_MODELS:
+        return JsonResponse({"error": f"Unknown model '{model_type}'. Use one of: {', '.join(BATCH_MODELS)}"}, status=400)
+    names = ('standard', 'extra') if model_type == 'cascade' else (model_type,)
+    if any(registry.feature_set(name) != DEFAULT_FEATURE_SET for name in names):
+        # Live estimates come from running statistics of the head columns.
+        return JsonResponse({"error": f"Model '{model_type}' uses features that live streams do not compute"}, status=400)
+    stream = LiveStream.create(model_type)
+    config = live_settings()
+    return JsonResponse({
+        "status": "success",
+        **stream.as_dict(),
+        "emit_every": config['EMIT_EVERY'],
+        "emit_interval": config['EMIT_INTERVAL'],
+    }, status=201)
+
+@csrf_exempt
+def live_stream_api(request, stream_id):
+    """POST a JSON array of new samples, GET the latest estimate, DELETE to close.
+
+    POST accepts ``?seq=<n>`` and ``?final=1`` (emit an estimate for whatever
+    has not been scored yet). Chunks are numbered 0, 1, 2, ...: a chunk whose
+    seq was already applied is acknowledged as a duplicate and not counted
+    again, so retries are safe, and a chunk past the next expected seq is
+    refused with 409 and ``expected_seq`` so the client can resend the gap.
+    """
+    stream = LiveStream.load(stream_id)
+    if stream is None:
+        return JsonResponse({"error": "Unknown or expired stream"}, status=404)
+    if request.method == "GET":
+        return JsonResponse({"status": "success", **stream.as_dict()})
+    if request.method == "DELETE":
+        stream.delete()
+        return JsonResponse({"status": "success", **stream.as_dict()})
+    if request.method != "POST":
+        return JsonResponse({"error": "Only GET, POST and DELETE requests are accepted"}, status=405)
+
+    try:
+        seq = int(request.GET['seq']) if 'seq' in request.GET else None
+    except ValueError:
+        return JsonResponse({"error": "seq must be an integer"}, status=400)
+
+    try:
+        # Parsed before taking the lock, which then only covers the merge.
+        chunk = stream_statistics(request)
+        with LiveStream.locked(stream_id):
+            stream = LiveStream.load(stream_id)
+            if stream is None:
+                return JsonResponse({"error": "Unknown or expired stream"}, status=404)
+            if seq is not None and seq < stream.expected_seq:
+                return JsonResponse({"status": "success", "duplicate": True, "emitted": False, **stream.as_dict()})
+            if seq is not None and seq > stream.expected_seq:
+                return JsonResponse({
+                    "error": f"Chunk {seq} is out of order; send chunk {stream.expected_seq} first",
+                    **stream.as_dict(),
+                }, status=409)
+            stream.add(chunk)
+            stream.seq = seq if seq is not None else stream.seq
+            emitted = False
+            if stream.due() or (request.GET.get('final') == '1' and stream.count > stream.emitted_count):
+                stream.emit(_estimate(stream.model_type, stream.stats.features()))
+                emitted = True
+            stream.save()
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON format"}, status=400)
+    except StreamBusy:
+        return JsonResponse({"error": "The stream is being updated by another request, retry"}, status=503)
+    except Exception as e:
+        return JsonResponse({"error": f"Error processing request: {str(e)}"}, status=500)
+    return JsonResponse({"status": "success", "duplicate": False, "emitted": emitted, **stream.as_dict()})
+
+def model_status_api(request):
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Staff access required"}, status=403)
+    return JsonResponse({
+        "status": "success",
+        "models": registry.status(),
+        "batching": batching_metrics(),
+        "result_cache": result_cache.stats(),
+    })
+
+def model_reload_api(request):
+    """Reload one model (POST model=<name>) or all of them, in every worker."""
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Staff access required"}, status=403)
+    if request.method != "POST":
+        return JsonResponse({"error": "Only POST requests are accepted"}, status=405)
+    name = request.POST.get('model') or None
+    if name is not None and name not in registry.names():
+        return JsonResponse({"error": f"Unknown model '{name}'"}, status=400)
+    entries = registry.touch(name)
+    return JsonResponse({"status": "success", "models": {e.name: e.as_dict() for e in entries}})
@@ -0,0 +1,87 @@
+import asyncio
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, JsonResponse, QueryDict
+from django.views.decorators.csrf import csrf_exempt
+
+from . import api
+from .pools import django_process_pool
+
+DEFAULT_MAX_WORKERS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor_settings():
+    config = getattr(settings, 'CLASSIFIER_ASYNC_EXECUTOR', {})
+    return {
+        'KIND': config.get('KIND', 'thread'),
+        'MAX_WORKERS': config.get('MAX_WORKERS', DEFAULT_MAX_WORKERS),
+    }
+
+
+def get_executor():
+    """The shared pool that runs parsing, features and scoring off the event loop."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                config = executor_settings()
+                if config['KIND'] == 'process':
+                    _executor = django_process_pool(config['MAX_WORKERS'])
+                elif config['KIND'] == 'thread':
+                    _executor = ThreadPoolExecutor(
+                        max_workers=config['MAX_WORKERS'], thread_name_prefix='classifier-async'
+                    )
+                else:
+                    raise ValueError(f"Unknown CLASSIFIER_ASYNC_EXECUTOR kind '{config['KIND']}'")
+    return _executor
+
+
+def _run_view(view_name, body, content_type, query_string):
+    """Call a synchronous api view on a detached request, inside a pool worker.
+
+    Returns plain values so the result can come back from another process.
+    """
+    request = HttpRequest()
+    request.method = 'POST'
+    request.content_type = content_type
+    request.META['CONTENT_TYPE'] = content_type
+    request.META['CONTENT_LENGTH'] = str(len(body))
+    request.GET = QueryDict(query_string)
+    request._stream = io.BytesIO(body)
+    response = getattr(api, view_name)(request)
+    return response.status_code, response.content, response['Content-Type']
+
+
+def _offload(view_name):
+    view = getattr(api, view_name)
+
+    @csrf_exempt
+    async def async_view(request):
+        if request.method != "POST":
+            return JsonResponse({"error": "Only POST requests are accepted"}, status=405)
+        # Under ASGI the body has already been received without holding a
+        # worker; only the CPU-bound work below occupies a pool slot.
+        loop = asyncio.get_running_loop()
+        executor = get_executor()
+        if isinstance(executor, ThreadPoolExecutor):
+            return await loop.run_in_executor(executor, view, request)
+        status, content, content_type = await loop.run_in_executor(
+            executor, _run_view, view_name, request.read(), request.content_type,
+            request.META.get('QUERY_STRING', ''),
+        )
+        return HttpResponse(content, status=status, content_type=content_type)
+
+    async_view.__name__ = f"{view_name}_async"
+    async_view.__doc__ = f"Async variant of api.{view_name}, run in the CLASSIFIER_ASYNC_EXECUTOR pool."
+    return async_view
+
+
+predict_api = _offload('predict_api')
+predict_extra_api = _offload('predict_extra_api')
+predict_batch_api = _offload('predict_batch_api')
+predict_cascade_api = _offload('predict_cascade_api')
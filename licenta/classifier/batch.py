@@ -0,0 +1,116 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from itertools import repeat
+from django.conf import settings
+
+from .features import DEFAULT_FEATURE_SET, extract, FeatureBlock
+from .payloads import payload_store
+from .pools import django_process_pool
+from .storage import pack_arrays, session_arrays
+from .summaries import session_summary
+
+logger = logging.getLogger(__name__)
+
+# Marks payloads written by save_batch_results.
+BATCH_HEADER = b'classifier-batch:1\n'
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def batch_workers():
+    workers = getattr(settings, 'CLASSIFIER_BATCH_WORKERS', None)
+    if workers is None:
+        return os.cpu_count() or 1
+    return workers
+
+
+def prepare_upload(filename, content, feature_set=DEFAULT_FEATURE_SET):
+    """Everything about one uploaded file that does not need the model.
+
+    Runs in a pool worker, so it only takes and returns picklable values:
+    the ``feature_set`` features, the sample digest for the result cache, the
+    packed samples, summary and default features for ClassificationHistory,
+    or ``error`` with the per-file message.
+    """
+    result = {'filename': filename}
+    try:
+        data = json.loads(content)
+        arrays = session_arrays(data)
+        block = FeatureBlock(arrays)
+        if not block.count:
+            result['error'] = "No valid position data found in the file."
+            return result
+        result['features'] = extract(block, feature_set)
+        result['history_features'] = extract(block).tolist()
+        result['digest'] = block.digest(feature_set)
+        result['samples'] = pack_arrays(arrays)
+        result['summary'] = session_summary(arrays)
+    except json.JSONDecodeError:
+        result['error'] = "Invalid JSON format."
+    except Exception as e:
+        result['error'] = f"Error processing file: {str(e)}"
+    return result
+
+
+def _get_pool(workers):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = django_process_pool(workers)
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def prepare_uploads(uploads, feature_set=DEFAULT_FEATURE_SET):
+    """prepare_upload for each (filename, content) pair, results in input order.
+
+    Files are spread over a shared process pool of CLASSIFIER_BATCH_WORKERS
+    processes; a single file, or a pool size of 1, is handled in-process.
+    """
+    workers = batch_workers()
+    if workers <= 1 or len(uploads) <= 1:
+        return [prepare_upload(name, content, feature_set) for name, content in uploads]
+    names = [name for name, _ in uploads]
+    contents = [content for _, content in uploads]
+    chunksize = max(1, len(uploads) // (min(workers, len(uploads)) * 4))
+    try:
+        return list(_get_pool(workers).map(prepare_upload, names, contents, repeat(feature_set), chunksize=chunksize))
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start over without the pool.
+        logger.exception("Batch worker pool broke, processing %d files in-process", len(uploads))
+        _reset_pool()
+        return [prepare_upload(name, content, feature_set) for name, content in uploads]
+
+
+def save_batch_results(entries):
+    """Keep the per-file results of one batch analysis; returns the batch ID.
+
+    ``entries`` holds JSON-ready dicts (one per file, None for files that
+    failed), so the results page only needs to carry the ID and a position.
+    The blob starts with BATCH_HEADER, so a client posting the key of another
+    payload (a packed session) cannot have it read as batch results.
+    """
+    return payload_store().put(BATCH_HEADER + json.dumps(entries).encode('utf-8'))
+
+
+def load_batch_results(batch_id):
+    """The entries saved under ``batch_id``, or None if unknown, expired or not batch results."""
+    blob = payload_store().get(batch_id)
+    if blob is None or not blob.startswith(BATCH_HEADER):
+        return None
+    try:
+        entries = json.loads(blob[len(BATCH_HEADER):])
+    except ValueError:
+        return None
+    return entries if isinstance(entries, list) else None
@@ -0,0 +1,157 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import numpy as np
+from django.conf import settings
+
+from .inference import predict_with_confidence
+from .registry import registry
+
+DEFAULT_MAX_BATCH_SIZE = 32
+DEFAULT_MAX_WAIT_MS = 5
+# Upper bounds of the batch size histogram buckets.
+HISTOGRAM_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-row predictions into one predict_proba call.
+
+    Request threads call ``predict``; a background thread takes the first
+    waiting row, keeps collecting until ``max_batch_size`` rows are queued or
+    ``max_wait_ms`` has passed, scores them together and hands each caller
+    its own row of the result.
+    """
+
+    def __init__(self, model_name, max_batch_size=DEFAULT_MAX_BATCH_SIZE,
+                 max_wait_ms=DEFAULT_MAX_WAIT_MS, model_registry=registry):
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.registry = model_registry
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._batches = 0
+        self._rows = 0
+        self._largest_batch = 0
+        self._histogram = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+        self._delay_total = 0.0
+        self._delay_max = 0.0
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name=f"microbatch-{self.model_name}", daemon=True
+                )
+                self._thread.start()
+
+    def submit(self, row):
+        """Queue one feature row; the Future resolves to (prediction, confidence)."""
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((np.asarray(row, dtype=np.float64).ravel(), time.monotonic(), future))
+        return future
+
+    def predict(self, features, timeout=None):
+        """Drop-in for inference.predict_with_confidence on a small matrix."""
+        futures = [self.submit(row) for row in np.atleast_2d(features)]
+        results = [f.result(timeout=timeout) for f in futures]
+        return np.array([p for p, _ in results]), [c for _, c in results]
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.monotonic()
+            futures = [f for _, _, f in batch]
+            try:
+                model = self.registry.predictor(self.model_name)
+                if model is None:
+                    raise RuntimeError(f"Model '{self.model_name}' is not loaded.")
+                predictions, confidences = predict_with_confidence(
+                    model, np.vstack([row for row, _, _ in batch])
+                )
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future, prediction, confidence in zip(futures, predictions, confidences):
+                    future.set_result((prediction, confidence))
+            self._record(len(batch), [started - queued for _, queued, _ in batch])
+
+    def _record(self, size, delays):
+        bucket = next((i for i, bound in enumerate(HISTOGRAM_BUCKETS) if size <= bound), len(HISTOGRAM_BUCKETS))
+        with self._metrics_lock:
+            self._batches += 1
+            self._rows += size
+            self._largest_batch = max(self._largest_batch, size)
+            self._histogram[bucket] += 1
+            self._delay_total += sum(delays)
+            self._delay_max = max(self._delay_max, max(delays))
+
+    def metrics(self):
+        with self._metrics_lock:
+            labels = [f"<={bound}" for bound in HISTOGRAM_BUCKETS] + [f">{HISTOGRAM_BUCKETS[-1]}"]
+            return {
+                'model': self.model_name,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'batches': self._batches,
+                'rows': self._rows,
+                'mean_batch_size': self._rows / self._batches if self._batches else None,
+                'largest_batch': self._largest_batch,
+                'batch_size_histogram': dict(zip(labels, self._histogram)),
+                'mean_queue_delay_ms': 1000.0 * self._delay_total / self._rows if self._rows else None,
+                'max_queue_delay_ms': 1000.0 * self._delay_max,
+                'queued': self._queue.qsize(),
+            }
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def batching_settings():
+    config = getattr(settings, 'CLASSIFIER_MICRO_BATCHING', {})
+    return {
+        'ENABLED': config.get('ENABLED', False),
+        'MAX_BATCH_SIZE': config.get('MAX_BATCH_SIZE', DEFAULT_MAX_BATCH_SIZE),
+        'MAX_WAIT_MS': config.get('MAX_WAIT_MS', DEFAULT_MAX_WAIT_MS),
+    }
+
+
+def get_batcher(model_name):
+    """The shared MicroBatcher for a model, or None when batching is disabled."""
+    config = batching_settings()
+    if not config['ENABLED']:
+        return None
+    with _batchers_lock:
+        batcher = _batchers.get(model_name)
+        if batcher is None:
+            batcher = _batchers[model_name] = MicroBatcher(
+                model_name, config['MAX_BATCH_SIZE'], config['MAX_WAIT_MS']
+            )
+        return batcher
+
+
+def batching_metrics():
+    with _batchers_lock:
+        batchers = list(_batchers.values())
+    return {b.model_name: b.metrics() for b in batchers}
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+from .parsing import COLUMNS
+from .registry import registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TIMEOUT = 60 * 60
+SHARED_KEY_PREFIX = 'classifier:result:'
+
+
+class SessionHasher:
+    """Incremental hash of a session's normalized (N, 6) float64 sample matrix.
+
+    Feeding the rows in any chunking gives the same digest as hashing the
+    whole matrix at once, so streamed and fully parsed uploads of the same
+    recording share cache entries. Formatting differences in the JSON
+    (whitespace, key order, extra fields, dropped samples) do not matter.
+    """
+
+    def __init__(self):
+        self._hash = hashlib.blake2b(digest_size=16)
+        self._hash.update(len(COLUMNS).to_bytes(2, 'little'))
+
+    def update(self, positions):
+        block = np.ascontiguousarray(positions, dtype=np.float64)
+        self._hash.update(block.reshape(-1, len(COLUMNS)).data)
+
+    def hexdigest(self):
+        return self._hash.hexdigest()
+
+
+def session_digest(positions):
+    hasher = SessionHasher()
+    hasher.update(positions)
+    return hasher.hexdigest()
+
+
+def model_scope(*names):
+    """The model versions a cached result depends on, or None if any model is missing."""
+    versions = tuple(registry.version(name) for name in names)
+    if any(v is None for v in versions):
+        return None
+    return versions
+
+
+class ResultCache:
+    """Features and predictions keyed by (model versions, sample digest).
+
+    The first tier is a bounded in-process LRU. When ``SHARED_CACHE`` names
+    a Django cache alias, misses fall through to it and results are written
+    to both, so worker processes share their work. Keys carry the model
+    versions, so a retrained model can never be served a stale result; the
+    local tier also drops the old version's entries as soon as the registry
+    reports a reload.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._counters = dict.fromkeys(
+            ('hits', 'shared_hits', 'misses', 'stores', 'evictions', 'invalidated'), 0
+        )
+
+    @property
+    def config(self):
+        config = getattr(settings, 'CLASSIFIER_RESULT_CACHE', {})
+        return {
+            'ENABLED': config.get('ENABLED', True),
+            'MAX_ENTRIES': config.get('MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+            'SHARED_CACHE': config.get('SHARED_CACHE'),
+            'TIMEOUT': config.get('TIMEOUT', DEFAULT_TIMEOUT),
+        }
+
+    def _shared(self, config):
+        if not config['SHARED_CACHE']:
+            return None
+        return caches[config['SHARED_CACHE']]
+
+    @staticmethod
+    def _shared_key(scope, digest):
+        return SHARED_KEY_PREFIX + '+'.join(scope) + ':' + digest
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, scope, digest):
+        if scope is None or not self.config['ENABLED']:
+            return None
+        key = (scope, digest)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return value
+        config = self.config
+        shared = self._shared(config)
+        if shared is not None:
+            try:
+                value = shared.get(self._shared_key(scope, digest))
+            except Exception:
+                logger.exception("Shared result cache lookup failed")
+                value = None
+            if value is not None:
+                self._count('shared_hits')
+                self._store_local(key, value, config['MAX_ENTRIES'])
+                return value
+        self._count('misses')
+        return None
+
+    def _store_local(self, key, value, max_entries):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def set(self, scope, digest, value):
+        config = self.config
+        if scope is None or not config['ENABLED']:
+            return
+        self._store_local((scope, digest), value, config['MAX_ENTRIES'])
+        self._count('stores')
+        shared = self._shared(config)
+        if shared is not None:
+            try:
+                shared.set(self._shared_key(scope, digest), value, config['TIMEOUT'])
+            except Exception:
+                logger.exception("Shared result cache store failed")
+
+    def lookup(self, scope, digest, compute):
+        """The cached result for ``digest`` under ``scope``, else ``compute()`` stored.
+
+        ``compute`` must return a picklable dict. Nothing is cached when the
+        cache is disabled or ``scope`` is None (a model failed to load).
+        """
+        value = self.get(scope, digest)
+        if value is None:
+            value = compute()
+            self.set(scope, digest, value)
+        return value
+
+    def invalidate(self, version):
+        """Drop local entries computed with the given model version."""
+        with self._lock:
+            stale = [key for key in self._entries if version in key[0]]
+            for key in stale:
+                del self._entries[key]
+            self._counters['invalidated'] += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def on_model_loaded(self, name, entry):
+        previous = self._versions.get(name)
+        self._versions[name] = entry.version
+        if previous is not None and previous != entry.version:
+            removed = self.invalidate(previous)
+            logger.info("Model %s changed, dropped %d cached results", name, removed)
+
+    def stats(self):
+        config = self.config
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+        lookups = counters['hits'] + counters['shared_hits'] + counters['misses']
+        return {
+            'enabled': config['ENABLED'],
+            'shared_cache': config['SHARED_CACHE'],
+            'size': size,
+            'max_entries': config['MAX_ENTRIES'],
+            'hit_rate': (counters['hits'] + counters['shared_hits']) / lookups if lookups else None,
+            **counters,
+        }
+
+
+result_cache = ResultCache()
+registry.add_reload_listener(result_cache.on_model_loaded)
@@ -0,0 +1,66 @@
+import numpy as np
+
+CHART_STREAMS = ('HeadPosition', 'HeadForward')
+DEFAULT_WIDTH = 1000
+MIN_WIDTH = 10
+MAX_WIDTH = 5000
+
+
+def chart_width(value):
+    """The pixel width asked for by a client, clamped; ValueError if not a number."""
+    if value in (None, ''):
+        return DEFAULT_WIDTH
+    return min(max(int(value), MIN_WIDTH), MAX_WIDTH)
+
+
+def minmax_indices(values, width):
+    """Indices to draw a 1-D series in ``width`` pixels without losing its peaks.
+
+    The series is cut into ``width`` equal buckets and the positions of each
+    bucket's minimum and maximum are kept, in order, plus the first and last
+    sample. A line through those points covers the same vertical extent in
+    every pixel column as the full series. Buckets holding only NaN (a run
+    of samples without a value) contribute no points. Short series are
+    returned whole.
+    """
+    n = len(values)
+    if n <= 2 * width:
+        return np.arange(n)
+    size = -(-n // width)
+    buckets = -(-n // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    blocks = padded.reshape(buckets, size)
+    filled = ~np.isnan(blocks).all(axis=1)
+    blocks = blocks[filled]
+    lo = np.nanargmin(blocks, axis=1)
+    hi = np.nanargmax(blocks, axis=1)
+    base = np.flatnonzero(filled) * size
+    picked = np.stack([np.minimum(lo, hi), np.maximum(lo, hi)], axis=1) + base[:, None]
+    return np.unique(np.concatenate([[0], picked.ravel(), [n - 1]]))
+
+
+def chart_series(arrays, width=DEFAULT_WIDTH, streams=CHART_STREAMS):
+    """Downsampled chart data for a storage.SessionArrays.
+
+    For each stream: per axis, the ``index`` (1-based sample number) and
+    ``value`` of the points to draw; and a ``path`` of x/y/z at the union of
+    those samples, for 3-D plots. Samples lacking the stream are skipped.
+    """
+    result = {}
+    for name in streams:
+        rows = np.flatnonzero(arrays.valid(name))
+        values = arrays.stream(name)[rows]
+        series = {}
+        kept = []
+        for k, axis in enumerate('xyz'):
+            keep = minmax_indices(values[:, k], width)
+            kept.append(keep)
+            series[axis] = {'index': (rows[keep] + 1).tolist(), 'value': values[keep, k].tolist()}
+        keep = np.unique(np.concatenate(kept)).astype(np.intp)
+        series['path'] = {
+            'index': (rows[keep] + 1).tolist(),
+            **{axis: values[keep, k].tolist() for k, axis in enumerate('xyz')},
+        }
+        result[name] = series
+    return result
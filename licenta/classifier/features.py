@@ -0,0 +1,243 @@
+import hashlib
+from collections import namedtuple
+import numpy as np
+
+from .models import calculate_statistics
+from .parsing import FEATURE_STREAMS, parse_session
+from .storage import AXES, STREAM_BITS, session_arrays
+
+# What models trained before feature sets existed were fitted on.
+DEFAULT_FEATURE_SET = ('head_moments',)
+HANDS = ('Left', 'Right')
+
+Extractor = namedtuple('Extractor', 'name function streams columns')
+FEATURE_EXTRACTORS = {}
+
+
+def extractor(name, streams, columns):
+    """Register ``function(block) -> 1-D array`` as the feature group ``name``.
+
+    ``streams`` are the sample streams it reads and ``columns`` names its
+    output values in order.
+    """
+    def register(function):
+        FEATURE_EXTRACTORS[name] = Extractor(name, function, tuple(streams), tuple(columns))
+        return function
+    return register
+
+
+class FeatureBlock:
+    """The parsed columns of one session, shared by every extractor.
+
+    Built once per request from a storage.SessionArrays, or from a
+    parse_session matrix when only the head columns are needed. Streams,
+    valid-row masks and derived columns (differences, distances) are
+    computed on first use and kept, so extractors that read the same data
+    do not compute it again.
+    """
+
+    def __init__(self, arrays=None, positions=None):
+        if arrays is None and positions is None:
+            raise ValueError("FeatureBlock needs session arrays or a position matrix")
+        self.arrays = arrays
+        self._columns = {}
+        if positions is not None:
+            self._columns['positions'] = positions
+
+    def column(self, key, compute):
+        """The value cached under ``key``, computed by ``compute()`` on first use."""
+        try:
+            return self._columns[key]
+        except KeyError:
+            value = self._columns[key] = compute()
+            return value
+
+    def positions(self):
+        """The (N, 6) HeadPosition+HeadForward matrix of parse_session."""
+        return self.column('positions', lambda: np.ascontiguousarray(np.hstack([
+            self.stream('HeadPosition', 'HeadForward'),
+            self.stream('HeadForward', 'HeadPosition'),
+        ])))
+
+    @property
+    def count(self):
+        return len(self.positions())
+
+    def _require_arrays(self, name):
+        if self.arrays is None:
+            raise ValueError(f"Stream {name} was not parsed for this feature set")
+        return self.arrays
+
+    def values(self, name):
+        """(N, 3) float64 values of a stream, NaN where a sample lacks it."""
+        return self.column(('values', name), lambda: self._require_arrays(name).stream(name))
+
+    def stream(self, name, *also):
+        """(M, 3) values of ``name`` for samples that also carry every stream in ``also``."""
+        key = (name,) + tuple(sorted(also))
+        def compute():
+            return self.values(name)[self._require_arrays(name).valid(name, *also)]
+        return self.column(('stream',) + key, compute)
+
+    def digest(self, feature_set):
+        """Result cache key of the samples ``feature_set`` reads.
+
+        Sets that only read the head columns use cache.session_digest, so
+        they share entries with the streaming endpoints.
+        """
+        # Imported here: cache imports the registry, which imports this module.
+        from .cache import session_digest
+
+        streams = required_streams(feature_set)
+        if set(streams) <= set(FEATURE_STREAMS):
+            return session_digest(self.positions())
+        arrays = self._require_arrays(streams[0])
+        h = hashlib.blake2b(digest_size=16)
+        h.update(arrays.mask & sum(STREAM_BITS[name] for name in streams))
+        for name in streams:
+            h.update(name.encode('utf-8'))
+            h.update(np.ascontiguousarray(self.values(name)).data)
+        return h.hexdigest()
+
+
+def _moments(values):
+    # Means then variances, as calculate_statistics; zeros without samples.
+    if not len(values):
+        return np.zeros(2 * values.shape[1])
+    return calculate_statistics(values)
+
+
+def _magnitudes(vectors):
+    return np.linalg.norm(vectors, axis=1)
+
+
+def _moment_columns(prefixes):
+    return [f"{p}.{axis}.{m}" for m in ('mean', 'var') for p in prefixes for axis in AXES]
+
+
+@extractor('head_moments', FEATURE_STREAMS, _moment_columns(FEATURE_STREAMS))
+def head_moments(block):
+    return calculate_statistics(block.positions())
+
+
+@extractor('hand_moments',
+           [f'{side}HandPosition' for side in HANDS],
+           [c for side in HANDS for c in _moment_columns([f'{side}HandPosition'])])
+def hand_moments(block):
+    return np.hstack([_moments(block.stream(f'{side}HandPosition')) for side in HANDS])
+
+
+def head_differences(block, order):
+    """``order``-th differences of the head position between consecutive samples."""
+    def compute():
+        previous = block.positions()[:, :3] if order == 1 else head_differences(block, order - 1)
+        return np.diff(previous, axis=0)
+    return block.column(('head_differences', order), compute)
+
+
+@extractor('head_velocity', FEATURE_STREAMS,
+           ['speed.mean', 'speed.var', 'jerk.mean', 'jerk.var'])
+def head_velocity(block):
+    # Per sample rather than per second: dateTime is often coarser than the
+    # frame rate, and recordings share the headset's fixed frame rate.
+    speed = _magnitudes(head_differences(block, 1))
+    jerk = _magnitudes(head_differences(block, 3))
+    return np.array([
+        speed.mean() if len(speed) else 0.0, speed.var() if len(speed) else 0.0,
+        jerk.mean() if len(jerk) else 0.0, jerk.var() if len(jerk) else 0.0,
+    ])
+
+
+@extractor('angular_speed', ['HeadRotation'], ['mean', 'var'])
+def angular_speed(block):
+    # Euler angles in degrees; a step across 0/360 is a small turn.
+    steps = np.diff(block.stream('HeadRotation'), axis=0)
+    speed = _magnitudes((steps + 180.0) % 360.0 - 180.0)
+    if not len(speed):
+        return np.zeros(2)
+    return np.array([speed.mean(), speed.var()])
+
+
+@extractor('hand_head_distance',
+           ['HeadPosition'] + [f'{side}HandPosition' for side in HANDS],
+           [f'{side}.{m}' for side in HANDS for m in ('mean', 'var')])
+def hand_head_distance(block):
+    out = []
+    for side in HANDS:
+        hand = f'{side}HandPosition'
+        distance = _magnitudes(block.stream(hand, 'HeadPosition') - block.stream('HeadPosition', hand))
+        out.extend([distance.mean(), distance.var()] if len(distance) else [0.0, 0.0])
+    return np.array(out)
+
+
+def check_feature_set(feature_set):
+    """``feature_set`` as a tuple; ValueError for empty sets or unknown names."""
+    feature_set = tuple(feature_set)
+    if not feature_set:
+        raise ValueError("A feature set needs at least one extractor")
+    unknown = [name for name in feature_set if name not in FEATURE_EXTRACTORS]
+    if unknown:
+        raise ValueError(
+            f"Unknown feature extractors: {', '.join(unknown)}. "
+            f"Available: {', '.join(FEATURE_EXTRACTORS)}"
+        )
+    return feature_set
+
+
+def model_feature_set(model):
+    """The feature set a fitted model declares (``feature_set_``), DEFAULT_FEATURE_SET if none."""
+    return check_feature_set(getattr(model, 'feature_set_', DEFAULT_FEATURE_SET))
+
+
+def feature_columns(feature_set):
+    """Names of the values extract() returns for ``feature_set``, in order."""
+    return [f"{name}.{column}" for name in feature_set for column in FEATURE_EXTRACTORS[name].columns]
+
+
+def required_streams(feature_set):
+    streams = []
+    for name in feature_set:
+        streams.extend(s for s in FEATURE_EXTRACTORS[name].streams if s not in streams)
+    return tuple(streams)
+
+
+def load_block(data, feature_set=DEFAULT_FEATURE_SET):
+    """FeatureBlock of a decoded session with what ``feature_set`` reads.
+
+    Sets that only read the head columns go through parse_session; others
+    decode every stream with storage.session_arrays.
+    """
+    if set(required_streams(feature_set)) <= set(FEATURE_STREAMS):
+        return FeatureBlock(positions=parse_session(data).positions)
+    return FeatureBlock(arrays=session_arrays(data))
+
+
+def extract(block, feature_set=DEFAULT_FEATURE_SET):
+    """The feature row of ``block``: each extractor's output, in set order."""
+    return np.hstack([
+        np.asarray(FEATURE_EXTRACTORS[name].function(block), dtype=np.float64)
+        for name in feature_set
+    ])
+
+
+class BlockSession:
+    """A FeatureBlock with the interface of streaming.StreamedSession.
+
+    For endpoints that stream the default features but must decode the
+    whole session for models that declare another feature set.
+    """
+
+    def __init__(self, block, feature_set):
+        self.block = block
+        self.feature_set = feature_set
+
+    @property
+    def count(self):
+        return self.block.count
+
+    @property
+    def digest(self):
+        return self.block.digest(self.feature_set)
+
+    def features(self, feature_set=None):
+        return extract(self.block, feature_set or self.feature_set)
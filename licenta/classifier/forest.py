@@ -0,0 +1,97 @@
+import numpy as np
+
+
+class CompiledForest:
+    """A fitted sklearn forest classifier flattened into plain NumPy arrays.
+
+    All trees share one set of node arrays (feature, threshold, children,
+    normalized leaf probabilities). ``predict_proba`` walks every tree for
+    every row at once, one tree level per step, which avoids sklearn's
+    per-call validation and per-tree dispatch that dominate for the small
+    batches we serve. Results match the estimator's own ``predict_proba``.
+
+    The walk touches every (tree, row) pair at each level, so past a few
+    hundred rows sklearn's per-tree loop is faster; inputs of more than
+    ``max_rows`` rows are handed to the estimator itself.
+    """
+
+    def __init__(self, estimator, max_rows=None):
+        trees = [est.tree_ for est in estimator.estimators_]
+        self.estimator = estimator
+        self.max_rows = max_rows
+        self.classes_ = estimator.classes_
+        self.n_features_in_ = estimator.n_features_in_
+        self.n_trees = len(trees)
+
+        sizes = [t.node_count for t in trees]
+        self.roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.intp)
+        total = int(sum(sizes))
+        n_classes = len(self.classes_)
+
+        self.feature = np.zeros(total, dtype=np.intp)
+        self.threshold = np.zeros(total, dtype=np.float64)
+        self.left = np.zeros(total, dtype=np.intp)
+        self.right = np.zeros(total, dtype=np.intp)
+        self.values = np.zeros((total, n_classes), dtype=np.float64)
+        self.max_depth = max(t.max_depth for t in trees)
+
+        for root, tree in zip(self.roots, trees):
+            nodes = slice(root, root + tree.node_count)
+            own = np.arange(tree.node_count)
+            leaf = tree.children_left == -1
+            # Leaves point at themselves so every row can take the same number
+            # of steps; their feature/threshold are never looked at.
+            self.left[nodes] = np.where(leaf, own, tree.children_left) + root
+            self.right[nodes] = np.where(leaf, own, tree.children_right) + root
+            self.feature[nodes] = np.where(leaf, 0, tree.feature)
+            self.threshold[nodes] = tree.threshold
+            value = tree.value[:, 0, :n_classes].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            self.values[nodes] = value / normalizer
+        self.is_leaf = self.left == np.arange(total)
+
+    @classmethod
+    def supports(cls, estimator):
+        estimators = getattr(estimator, 'estimators_', None)
+        return (
+            estimators is not None
+            and hasattr(estimator, 'classes_')
+            and getattr(estimator, 'n_outputs_', 1) == 1
+            and all(hasattr(est, 'tree_') for est in estimators)
+        )
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.values))
+
+    def leaves(self, X):
+        """(n_trees, n_rows) index of the leaf each row reaches in each tree."""
+        # sklearn evaluates trees on float32 input, compared to float64 thresholds.
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        rows = np.arange(len(X))
+        idx = np.repeat(self.roots[:, None], len(X), axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[idx]] <= self.threshold[idx]
+            idx = np.where(go_left, self.left[idx], self.right[idx])
+            if self.is_leaf[idx].all():
+                break
+        return idx
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(
+                f"X has {X.shape[-1]} features, but the model is expecting {self.n_features_in_} features as input."
+            )
+        if self.max_rows is not None and len(X) > self.max_rows:
+            return self.estimator.predict_proba(X)
+        if not np.isfinite(X).all():
+            # Leave NaN/inf handling (and its errors) to sklearn itself.
+            return self.estimator.predict_proba(X)
+        # Summing over the tree axis adds the trees one after another, in
+        # the same order as sklearn's forest accumulates them.
+        return self.values[self.leaves(X)].sum(axis=0) / self.n_trees
+
+    def predict(self, X):
+        return self.classes_[self.predict_proba(X).argmax(axis=1)]
@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.db import transaction
+
+from . import patient_stats
+from .models import ClassificationHistory
+
+DEFAULT_CHUNK_SIZE = 200
+
+
+def history_chunk_size():
+    return getattr(settings, 'CLASSIFIER_HISTORY_BULK_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+
+
+class HistoryWriter:
+    """Collects ClassificationHistory rows of a batch and inserts them together.
+
+    ``write`` issues one bulk_create, ``chunk_size`` rows per INSERT, inside a
+    single transaction: one commit (one fsync on SQLite) per batch instead of
+    one per file, and the write lock is taken once. On backends that return
+    inserted ids (SQLite 3.35+, PostgreSQL) the written rows have their pk set.
+    bulk_create sends no post_save, so the patient session summaries are
+    updated here, in the same transaction.
+    """
+
+    def __init__(self, chunk_size=None):
+        self.chunk_size = chunk_size or history_chunk_size()
+        self.records = []
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, **fields):
+        """Queue one row; returns the (not yet saved) instance."""
+        record = ClassificationHistory(**fields)
+        self.records.append(record)
+        return record
+
+    def write(self):
+        """Insert every queued row and return them."""
+        records, self.records = self.records, []
+        if not records:
+            return records
+        with transaction.atomic():
+            records = ClassificationHistory.objects.bulk_create(records, batch_size=self.chunk_size)
+            patient_stats.add_history(records)
+        return records
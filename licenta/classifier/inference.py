@@ -0,0 +1,59 @@
+import numpy as np
+
+
+def predict_with_confidence(model, features):
+    """Predicted classes and confidence percentages for a feature matrix.
+
+    Uses a single ``predict_proba`` call; the label is the most probable
+    class, which is exactly what ``model.predict`` would return.
+    """
+    features = np.asarray(features, dtype=np.float64).reshape(-1, model.n_features_in_)
+    proba = model.predict_proba(features)
+    best = proba.argmax(axis=1)
+    predictions = model.classes_[best]
+    confidences = [round(float(p) * 100, 1) for p in proba[np.arange(len(best)), best]]
+    return predictions, confidences
+
+
+def cascade(primary_model, secondary_model, features, secondary_features=None):
+    """Primary classification for every row, secondary only for Atypical rows.
+
+    Returns ``(predictions, confidences, secondary)`` where ``secondary[i]`` is
+    a ``(prediction, confidence)`` pair for rows predicted Atypical (1) and
+    None otherwise. Features are computed once by the caller and shared,
+    unless the secondary model uses another feature set, whose rows are then
+    passed as ``secondary_features``.
+    """
+    features = np.asarray(features, dtype=np.float64).reshape(-1, primary_model.n_features_in_)
+    if secondary_features is None:
+        secondary_features = features
+    else:
+        secondary_features = np.asarray(secondary_features, dtype=np.float64).reshape(len(features), -1)
+    predictions, confidences = predict_with_confidence(primary_model, features)
+    secondary = [None] * len(predictions)
+    atypical = np.flatnonzero(predictions == 1)
+    if len(atypical) and secondary_model is not None:
+        sec_predictions, sec_confidences = predict_with_confidence(secondary_model, secondary_features[atypical])
+        for i, prediction, confidence in zip(atypical, sec_predictions, sec_confidences):
+            secondary[i] = (int(prediction), confidence)
+    return predictions, confidences, secondary
+
+
+def result_records(features, predictions, confidences, secondary=None):
+    """One plain dict per row, as stored in the result cache.
+
+    Holds the feature row, prediction and confidence and, when ``secondary``
+    (from ``cascade``) is given, the secondary ``[prediction, confidence]``
+    or None.
+    """
+    records = []
+    for i, row in enumerate(np.asarray(features, dtype=np.float64).reshape(len(predictions), -1)):
+        record = {
+            "features": row.tolist(),
+            "prediction": int(predictions[i]),
+            "confidence": confidences[i],
+        }
+        if secondary is not None:
+            record["secondary"] = list(secondary[i]) if secondary[i] is not None else None
+        records.append(record)
+    return records
@@ -0,0 +1,158 @@
+import time
+import uuid
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import caches
+
+from .streaming import RunningStatistics
+
+DEFAULT_EMIT_EVERY = 500
+DEFAULT_EMIT_INTERVAL = 5.0
+DEFAULT_TIMEOUT = 60 * 60
+KEY_PREFIX = 'classifier:live:'
+# A lock outlives a crashed request by at most LOCK_TIMEOUT seconds; waiters
+# give up after LOCK_WAIT seconds.
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5.0
+
+
+def live_settings():
+    config = getattr(settings, 'CLASSIFIER_LIVE_STREAMS', {})
+    return {
+        'CACHE': config.get('CACHE', 'default'),
+        'EMIT_EVERY': config.get('EMIT_EVERY', DEFAULT_EMIT_EVERY),
+        'EMIT_INTERVAL': config.get('EMIT_INTERVAL', DEFAULT_EMIT_INTERVAL),
+        'TIMEOUT': config.get('TIMEOUT', DEFAULT_TIMEOUT),
+    }
+
+
+class StreamBusy(Exception):
+    """Another request held the stream's lock for longer than LOCK_WAIT."""
+
+
+class LiveStream:
+    """Running classification state of one recording that is still in progress.
+
+    Only the accumulators are kept (count, per-column mean and M2), so
+    adding a chunk costs O(chunk) no matter how long the stream has been
+    running. The state lives in the CLASSIFIER_LIVE_STREAMS cache, which must
+    be shared between processes when more than one worker serves the API.
+    Updates load, change and save the state inside ``locked`` so concurrent
+    chunks of one stream cannot overwrite each other.
+    """
+
+    def __init__(self, stream_id, model_type, stats=None, received=0, dropped=0, seq=None,
+                 started_at=None, estimate=None, emitted_count=0, emitted_at=None):
+        self.stream_id = stream_id
+        self.model_type = model_type
+        self.stats = stats if stats is not None else RunningStatistics()
+        self.received = received
+        self.dropped = dropped
+        self.seq = seq
+        self.started_at = started_at if started_at is not None else time.time()
+        self.estimate = estimate
+        self.emitted_count = emitted_count
+        self.emitted_at = emitted_at
+
+    @staticmethod
+    def _cache():
+        return caches[live_settings()['CACHE']]
+
+    @classmethod
+    def create(cls, model_type):
+        stream = cls(uuid.uuid4().hex, model_type)
+        stream.save()
+        return stream
+
+    @classmethod
+    def load(cls, stream_id):
+        state = cls._cache().get(KEY_PREFIX + stream_id)
+        if state is None:
+            return None
+        return cls(stream_id, state['model_type'], RunningStatistics.from_state(state['stats']),
+                   state['received'], state['dropped'], state['seq'], state['started_at'],
+                   state['estimate'], state['emitted_count'], state['emitted_at'])
+
+    @classmethod
+    @contextmanager
+    def locked(cls, stream_id, wait=None):
+        """Hold the update lock of one stream, waiting up to ``wait`` seconds.
+
+        ``cache.add`` only stores a key that is not there yet, atomically on
+        every shared backend, so exactly one request gets the lock; the others
+        retry until it is released. Raises StreamBusy when the wait runs out.
+        """
+        cache = cls._cache()
+        key = KEY_PREFIX + stream_id + ':lock'
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + (LOCK_WAIT if wait is None else wait)
+        delay = 0.005
+        while not cache.add(key, token, LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                raise StreamBusy(stream_id)
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+        try:
+            yield
+        finally:
+            if cache.get(key) == token:
+                cache.delete(key)
+
+    def save(self):
+        self._cache().set(KEY_PREFIX + self.stream_id, {
+            'model_type': self.model_type,
+            'stats': self.stats.state(),
+            'received': self.received,
+            'dropped': self.dropped,
+            'seq': self.seq,
+            'started_at': self.started_at,
+            'estimate': self.estimate,
+            'emitted_count': self.emitted_count,
+            'emitted_at': self.emitted_at,
+        }, live_settings()['TIMEOUT'])
+
+    def delete(self):
+        self._cache().delete(KEY_PREFIX + self.stream_id)
+
+    @property
+    def count(self):
+        return self.stats.count
+
+    @property
+    def expected_seq(self):
+        """The ``seq`` the next chunk must carry; chunks are numbered from 0."""
+        return 0 if self.seq is None else self.seq + 1
+
+    def add(self, session):
+        """Fold in a streaming.StreamedSession parsed from one chunk."""
+        self.stats.merge(session.stats)
+        self.received += session.total
+        self.dropped += session.dropped_count
+
+    def due(self, now=None):
+        """Whether a new estimate should be emitted for the samples seen so far."""
+        if self.count <= self.emitted_count:
+            return False
+        config = live_settings()
+        now = time.time() if now is None else now
+        last = self.emitted_at if self.emitted_at is not None else self.started_at
+        return (self.count - self.emitted_count >= config['EMIT_EVERY']
+                or now - last >= config['EMIT_INTERVAL'])
+
+    def emit(self, estimate, now=None):
+        self.emitted_count = self.count
+        self.emitted_at = time.time() if now is None else now
+        self.estimate = {**estimate, 'count': self.count, 'emitted_at': self.emitted_at}
+
+    def as_dict(self):
+        return {
+            'stream_id': self.stream_id,
+            'model_type': self.model_type,
+            'count': self.count,
+            'received': self.received,
+            'dropped': self.dropped,
+            'seq': self.seq,
+            'expected_seq': self.expected_seq,
+            'started_at': self.started_at,
+            'estimate': self.estimate,
+        }
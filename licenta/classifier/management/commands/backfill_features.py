@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from classifier import patient_stats
+from classifier.models import ClassificationHistory
+
+DEFAULT_CHUNK_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = "Compute and store the feature vector of history rows saved before features were persisted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Rows loaded and updated per query (default %(default)s).")
+        parser.add_argument('--all', action='store_true',
+                            help="Recompute rows that already have features too.")
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        queryset = ClassificationHistory.objects.all()
+        if not options['all']:
+            queryset = queryset.filter(features__isnull=True)
+        # Ids up front, so updated rows do not shift the remaining chunks.
+        ids = list(queryset.order_by('id').values_list('id', flat=True))
+        updated = skipped = 0
+        sessions = set()
+        for start in range(0, len(ids), chunk_size):
+            chunk = ClassificationHistory.objects.filter(id__in=ids[start:start + chunk_size])
+            records = []
+            for record in chunk.only('id', 'session_id', 'samples', 'raw_json'):
+                features = record.compute_features()
+                if features is None:
+                    skipped += 1
+                    continue
+                record.features = features.tolist()
+                records.append(record)
+                if record.session_id is not None:
+                    sessions.add(record.session_id)
+            ClassificationHistory.objects.bulk_update(records, ['features'])
+            updated += len(records)
+            self.stdout.write(f"{min(start + chunk_size, len(ids))}/{len(ids)} rows processed")
+        # bulk_update sends no signals; bring the sessions' feature averages up to date.
+        if sessions:
+            patient_stats.rebuild(sorted(sessions))
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored features for {updated} rows; {skipped} rows had no usable samples; "
+            f"{len(sessions)} session summaries rebuilt."
+        ))
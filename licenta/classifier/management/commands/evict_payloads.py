@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from classifier.payloads import payload_store
+
+
+class Command(BaseCommand):
+    help = "Remove explore-page session payloads that have not been used for CLASSIFIER_PAYLOAD_STORE['TTL'] seconds."
+
+    def handle(self, *args, **options):
+        store = payload_store()
+        removed = store.evict()
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} expired payloads from {store.directory}."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from classifier import patient_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-patient-session summaries from the classification history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session', type=int, action='append', dest='sessions',
+                            help="Only rebuild this PatientSession id (repeatable).")
+
+    def handle(self, *args, **options):
+        written = patient_stats.rebuild(options['sessions'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} session summaries."))
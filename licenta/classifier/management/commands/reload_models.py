@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from classifier.registry import registry
+
+
+class Command(BaseCommand):
+    help = "Reload the classifier models in every running worker by touching their artifacts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', choices=registry.names(), help="Only reload this model.")
+
+    def handle(self, *args, **options):
+        entries = registry.touch(options['model'])
+        for entry in entries:
+            if entry.model is None:
+                raise CommandError(f"{entry.name}: {entry.error}")
+            self.stdout.write(
+                f"{entry.name}: {entry.version} loaded in {entry.load_seconds}s "
+                f"({entry.memory_bytes / 1e6:.1f} MB) from {entry.path}"
+            )
+        self.stdout.write(self.style.SUCCESS("Workers will pick up the models on their next request."))
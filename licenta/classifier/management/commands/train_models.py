@@ -0,0 +1,92 @@
+import os
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from classifier.features import check_feature_set, FEATURE_EXTRACTORS
+from classifier.registry import registry
+from classifier.training import (
+    DEFAULT_STORE_DIR, feature_sets, FeatureStore, save_model, train_classifier, training_data,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Train the classifier models from the session files in CLASSIFIER_TRAINING_DATA "
+        "and install them where the app loads them from."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', choices=registry.names(),
+                            help="Model to train (repeatable). Defaults to every configured model.")
+        parser.add_argument('--n-jobs', type=int, default=-1,
+                            help="Cores used to fit each forest (-1 = all, the default).")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Processes parsing session files (default: one per CPU).")
+        parser.add_argument('--store-dir', default=os.path.join(settings.BASE_DIR, DEFAULT_STORE_DIR),
+                            help="Feature store kept between runs, one subdirectory per model.")
+        parser.add_argument('--no-store', action='store_true', help="Parse every file again.")
+        parser.add_argument('--features',
+                            help="Comma-separated feature extractors to train on, overriding "
+                                 f"CLASSIFIER_FEATURE_SETS ({', '.join(FEATURE_EXTRACTORS)}).")
+        parser.add_argument('--output-dir',
+                            help="Write <model>.joblib files here instead of replacing the served models.")
+
+    def handle(self, *args, **options):
+        data = training_data()
+        configured = feature_sets()
+        override = None
+        if options['features']:
+            try:
+                override = check_feature_set(n.strip() for n in options['features'].split(',') if n.strip())
+            except ValueError as e:
+                raise CommandError(str(e))
+        names = options['model'] or registry.names()
+        trained = []
+        for name in names:
+            directories = data.get(name)
+            if not directories:
+                self.stderr.write(self.style.WARNING(
+                    f"{name}: no training data configured in CLASSIFIER_TRAINING_DATA, skipping."
+                ))
+                continue
+            missing = [d for d in directories if not os.path.isdir(d)]
+            if missing:
+                self.stderr.write(self.style.WARNING(f"{name}: missing {', '.join(missing)}, skipping."))
+                continue
+
+            feature_set = override or configured[name]
+            try:
+                store = None if options['no_store'] else FeatureStore(os.path.join(options['store_dir'], name), feature_set)
+                result = train_classifier(
+                    directories, n_jobs=options['n_jobs'], workers=options['workers'], store=store,
+                    feature_set=feature_set,
+                )
+            except ValueError as e:
+                raise CommandError(f"{name}: {e}")
+            if options['output_dir']:
+                os.makedirs(options['output_dir'], exist_ok=True)
+                path = os.path.join(options['output_dir'], f"{name}.joblib")
+            else:
+                path = registry.paths[name]
+            started = time.perf_counter()
+            save_model(result['model'], path)
+            result['stages'].append(('save', time.perf_counter() - started))
+            trained.append(name)
+
+            stats = result['stats']
+            self.stdout.write(
+                f"{name}: {stats['files']} files ({stats['cached']} cached, {stats['parsed']} parsed, "
+                f"{stats['removed']} removed, {stats['empty']} without samples), "
+                f"features {', '.join(feature_set)}, "
+                f"hold-out accuracy {result['accuracy']:.3f}, saved to {path}"
+            )
+            for stage, seconds in result['stages']:
+                self.stdout.write(f"  {stage:<10} {seconds:8.3f}s")
+
+        if trained and not options['output_dir']:
+            for name in trained:
+                registry.touch(name)
+            self.stdout.write(self.style.SUCCESS(
+                "Workers will pick up the new models on their next request."
+            ))
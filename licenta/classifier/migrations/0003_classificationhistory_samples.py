@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:53
+
+import json
+
+from django.db import migrations, models
+
+from classifier.storage import pack_session, unpack_session
+
+
+CHUNK_SIZE = 100
+
+
+def _chunks(queryset):
+    # Collect ids first: SQLite does not isolate a running SELECT from
+    # updates made to the same table while iterating it.
+    ids = list(queryset.values_list("id", flat=True))
+    for start in range(0, len(ids), CHUNK_SIZE):
+        yield queryset.filter(id__in=ids[start:start + CHUNK_SIZE])
+
+
+def pack_raw_json(apps, schema_editor):
+    ClassificationHistory = apps.get_model("classifier", "ClassificationHistory")
+    for chunk in _chunks(ClassificationHistory.objects.exclude(raw_json="")):
+        for record in chunk.only("id", "raw_json"):
+            try:
+                samples = pack_session(json.loads(record.raw_json))
+            except ValueError:
+                # Not a JSON array of samples; keep the text as it is.
+                continue
+            ClassificationHistory.objects.filter(pk=record.pk).update(
+                samples=samples, raw_json=""
+            )
+
+
+def unpack_samples(apps, schema_editor):
+    ClassificationHistory = apps.get_model("classifier", "ClassificationHistory")
+    for chunk in _chunks(ClassificationHistory.objects.filter(samples__isnull=False)):
+        for record in chunk.only("id", "samples"):
+            ClassificationHistory.objects.filter(pk=record.pk).update(
+                raw_json=unpack_session(record.samples).to_json(), samples=None
+            )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("classifier", "0002_patientsession_classificationhistory_session"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="classificationhistory",
+            name="samples",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.RunPython(pack_raw_json, unpack_samples),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classifier', '0003_classificationhistory_samples'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classificationhistory',
+            name='features',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='classificationhistory',
+            name='model_version',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
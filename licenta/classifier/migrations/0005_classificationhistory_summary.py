@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classifier', '0004_classificationhistory_features'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classificationhistory',
+            name='summary',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
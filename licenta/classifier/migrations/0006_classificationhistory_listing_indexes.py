@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classifier', '0005_classificationhistory_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='classificationhistory',
+            index=models.Index(fields=['user', '-timestamp'], name='classifier_history_user_ts'),
+        ),
+        migrations.AddIndex(
+            model_name='classificationhistory',
+            index=models.Index(fields=['session', '-timestamp'], name='classifier_history_sess_ts'),
+        ),
+    ]
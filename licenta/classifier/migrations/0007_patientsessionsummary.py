@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classifier', '0006_classificationhistory_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PatientSessionSummary',
+            fields=[
+                ('session', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='classifier.patientsession')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('atypical_count', models.PositiveIntegerField(default=0)),
+                ('confidence_sum', models.FloatField(default=0.0)),
+                ('confidence_min', models.FloatField(blank=True, null=True)),
+                ('confidence_max', models.FloatField(blank=True, null=True)),
+                ('last_classified_at', models.DateTimeField(blank=True, null=True)),
+                ('feature_count', models.PositiveIntegerField(default=0)),
+                ('feature_sum', models.JSONField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
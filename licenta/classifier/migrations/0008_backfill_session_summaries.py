@@ -0,0 +1,11 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Summaries of existing sessions are built by 0009, once they have the
+    # column the feature window is kept in.
+    dependencies = [
+        ("classifier", "0007_patientsessionsummary"),
+    ]
+
+    operations = []
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+from classifier import patient_stats
+
+
+def build_windows(apps, schema_editor):
+    patient_stats.rebuild(models=(
+        apps.get_model('classifier', 'PatientSession'),
+        apps.get_model('classifier', 'ClassificationHistory'),
+        apps.get_model('classifier', 'PatientSessionSummary'),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('classifier', '0008_backfill_session_summaries'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='patientsessionsummary',
+            name='feature_count',
+        ),
+        migrations.RemoveField(
+            model_name='patientsessionsummary',
+            name='feature_sum',
+        ),
+        migrations.AddField(
+            model_name='patientsessionsummary',
+            name='recent_features',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(build_windows, migrations.RunPython.noop),
+    ]
@@ -1,13 +1,14 @@
-from django.db import models
+from django.db import models, transaction
 import os
 import json
 import numpy as np
 from glob import glob
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
 from joblib import dump
 from django.contrib.auth.models import User
 from django.utils import timezone
+from .parsing import parse_session
+from .storage import session_arrays, unpack_session
+from .summaries import session_summary
 
 
 def read_json_files_with_labels(directory, label):
@@ -15,23 +16,10 @@ def read_json_files_with_labels(directory, label):
     labels = []
     
     for filepath in glob(os.path.join(directory, '*.json')):
-        positions = []
-        forwards = []
         with open(filepath, 'r') as file:
-            data = json.load(file)
-            for entry in data:
-                try:
-                    pos = entry['HeadPosition']
-                    forw = entry['HeadForward']
-                    poz=[float(pos['x']), float(pos['y']), float(pos['z'])]
-                    forz=[float(forw['x']), float(forw['y']), float(forw['z'])]
-                    positions.append(poz+forz)
-                except KeyError:
-                    continue
-                except ValueError:
-                    continue
-        if positions:
-            player_positions.append(np.array(positions))
+            parsed = parse_session(json.load(file))
+        if parsed.count:
+            player_positions.append(parsed.positions)
             labels.append(label)
     
     return player_positions, labels
@@ -42,23 +30,13 @@ def calculate_statistics(positions):
     return np.hstack([mean_positions, var_positions])
 
 def train_model():
+    from .training import DEFAULT_STORE_DIR, FeatureStore, train_classifier
+
     tipici_directory = os.path.join('classifier_data', 'FullData', 'tipici')
     atipici_directory = os.path.join('classifier_data', 'FullData', 'atipici')
 
-    tipici_positions, tipici_labels = read_json_files_with_labels(tipici_directory, 0)
-    atipici_positions, atipici_labels = read_json_files_with_labels(atipici_directory, 1)
-
-    player_positions = tipici_positions + atipici_positions
-    labels = tipici_labels + atipici_labels
-
-    features = np.array([calculate_statistics(positions) for positions in player_positions])
-    labels = np.array(labels)
-
-    X_train, X_test, y_train, y_test = train_test_split(features, labels, test_size=0.2, random_state=42)
-
-    model = RandomForestClassifier(random_state=42)
-
-    model.fit(X_train, y_train)
+    store = FeatureStore(os.path.join(DEFAULT_STORE_DIR, 'standard'))
+    model = train_classifier([tipici_directory, atipici_directory], store=store)['model']
 
     dump(model, 'classifier_model.joblib')
 
@@ -75,6 +53,20 @@ class PatientSession(models.Model):
     def __str__(self):
         return f"{self.user.username} - {self.name} ({self.created_at.strftime('%Y-%m-%d')})"
 
+class ClassificationHistoryQuerySet(models.QuerySet):
+    def delete(self):
+        """Delete the rows, then recompute the summaries of their sessions."""
+        # Imported here: patient_stats imports this module.
+        from . import patient_stats
+
+        with transaction.atomic():
+            session_ids = set(self.exclude(session=None).order_by().values_list('session_id', flat=True))
+            result = super().delete()
+            if session_ids:
+                patient_stats.rebuild(session_ids)
+        return result
+
+
 class ClassificationHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     session = models.ForeignKey(PatientSession, null=True, blank=True, on_delete=models.CASCADE)
@@ -83,9 +75,139 @@ class ClassificationHistory(models.Model):
     prediction_label = models.CharField(max_length=50)
     confidence = models.FloatField()
     raw_json = models.TextField(blank=True)
+    # Columnar, compressed copy of the session (see storage.pack_session).
+    # New rows only fill this; raw_json is kept for rows that could not be packed.
+    samples = models.BinaryField(null=True, blank=True)
+    # calculate_statistics of the session (12 floats) and the version of the
+    # model that scored it; blank version on rows filled by backfill_features.
+    # Always features.DEFAULT_FEATURE_SET, whatever set the model reads, so
+    # session summaries only ever average vectors of one kind.
+    features = models.JSONField(null=True, blank=True)
+    model_version = models.CharField(max_length=64, blank=True)
+    # summaries.session_summary of the samples: timing and per-axis statistics
+    # shown on the explore page.
+    summary = models.JSONField(null=True, blank=True)
+
+    objects = ClassificationHistoryQuerySet.as_manager()
 
     class Meta:
         ordering = ['-timestamp']
+        # The dashboard and session pages list a user's / a session's rows
+        # newest first (pagination.keyset_page).
+        indexes = [
+            models.Index(fields=['user', '-timestamp'], name='classifier_history_user_ts'),
+            models.Index(fields=['session', '-timestamp'], name='classifier_history_sess_ts'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.prediction_label} on {self.timestamp}"
+
+    # Inserts and deletes update the session summary here, in the same
+    # transaction as the row, rather than in signal receivers: post_save runs
+    # once the row is committed, and any delete signal on this model stops
+    # Django from fast-deleting the rows when their PatientSession or User is
+    # deleted, so every row, blobs included, would be loaded first. Those
+    # cascades remove the summary along with the session.
+    def save(self, *args, **kwargs):
+        # Imported here: patient_stats imports this module.
+        from . import patient_stats
+
+        created = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Only inserts change the totals; later saves just add stored fields.
+            if created:
+                patient_stats.add_history([self])
+
+    def delete(self, *args, **kwargs):
+        from . import patient_stats
+
+        with transaction.atomic():
+            history_id = self.pk
+            result = super().delete(*args, **kwargs)
+            patient_stats.remove_history(self, history_id)
+        return result
+
+    def session_arrays(self):
+        if self.samples:
+            return unpack_session(self.samples)
+        return None
+
+    def session_json(self):
+        """The stored session as a JSON string, rebuilt from samples when packed."""
+        arrays = self.session_arrays()
+        if arrays is not None:
+            return arrays.to_json()
+        return self.raw_json
+
+    def compute_features(self):
+        """calculate_statistics of the stored samples, or None if there are none."""
+        arrays = self.session_arrays()
+        if arrays is not None:
+            positions = arrays.positions()
+        else:
+            try:
+                positions = parse_session(json.loads(self.raw_json)).positions
+            except ValueError:
+                return None
+        if not len(positions):
+            return None
+        return calculate_statistics(positions)
+
+    def compute_summary(self):
+        """session_summary of the stored samples, or None if they cannot be read."""
+        arrays = self.session_arrays()
+        if arrays is None:
+            try:
+                arrays = session_arrays(json.loads(self.raw_json))
+            except ValueError:
+                return None
+        return session_summary(arrays)
+
+    def feature_vector(self):
+        """The stored features as an array, computing them if they were never saved."""
+        if self.features is not None:
+            return np.array(self.features, dtype=np.float64)
+        return self.compute_features()
+
+class PatientSessionSummary(models.Model):
+    """Running totals of the classifications of one PatientSession.
+
+    Kept current by patient_stats as history rows are inserted and deleted,
+    so pages read one row instead of scanning the history;
+    `manage.py rebuild_session_summaries` recomputes them from scratch.
+    """
+    session = models.OneToOneField(PatientSession, primary_key=True, on_delete=models.CASCADE, related_name='stats')
+    count = models.PositiveIntegerField(default=0)
+    atypical_count = models.PositiveIntegerField(default=0)
+    confidence_sum = models.FloatField(default=0.0)
+    confidence_min = models.FloatField(null=True, blank=True)
+    confidence_max = models.FloatField(null=True, blank=True)
+    last_classified_at = models.DateTimeField(null=True, blank=True)
+    # [history id, POSIX time, features] of the latest rows that have features,
+    # oldest first; at most CLASSIFIER_SESSION_SUMMARIES['FEATURE_WINDOW'].
+    recent_features = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.session} - {self.count} classifications"
+
+    @property
+    def atypical_ratio(self):
+        return self.atypical_count / self.count if self.count else None
+
+    @property
+    def mean_confidence(self):
+        return self.confidence_sum / self.count if self.count else None
+
+    @property
+    def feature_count(self):
+        """How many feature vectors feature_mean averages."""
+        return len(self.recent_features)
+
+    @property
+    def feature_mean(self):
+        """Rolling average of the latest feature vectors (see recent_features), or None."""
+        if not self.recent_features:
+            return None
+        return np.mean([entry[2] for entry in self.recent_features], axis=0).tolist()
@@ -0,0 +1,47 @@
+import base64
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+# What the history tables show; samples, raw_json, features and summary stay
+# in the database.
+HISTORY_LIST_FIELDS = ('id', 'timestamp', 'filename', 'prediction_label', 'confidence')
+
+
+def history_page_size():
+    return getattr(settings, 'CLASSIFIER_HISTORY_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+
+
+def encode_cursor(record):
+    raw = f"{record.timestamp.isoformat()}|{record.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """``(timestamp, id)`` of an encode_cursor string; ValueError if malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        timestamp, record_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(record_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor {cursor!r}") from e
+
+
+def keyset_page(queryset, cursor=None, page_size=None):
+    """One page of ``queryset``, newest first, continuing after ``cursor``.
+
+    Rows are ordered by (-timestamp, -id) and the next page is selected by
+    comparing with the last row shown rather than by OFFSET, so every page
+    is a short index range scan however deep the user pages. Returns
+    ``(records, next_cursor)``; ``next_cursor`` is None on the last page.
+    An invalid cursor raises ValueError.
+    """
+    page_size = page_size or history_page_size()
+    queryset = queryset.order_by('-timestamp', '-id')
+    if cursor:
+        timestamp, record_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=record_id))
+    records = list(queryset[:page_size + 1])
+    next_cursor = encode_cursor(records[page_size - 1]) if len(records) > page_size else None
+    return records[:page_size], next_cursor
@@ -0,0 +1,92 @@
+from dataclasses import dataclass, field
+import numpy as np
+
+# Streams and axes used as model input, in column order of the parsed matrix.
+FEATURE_STREAMS = ('HeadPosition', 'HeadForward')
+AXES = ('x', 'y', 'z')
+COLUMNS = tuple(f"{stream}.{axis}" for stream in FEATURE_STREAMS for axis in AXES)
+
+# Reasons a sample can be dropped while parsing.
+DROP_MISSING_KEY = 'missing_key'
+DROP_INVALID_VALUE = 'invalid_value'
+DROP_INVALID_ENTRY = 'invalid_entry'
+
+
+@dataclass
+class ParsedSession:
+    """Head position/forward samples of one session as an (N, 6) matrix."""
+    positions: np.ndarray
+    total: int
+    dropped: dict = field(default_factory=dict)
+
+    @property
+    def count(self):
+        return len(self.positions)
+
+    @property
+    def dropped_count(self):
+        return sum(self.dropped.values())
+
+
+def parse_vector(value):
+    """The (x, y, z) floats of one stream value of a sample.
+
+    KeyError, ValueError or TypeError when the value is not accepted; the
+    rule every parser of the samples (parse_session, storage.session_arrays)
+    shares.
+    """
+    return float(value['x']), float(value['y']), float(value['z'])
+
+
+def _fast_extract(data, dtype):
+    """Columnar extraction for well-formed sessions.
+
+    Raises on the first malformed sample so the caller can fall back to the
+    row-by-row path, which knows how to skip and account for bad rows.
+    """
+    n = len(data)
+    out = np.empty((n, len(COLUMNS)), dtype=np.float64)
+    col = 0
+    for stream in FEATURE_STREAMS:
+        values = [entry[stream] for entry in data]
+        for axis in AXES:
+            out[:, col] = [v[axis] for v in values]
+            col += 1
+    # NumPy turns None into NaN where float() would refuse it, so only trust
+    # the fast path when it produced no NaN at all.
+    if np.isnan(out).any():
+        raise ValueError('NaN in fast path')
+    return np.ascontiguousarray(out, dtype=dtype)
+
+
+def _slow_extract(data, dtype):
+    rows = []
+    dropped = {}
+    for entry in data:
+        try:
+            rows.append(parse_vector(entry['HeadPosition']) + parse_vector(entry['HeadForward']))
+        except KeyError:
+            dropped[DROP_MISSING_KEY] = dropped.get(DROP_MISSING_KEY, 0) + 1
+        except ValueError:
+            dropped[DROP_INVALID_VALUE] = dropped.get(DROP_INVALID_VALUE, 0) + 1
+        except TypeError:
+            # Non-object samples, or objects where a number was expected.
+            dropped[DROP_INVALID_ENTRY] = dropped.get(DROP_INVALID_ENTRY, 0) + 1
+    positions = np.array(rows, dtype=dtype).reshape(-1, len(COLUMNS))
+    return positions, dropped
+
+
+def parse_session(data, dtype=np.float64):
+    """Turn a decoded session (list of sample dicts) into a ParsedSession.
+
+    Samples missing HeadPosition/HeadForward, or with non-numeric coordinates,
+    are skipped and counted in ``dropped`` by reason.
+    """
+    if not isinstance(data, list):
+        raise ValueError("Session data must be a JSON array of samples")
+    try:
+        positions = _fast_extract(data, dtype)
+        dropped = {}
+    except (KeyError, ValueError, TypeError):
+        positions, dropped = _slow_extract(data, dtype)
+    return ParsedSession(positions=positions, total=len(data), dropped=dropped)
@@ -0,0 +1,175 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q, Sum, Window
+from django.db.models.functions import RowNumber
+
+from .models import ClassificationHistory, PatientSession, PatientSessionSummary
+
+ATYPICAL = 'Atypical'
+DEFAULT_FEATURE_WINDOW = 20
+_MODELS = (PatientSession, ClassificationHistory, PatientSessionSummary)
+
+
+def summary_settings():
+    config = getattr(settings, 'CLASSIFIER_SESSION_SUMMARIES', {})
+    return {
+        'FEATURE_WINDOW': max(1, config.get('FEATURE_WINDOW', DEFAULT_FEATURE_WINDOW)),
+    }
+
+
+def _window_entry(history_id, timestamp, features):
+    return [history_id, timestamp.timestamp(), list(features)]
+
+
+def _window_order(entry):
+    # Classification time, then id for rows saved in the same instant.
+    return entry[1], entry[0] or 0
+
+
+def _recent_features(ClassificationHistory, sessions, size):
+    """{session id: window} of the ``size`` latest rows with features of ``sessions``.
+
+    Reads the id, time and features of at most ``size`` rows per session,
+    however long their history.
+    """
+    ranked = ClassificationHistory.objects.filter(session__in=sessions, features__isnull=False).annotate(
+        rank=Window(RowNumber(), partition_by=F('session_id'), order_by=[F('timestamp').desc(), F('id').desc()]),
+    ).filter(rank__lte=size).order_by()
+    windows = defaultdict(list)
+    for session_id, history_id, timestamp, features in ranked.values_list('session_id', 'id', 'timestamp', 'features'):
+        windows[session_id].append(_window_entry(history_id, timestamp, features))
+    for window in windows.values():
+        window.sort(key=_window_order)
+    return windows
+
+
+def add_history(records):
+    """Fold newly inserted history rows into their sessions' summaries.
+
+    Called by ClassificationHistory.save and once per batch by
+    history.HistoryWriter, inside the transaction that inserts the rows.
+    Each session's summary is updated once, whatever the number of rows.
+    """
+    by_session = defaultdict(list)
+    for record in records:
+        if record.session_id is not None:
+            by_session[record.session_id].append(record)
+    if not by_session:
+        return
+    size = summary_settings()['FEATURE_WINDOW']
+    with transaction.atomic():
+        for session_id, rows in by_session.items():
+            summary, created = PatientSessionSummary.objects.select_for_update().get_or_create(session_id=session_id)
+            if created:
+                # A new session (or one older than the summaries): aggregate
+                # its whole history, which already holds ``rows``.
+                _aggregate(PatientSession.objects.filter(id=session_id), _MODELS)[0].save(force_update=True)
+                continue
+            for record in rows:
+                summary.count += 1
+                summary.atypical_count += record.prediction_label == ATYPICAL
+                summary.confidence_sum += record.confidence
+                if summary.confidence_min is None or record.confidence < summary.confidence_min:
+                    summary.confidence_min = record.confidence
+                if summary.confidence_max is None or record.confidence > summary.confidence_max:
+                    summary.confidence_max = record.confidence
+                if summary.last_classified_at is None or record.timestamp > summary.last_classified_at:
+                    summary.last_classified_at = record.timestamp
+            window = summary.recent_features + [
+                _window_entry(record.id, record.timestamp, record.features)
+                for record in rows if record.features is not None
+            ]
+            window.sort(key=_window_order)
+            summary.recent_features = window[-size:]
+            summary.save()
+
+
+def remove_history(record, history_id):
+    """Take the deleted history row ``history_id`` out of its session's summary.
+
+    Called by ClassificationHistory.delete; queryset deletes rebuild the
+    summaries of the sessions they touched instead.
+
+    Counts and sums are decremented. Minimum, maximum, latest time and the
+    feature window cannot be, so they are re-read from the remaining rows,
+    and only when the deleted row was one holding them.
+    """
+    if record.session_id is None:
+        return
+    with transaction.atomic():
+        summary = PatientSessionSummary.objects.select_for_update().filter(session_id=record.session_id).first()
+        if summary is None:
+            # The session itself is being deleted.
+            return
+        summary.count = max(summary.count - 1, 0)
+        summary.atypical_count = max(summary.atypical_count - (record.prediction_label == ATYPICAL), 0)
+        summary.confidence_sum -= record.confidence
+        if any(entry[0] == history_id for entry in summary.recent_features):
+            size = summary_settings()['FEATURE_WINDOW']
+            summary.recent_features = _recent_features(ClassificationHistory, [record.session_id], size)[record.session_id]
+        if not summary.count:
+            _reset(summary)
+        elif record.confidence in (summary.confidence_min, summary.confidence_max) or record.timestamp == summary.last_classified_at:
+            bounds = ClassificationHistory.objects.filter(session_id=record.session_id).aggregate(
+                low=Min('confidence'), high=Max('confidence'), last=Max('timestamp'),
+            )
+            summary.confidence_min = bounds['low']
+            summary.confidence_max = bounds['high']
+            summary.last_classified_at = bounds['last']
+        summary.save()
+
+
+def _reset(summary):
+    summary.count = summary.atypical_count = 0
+    summary.confidence_sum = 0.0
+    summary.confidence_min = summary.confidence_max = None
+    summary.last_classified_at = None
+    summary.recent_features = []
+
+
+def rebuild(session_ids=None, models=None):
+    """Recompute summaries from the history; all sessions unless ``session_ids``.
+
+    ``models`` is a (PatientSession, ClassificationHistory,
+    PatientSessionSummary) triple to use instead of the current models, for
+    data migrations. Returns the number of summaries written.
+    """
+    models = models or _MODELS
+    sessions = models[0].objects.all()
+    if session_ids is not None:
+        sessions = sessions.filter(id__in=session_ids)
+    summaries = _aggregate(sessions, models)
+    with transaction.atomic():
+        models[2].objects.filter(session__in=sessions).delete()
+        models[2].objects.bulk_create(summaries)
+    return len(summaries)
+
+
+def _aggregate(sessions, models):
+    """Unsaved summaries of the ``sessions`` queryset, computed from the history."""
+    PatientSession, ClassificationHistory, PatientSessionSummary = models
+    totals = sessions.annotate(
+        n=Count('classificationhistory'),
+        atypical=Count('classificationhistory', filter=Q(classificationhistory__prediction_label=ATYPICAL)),
+        confidence_sum=Sum('classificationhistory__confidence'),
+        low=Min('classificationhistory__confidence'),
+        high=Max('classificationhistory__confidence'),
+        last=Max('classificationhistory__timestamp'),
+    ).values('id', 'n', 'atypical', 'confidence_sum', 'low', 'high', 'last')
+
+    windows = _recent_features(ClassificationHistory, sessions, summary_settings()['FEATURE_WINDOW'])
+
+    summaries = []
+    for total in totals:
+        summaries.append(PatientSessionSummary(
+            session_id=total['id'],
+            count=total['n'],
+            atypical_count=total['atypical'],
+            confidence_sum=total['confidence_sum'] or 0.0,
+            confidence_min=total['low'],
+            confidence_max=total['high'],
+            last_classified_at=total['last'],
+            recent_features=windows.get(total['id'], []),
+        ))
+    return summaries
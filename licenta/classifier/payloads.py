@@ -0,0 +1,146 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+from django.conf import settings
+
+from .storage import UnpackedSessions
+
+DEFAULT_DIRECTORY = os.path.join('classifier_data', 'payloads')
+DEFAULT_TTL = 24 * 60 * 60
+DEFAULT_UNPACKED_BYTES = 64 * 1024 * 1024
+SUFFIX = '.bin'
+# Payloads written before SUFFIX changed; renamed to SUFFIX when read and
+# evicted like the others.
+LEGACY_SUFFIXES = ('.npz',)
+_KEY_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+def payload_settings():
+    config = getattr(settings, 'CLASSIFIER_PAYLOAD_STORE', {})
+    return {
+        'DIRECTORY': os.path.join(settings.BASE_DIR, config.get('DIRECTORY', DEFAULT_DIRECTORY)),
+        'TTL': config.get('TTL', DEFAULT_TTL),
+        'UNPACKED_BYTES': config.get('UNPACKED_BYTES', DEFAULT_UNPACKED_BYTES),
+    }
+
+
+class PayloadStore:
+    """Blobs kept on disk between requests: packed sessions for the explore
+    page (storage.pack_session) and the results of batch analyses.
+
+    Files are named by a hash of their content, so storing the same session
+    twice costs nothing. Every read refreshes a file's mtime; files not read or
+    written for ``ttl`` seconds are removed by ``evict``, which ``put`` runs
+    at most once per tenth of the TTL.
+    """
+
+    def __init__(self, directory, ttl=DEFAULT_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._evicted_at = 0.0
+
+    def _path(self, key):
+        if not _KEY_RE.match(key):
+            raise ValueError(f"Invalid payload key {key!r}")
+        path = os.path.join(self.directory, key + SUFFIX)
+        if not os.path.exists(path):
+            for suffix in LEGACY_SUFFIXES:
+                try:
+                    os.replace(os.path.join(self.directory, key + suffix), path)
+                except FileNotFoundError:
+                    continue
+                break
+        return path
+
+    def put(self, blob):
+        """Store ``blob`` and return its key."""
+        key = hashlib.blake2b(blob, digest_size=16).hexdigest()
+        path = self._path(key)
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as fh:
+                    fh.write(blob)
+                os.replace(tmp, path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        now = time.time()
+        if now - self._evicted_at >= self.ttl / 10:
+            self._evicted_at = now
+            self.evict(now)
+        return key
+
+    def get(self, key):
+        """The blob stored under ``key``, or None if it is unknown or expired."""
+        try:
+            path = self._path(key)
+            with open(path, 'rb') as fh:
+                blob = fh.read()
+            os.utime(path)
+        except (ValueError, OSError):
+            return None
+        return blob
+
+    def touch(self, key):
+        """Refresh the idle time of ``key``; False if it is unknown or expired."""
+        try:
+            os.utime(self._path(key))
+        except (ValueError, OSError):
+            return False
+        return True
+
+    def delete(self, key):
+        try:
+            os.unlink(self._path(key))
+        except (ValueError, FileNotFoundError):
+            pass
+
+    def evict(self, now=None):
+        """Remove payloads idle for longer than the TTL; returns how many."""
+        cutoff = (time.time() if now is None else now) - self.ttl
+        removed = 0
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            if not name.endswith((SUFFIX, '.tmp') + LEGACY_SUFFIXES):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+
+_store = None
+
+
+def payload_store():
+    """The PayloadStore configured by CLASSIFIER_PAYLOAD_STORE."""
+    global _store
+    config = payload_settings()
+    if _store is None or (_store.directory, _store.ttl) != (config['DIRECTORY'], config['TTL']):
+        _store = PayloadStore(config['DIRECTORY'], config['TTL'])
+    return _store
+
+
+_unpacked = None
+
+
+def unpacked_sessions():
+    """The process's storage.UnpackedSessions, sized by CLASSIFIER_PAYLOAD_STORE['UNPACKED_BYTES']."""
+    global _unpacked
+    max_bytes = payload_settings()['UNPACKED_BYTES']
+    if _unpacked is None or _unpacked.max_bytes != max_bytes:
+        _unpacked = UnpackedSessions(max_bytes)
+    return _unpacked
@@ -0,0 +1,18 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+def _init_django_worker(settings_module):
+    # Needed when worker processes are spawned rather than forked.
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def django_process_pool(max_workers):
+    """A ProcessPoolExecutor whose workers can import models and read settings."""
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_django_worker,
+        initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'licenta.settings'),),
+    )
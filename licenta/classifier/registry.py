@@ -0,0 +1,236 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from joblib import load
+from django.conf import settings
+
+from .features import DEFAULT_FEATURE_SET, model_feature_set
+from .forest import CompiledForest
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.path.dirname(__file__)
+DEFAULT_MODEL_PATHS = {
+    'standard': os.path.join(MODEL_DIR, 'classifier_model.joblib'),
+    'extra': os.path.join(MODEL_DIR, 'classifier_model_extra.pkl'),
+}
+DEFAULT_CHECK_INTERVAL = 2.0
+DEFAULT_NATIVE_MAX_ROWS = 500
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for block in iter(lambda: fh.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def model_nbytes(model):
+    """Approximate in-memory size of a fitted model."""
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is not None and all(hasattr(est, 'tree_') for est in estimators):
+        total = 0
+        for est in estimators:
+            state = est.tree_.__getstate__()
+            total += state['nodes'].nbytes + state['values'].nbytes
+        return total
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+class LoadedModel:
+    """One loaded artifact and the metadata it was loaded with."""
+
+    def __init__(self, name, path, model=None, stat=None, version=None,
+                 load_seconds=None, memory_bytes=None, error=None, predictor=None,
+                 feature_set=DEFAULT_FEATURE_SET):
+        self.name = name
+        self.path = path
+        self.model = model
+        # What scoring code calls predict_proba on: the compiled forest when
+        # available, otherwise the estimator itself.
+        self.predictor = predictor if predictor is not None else model
+        # The features.FEATURE_EXTRACTORS the model was trained on, in order.
+        self.feature_set = feature_set
+        self.stat = stat
+        self.version = version
+        self.loaded_at = time.time()
+        self.load_seconds = load_seconds
+        self.memory_bytes = memory_bytes
+        self.error = error
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'path': self.path,
+            'loaded': self.model is not None,
+            'engine': type(self.predictor).__name__ if self.predictor is not None else None,
+            'feature_set': list(self.feature_set),
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'load_seconds': self.load_seconds,
+            'memory_bytes': self.memory_bytes,
+            'error': self.error,
+        }
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class ModelRegistry:
+    """Process-wide owner of the classifier models.
+
+    Models are loaded on first use and shared by views and API. Every
+    ``check_interval`` seconds the artifact file is stat'ed; when it changed
+    the model is loaded again and swapped in atomically, so requests always
+    see either the old or the new model, never a half-loaded one.
+    """
+
+    def __init__(self, paths=None, check_interval=None):
+        self._paths = paths
+        self._check_interval = check_interval
+        self._entries = {}
+        self._last_check = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    @property
+    def paths(self):
+        if self._paths is None:
+            self._paths = {**DEFAULT_MODEL_PATHS, **getattr(settings, 'CLASSIFIER_MODEL_PATHS', {})}
+        return self._paths
+
+    @property
+    def check_interval(self):
+        if self._check_interval is None:
+            self._check_interval = getattr(settings, 'CLASSIFIER_MODEL_CHECK_INTERVAL', DEFAULT_CHECK_INTERVAL)
+        return self._check_interval
+
+    def names(self):
+        return list(self.paths)
+
+    def add_reload_listener(self, callback):
+        """Call ``callback(name, entry)`` after a model is (re)loaded."""
+        self._listeners.append(callback)
+
+    def _name_lock(self, name):
+        with self._lock:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def _load(self, name):
+        path = self.paths[name]
+        stat = _stat_key(path)
+        if stat is None:
+            logger.error("Model artifact %s not found at %s", name, path)
+            return LoadedModel(name, path, error="Model file not found.")
+        started = time.perf_counter()
+        try:
+            model = load(path)
+            feature_set = model_feature_set(model)
+            version = f"{name}-{_file_digest(path)}"
+            memory = model_nbytes(model)
+            predictor = None
+            if getattr(settings, 'CLASSIFIER_NATIVE_INFERENCE', True) and CompiledForest.supports(model):
+                max_rows = getattr(settings, 'CLASSIFIER_NATIVE_MAX_ROWS', DEFAULT_NATIVE_MAX_ROWS)
+                predictor = CompiledForest(model, max_rows)
+                memory += predictor.nbytes
+        except Exception as e:
+            logger.exception("Error loading model %s from %s", name, path)
+            return LoadedModel(name, path, stat=stat, error=str(e))
+        return LoadedModel(
+            name, path, model=model, stat=stat, version=version,
+            load_seconds=round(time.perf_counter() - started, 4), memory_bytes=memory,
+            predictor=predictor, feature_set=feature_set,
+        )
+
+    def _replacement(self, current, loaded):
+        # A broken or half-written artifact must not take down a model that
+        # is already serving; keep it and remember the failure instead.
+        if loaded.model is None and current is not None and current.model is not None:
+            current.stat = loaded.stat
+            current.error = loaded.error
+            return current
+        return loaded
+
+    def _swap(self, name, entry):
+        self._entries[name] = entry
+        self._last_check[name] = time.monotonic()
+        for callback in self._listeners:
+            try:
+                callback(name, entry)
+            except Exception:
+                logger.exception("Model reload listener failed for %s", name)
+
+    def entry(self, name):
+        """The current LoadedModel for ``name``, loading or reloading it if needed."""
+        if name not in self.paths:
+            raise KeyError(f"Unknown model '{name}'")
+        entry = self._entries.get(name)
+        now = time.monotonic()
+        if entry is not None and now - self._last_check.get(name, 0) < self.check_interval:
+            return entry
+        with self._name_lock(name):
+            entry = self._entries.get(name)
+            if entry is None:
+                self._swap(name, self._load(name))
+            elif time.monotonic() - self._last_check.get(name, 0) >= self.check_interval:
+                if _stat_key(entry.path) != entry.stat:
+                    logger.info("Model artifact %s changed on disk, reloading", name)
+                    self._swap(name, self._replacement(entry, self._load(name)))
+                else:
+                    self._last_check[name] = time.monotonic()
+            return self._entries[name]
+
+    def get(self, name):
+        """The fitted model for ``name``, or None if it could not be loaded."""
+        return self.entry(name).model
+
+    def predictor(self, name):
+        """What to score with: the compiled forest, or the model itself."""
+        return self.entry(name).predictor
+
+    def version(self, name):
+        return self.entry(name).version
+
+    def feature_set(self, name):
+        """The feature extractors to run for ``name`` (features.extract)."""
+        return self.entry(name).feature_set
+
+    def reload(self, name=None):
+        """Force a reload of one model, or of all of them."""
+        names = [name] if name else self.names()
+        for n in names:
+            with self._name_lock(n):
+                self._swap(n, self._replacement(self._entries.get(n), self._load(n)))
+        return [self._entries[n] for n in names]
+
+    def touch(self, name=None):
+        """Bump the artifact mtime so every worker process reloads it.
+
+        Other processes notice within ``check_interval``; this process is
+        reloaded right away.
+        """
+        names = [name] if name else self.names()
+        for n in names:
+            if os.path.exists(self.paths[n]):
+                os.utime(self.paths[n])
+        return self.reload(name)
+
+    def status(self):
+        return {
+            name: (self._entries[name].as_dict() if name in self._entries
+                   else {'name': name, 'path': path, 'loaded': False})
+            for name, path in self.paths.items()
+        }
+
+
+registry = ModelRegistry()
@@ -0,0 +1,467 @@
+import io
+import json
+import threading
+import warnings
+from collections import OrderedDict
+from datetime import datetime
+from operator import itemgetter
+import numpy as np
+
+from .parsing import parse_vector
+
+FORMAT_VERSION = 1
+
+# Known per-sample vector streams, in the key order the headset writes them.
+STREAMS = (
+    'HeadPosition', 'HeadRotation', 'HeadForward',
+    'LeftHandPosition', 'LeftHandRotation', 'LeftHandForward',
+    'RightHandPosition', 'RightHandRotation', 'RightHandForward',
+)
+AXES = ('x', 'y', 'z')
+
+# Bits of the per-sample presence mask.
+ID_BIT = 1 << 0
+DATETIME_BIT = 1 << 1
+STREAM_BITS = {name: 1 << (i + 2) for i, name in enumerate(STREAMS)}
+
+
+def _is_id(value):
+    return type(value) is int and -2 ** 63 <= value < 2 ** 63
+
+
+def parse_timestamps(date_times):
+    """Vectorized dateTime parsing to datetime64[ms]; unparseable -> NaT."""
+    stripped = np.array([s[:-1] if s.endswith('Z') else s for s in date_times], dtype=object)
+    try:
+        with warnings.catch_warnings():
+            # Offsets other than Z only warn in NumPy; handle them below.
+            warnings.simplefilter('error')
+            return stripped.astype('datetime64[ms]')
+    except (ValueError, UserWarning):
+        pass
+    out = np.full(len(stripped), np.datetime64('NaT'), dtype='datetime64[ms]')
+    for i, s in enumerate(stripped):
+        if not s:
+            continue
+        try:
+            dt = datetime.fromisoformat(s)
+        except ValueError:
+            continue
+        if dt.tzinfo is not None:
+            dt = dt.replace(tzinfo=None) - dt.utcoffset()
+        out[i] = np.datetime64(dt, 'ms')
+    return out
+
+
+class PackedStrings:
+    """Read-only sequence over strings stored back to back in one buffer.
+
+    ``offsets`` has one more entry than there are strings; string ``i`` is
+    ``data[offsets[i]:offsets[i + 1]]``. Only the strings that are indexed
+    get decoded, so slicing a long session stays proportional to the slice.
+    """
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def _decode(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._decode(index)
+
+    def __iter__(self):
+        return (self._decode(i) for i in range(len(self)))
+
+
+class SessionArrays:
+    """Columnar view of one session: one (N, 3) array per stream plus ids,
+    dateTime strings and parsed timestamps.
+
+    ``mask`` marks, per sample, which of id/dateTime/streams carry a value.
+    Samples that do not fit the columns exactly (extra keys, string numbers,
+    non-object rows) are kept verbatim in ``extras`` for lossless rebuilds;
+    their numeric values are still mirrored into the columns where usable.
+    """
+
+    def __init__(self, count, mask, ids, date_times, timestamps, streams, extras):
+        self.count = count
+        self.mask = mask
+        self.ids = ids
+        self.date_times = date_times
+        self.timestamps = timestamps
+        self.streams = streams
+        self.extras = extras
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the columns."""
+        total = self.mask.nbytes + self.ids.nbytes + self.timestamps.nbytes
+        total += sum(values.nbytes for values in self.streams.values())
+        if isinstance(self.date_times, PackedStrings):
+            total += len(self.date_times.data) + 8 * len(self.date_times.offsets)
+        else:
+            total += sum(len(s) for s in self.date_times)
+        return total
+
+    def has(self, name):
+        return name in self.streams
+
+    def stream(self, name):
+        """(N, 3) float64 values for a stream; NaN where the sample lacks it."""
+        values = self.streams.get(name)
+        if values is None:
+            return np.full((self.count, 3), np.nan)
+        return values.astype(np.float64)
+
+    def valid(self, *names):
+        bits = 0
+        for name in names:
+            bits |= STREAM_BITS[name]
+        return (self.mask & bits) == bits
+
+    def positions(self):
+        """HeadPosition+HeadForward matrix, identical to parse_session's."""
+        rows = self.valid('HeadPosition', 'HeadForward')
+        return np.ascontiguousarray(np.hstack([
+            self.stream('HeadPosition')[rows],
+            self.stream('HeadForward')[rows],
+        ]))
+
+    def time_range(self, start=None, end=None):
+        """``(start, stop)`` indices of the samples timed within [start, end].
+
+        Bounds are datetime64 values (None leaves that side open). Recordings
+        are written in time order, so this is normally two binary searches;
+        otherwise it spans the first to the last sample inside the range.
+        """
+        ts = self.timestamps
+        lo = np.datetime64(start, 'ms') if start is not None else None
+        hi = np.datetime64(end, 'ms') if end is not None else None
+        if self.count and not np.isnat(ts).any() and (ts[1:] >= ts[:-1]).all():
+            first = np.searchsorted(ts, lo, side='left') if lo is not None else 0
+            stop = np.searchsorted(ts, hi, side='right') if hi is not None else self.count
+            return int(first), int(max(first, stop))
+        inside = ~np.isnat(ts)
+        if lo is not None:
+            inside &= ts >= lo
+        if hi is not None:
+            inside &= ts <= hi
+        rows = np.flatnonzero(inside)
+        if not len(rows):
+            return 0, 0
+        return int(rows[0]), int(rows[-1]) + 1
+
+    def to_json_list(self, start=0, stop=None):
+        """Rebuild the original sample dicts for ``[start:stop]``."""
+        start, stop, _ = slice(start, stop).indices(self.count)
+        mask = self.mask[start:stop].tolist()
+        ids = self.ids[start:stop].tolist()
+        date_times = self.date_times[start:stop]
+        columns = [
+            (name, STREAM_BITS[name], self.streams[name][start:stop].tolist())
+            for name in STREAMS if name in self.streams
+        ]
+        out = []
+        for offset, bits in enumerate(mask):
+            i = start + offset
+            if i in self.extras:
+                out.append(self.extras[i])
+                continue
+            entry = {}
+            if bits & ID_BIT:
+                entry['id'] = ids[offset]
+            if bits & DATETIME_BIT:
+                entry['dateTime'] = date_times[offset]
+            for name, bit, values in columns:
+                if bits & bit:
+                    x, y, z = values[offset]
+                    entry[name] = {'x': x, 'y': y, 'z': z}
+            out.append(entry)
+        return out
+
+    def to_json(self):
+        return json.dumps(self.to_json_list())
+
+
+def _compact(values):
+    # float32 halves the size and is exact for headset data, which is
+    # float32 to begin with; keep float64 for anything that would change.
+    as32 = values.astype(np.float32)
+    if np.array_equal(as32.astype(np.float64), values, equal_nan=True):
+        return as32
+    return values
+
+
+# Samples read a key at a time together by session_arrays: few enough that
+# their dicts stay in the CPU cache across the per-key passes.
+READ_CHUNK = 512
+_FIELDS = ('id', 'dateTime')
+
+
+def _is_plain_vector(value):
+    return (type(value) is dict and len(value) == 3 and type(value.get('x')) is float
+            and type(value.get('y')) is float and type(value.get('z')) is float)
+
+
+def _vector_column(values):
+    """(M, 3) coordinates of stream values and which of them are plain (None: all)."""
+    try:
+        if set(map(type, values)) == {dict} and set(map(len, values)) == {3}:
+            coords = [list(map(itemgetter(axis), values)) for axis in AXES]
+            if all(set(map(type, column)) == {float} for column in coords):
+                out = np.empty((len(values), 3))
+                for j, column in enumerate(coords):
+                    out[:, j] = column
+                return out, None
+    except KeyError:
+        pass
+    plain = np.fromiter(map(_is_plain_vector, values), dtype=bool, count=len(values))
+    out = np.zeros((len(values), 3))
+    for i in np.flatnonzero(plain).tolist():
+        value = values[i]
+        out[i] = value['x'], value['y'], value['z']
+    return out, plain
+
+
+def _field_column(key, values):
+    """id or dateTime values and which of them are plain (None: all)."""
+    if key == 'dateTime':
+        plain = np.fromiter((type(v) is str for v in values), dtype=bool, count=len(values))
+        return values, None if plain.all() else plain
+    if set(map(type, values)) == {int}:
+        try:
+            return np.array(values, dtype=np.int64), None
+        except OverflowError:
+            pass
+    plain = np.fromiter(map(_is_id, values), dtype=bool, count=len(values))
+    return np.array([v if ok else 0 for v, ok in zip(values, plain)], dtype=np.int64), plain
+
+
+class _Columns:
+    """Column buffers of session_arrays, filled a key or a sample at a time."""
+
+    def __init__(self, n):
+        self.n = n
+        self.mask = np.zeros(n, dtype=np.uint16)
+        self.ids = np.zeros(n, dtype=np.int64)
+        self.date_times = [''] * n
+        self.streams = {}
+        self.extras = {}
+
+    def stream(self, name):
+        values = self.streams.get(name)
+        if values is None:
+            values = self.streams[name] = np.full((self.n, 3), np.nan)
+        return values
+
+    def read(self, samples, start, keys):
+        """Read ``samples`` (from index ``start``) a key at a time.
+
+        Only samples with exactly ``keys``, all holding plain values, are
+        read; returns the indexes of the others, for add_entry.
+        """
+        count = len(samples)
+        if set(map(type, samples)) == {dict} and all(map(keys.__eq__, map(dict.keys, samples))):
+            plain = np.ones(count, dtype=bool)
+        else:
+            plain = np.fromiter((type(s) is dict and s.keys() == keys for s in samples), dtype=bool, count=count)
+            if not plain.any():
+                return list(range(start, start + count))
+            stand_in = samples[int(np.argmax(plain))]
+            samples = [s if ok else stand_in for s, ok in zip(samples, plain.tolist())]
+        values = {}
+        for key in keys:
+            column = list(map(itemgetter(key), samples))
+            values[key], ok = _field_column(key, column) if key in _FIELDS else _vector_column(column)
+            if ok is not None:
+                plain &= ok
+        if not plain.any():
+            return list(range(start, start + count))
+
+        rows = slice(start, start + count)
+        bits = 0
+        for key, column in values.items():
+            if key == 'dateTime':
+                if plain.all():
+                    self.date_times[rows] = column
+                else:
+                    for i in np.flatnonzero(plain).tolist():
+                        self.date_times[start + i] = column[i]
+                bits |= DATETIME_BIT
+            elif key == 'id':
+                self.ids[rows][plain] = column[plain]
+                bits |= ID_BIT
+            else:
+                self.stream(key)[rows][plain] = column[plain]
+                bits |= STREAM_BITS[key]
+        self.mask[rows][plain] = bits
+        return (start + np.flatnonzero(~plain)).tolist()
+
+    def add_entry(self, i, entry):
+        """Sample ``i``, checking each key on its own; for samples read() leaves."""
+        if type(entry) is not dict:
+            self.extras[i] = entry
+            return
+        # A sample is "plain" when the columns alone rebuild it exactly.
+        plain = True
+        bits = 0
+        for key, value in entry.items():
+            bit = STREAM_BITS.get(key)
+            if bit is not None:
+                plain = plain and _is_plain_vector(value)
+                try:
+                    self.stream(key)[i] = parse_vector(value)
+                except (KeyError, ValueError, TypeError):
+                    continue
+                bits |= bit
+            elif key == 'id' and _is_id(value):
+                self.ids[i] = value
+                bits |= ID_BIT
+            elif key == 'dateTime' and type(value) is str:
+                self.date_times[i] = value
+                bits |= DATETIME_BIT
+            else:
+                plain = False
+        self.mask[i] = bits
+        if not plain:
+            self.extras[i] = entry
+
+
+def session_arrays(data):
+    """Columnar SessionArrays of a decoded session (list of sample dicts).
+
+    This is what pack_session stores, without the compression step, for
+    code that wants the columns of a session that is not in the database.
+    Samples with the first sample's keys are read a key at a time, like
+    parse_session's fast path; only the others, and samples whose values do
+    not fit the columns exactly, are read one by one.
+    """
+    if not isinstance(data, list):
+        raise ValueError("Session data must be a JSON array of samples")
+    n = len(data)
+    columns = _Columns(n)
+    keys = data[0].keys() if n and type(data[0]) is dict else None
+    if keys is not None and all(key in STREAM_BITS or key in _FIELDS for key in keys):
+        for start in range(0, n, READ_CHUNK):
+            for i in columns.read(data[start:start + READ_CHUNK], start, keys):
+                columns.add_entry(i, data[i])
+    else:
+        for i, entry in enumerate(data):
+            columns.add_entry(i, entry)
+
+    return SessionArrays(
+        count=n,
+        mask=columns.mask,
+        ids=columns.ids,
+        date_times=columns.date_times,
+        timestamps=parse_timestamps(columns.date_times),
+        streams={name: _compact(values) for name, values in columns.streams.items()},
+        extras=columns.extras,
+    )
+
+
+def pack_session(data):
+    """Encode a decoded session (list of sample dicts) as a compressed blob."""
+    return pack_arrays(session_arrays(data))
+
+
+def pack_arrays(session):
+    """Encode SessionArrays in the pack_session format."""
+    encoded = [s.encode('utf-8') for s in session.date_times]
+    dt_offsets = np.zeros(session.count + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=dt_offsets[1:])
+    meta = {'version': FORMAT_VERSION, 'count': session.count, 'streams': list(session.streams)}
+    extras = [[i, entry] for i, entry in session.extras.items()]
+
+    arrays = {
+        'meta': np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8),
+        'mask': session.mask,
+        'ids': session.ids,
+        'dt_data': np.frombuffer(b''.join(encoded), dtype=np.uint8),
+        'dt_offsets': dt_offsets,
+        'timestamps': session.timestamps,
+        'extras': np.frombuffer(json.dumps(extras).encode('utf-8'), dtype=np.uint8),
+    }
+    for name, values in session.streams.items():
+        arrays['s_' + name] = values
+
+    buf = io.BytesIO()
+    np.savez_compressed(buf, **arrays)
+    return buf.getvalue()
+
+
+def unpack_session(blob):
+    """Decode a blob produced by pack_session into SessionArrays."""
+    with np.load(io.BytesIO(bytes(blob)), allow_pickle=False) as archive:
+        meta = json.loads(archive['meta'].tobytes())
+        if meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported session format version {meta['version']}")
+        date_times = PackedStrings(archive['dt_data'].tobytes(), archive['dt_offsets'].tolist())
+        return SessionArrays(
+            count=meta['count'],
+            mask=archive['mask'],
+            ids=archive['ids'],
+            date_times=date_times,
+            timestamps=archive['timestamps'],
+            streams={name: archive['s_' + name] for name in meta['streams']},
+            extras={i: entry for i, entry in json.loads(archive['extras'].tobytes())},
+        )
+
+
+class UnpackedSessions:
+    """Bounded in-process LRU of unpacked SessionArrays.
+
+    A packed session's members are each compressed whole, so reading any
+    sample means inflating every column. Pages of the explore view come
+    from the same session one after another; keeping it unpacked makes
+    each later page cost its own rows only. Keys must name immutable
+    content. Sessions are dropped least recently used first once their
+    total size exceeds ``max_bytes``; a single larger session is not kept.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        """The arrays stored under ``key``, calling ``load()`` on a miss.
+
+        ``load`` returns SessionArrays or None; None is not kept.
+        """
+        with self._lock:
+            arrays = self._entries.get(key)
+            if arrays is not None:
+                self._entries.move_to_end(key)
+                return arrays
+        arrays = load()
+        if arrays is None or arrays.nbytes > self.max_bytes:
+            return arrays
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = arrays
+                self._bytes += arrays.nbytes
+            while self._bytes > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self._bytes -= dropped.nbytes
+        return arrays
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,204 @@
+import codecs
+import json
+import numpy as np
+from .cache import SessionHasher
+from .parsing import parse_session, COLUMNS
+
+READ_SIZE = 64 * 1024
+CHUNK_ROWS = 4096
+# A single sample larger than this is treated as malformed input.
+MAX_ELEMENT_SIZE = 8 * 1024 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_DELIMITERS = _WHITESPACE + ',]'
+
+
+class RunningStatistics:
+    """Running per-column mean/variance over blocks of samples.
+
+    Blocks are merged with Chan et al.'s parallel form of Welford's update,
+    so feeding a session in any chunking yields the same values as
+    ``np.mean``/``np.var`` over the whole matrix, up to rounding.
+    """
+
+    def __init__(self, width=len(COLUMNS)):
+        self.count = 0
+        self.mean = np.zeros(width)
+        self.m2 = np.zeros(width)
+
+    def update(self, block):
+        block = np.asarray(block, dtype=np.float64)
+        n_b = len(block)
+        if not n_b:
+            return
+        mean_b = block.mean(axis=0)
+        m2_b = ((block - mean_b) ** 2).sum(axis=0)
+        self._merge(n_b, mean_b, m2_b)
+
+    def merge(self, other):
+        if other.count:
+            self._merge(other.count, other.mean, other.m2)
+
+    def _merge(self, n_b, mean_b, m2_b):
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean = self.mean + delta * (n_b / n)
+        self.m2 = self.m2 + m2_b + delta ** 2 * (n_a * n_b / n)
+        self.count = n
+
+    @property
+    def var(self):
+        if not self.count:
+            return np.full_like(self.m2, np.nan)
+        return self.m2 / self.count
+
+    def features(self):
+        """Same layout as models.calculate_statistics: means then variances."""
+        return np.hstack([self.mean, self.var])
+
+    def state(self):
+        """Plain-Python snapshot, e.g. for storing in Django's cache."""
+        return {'count': self.count, 'mean': self.mean.tolist(), 'm2': self.m2.tolist()}
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls(len(state['mean']))
+        stats.count = state['count']
+        stats.mean = np.array(state['mean'], dtype=np.float64)
+        stats.m2 = np.array(state['m2'], dtype=np.float64)
+        return stats
+
+
+def iter_json_array(stream, read_size=READ_SIZE):
+    """Yield the elements of a top-level JSON array from a binary stream.
+
+    Only one read buffer plus the element being decoded is held in memory.
+    Raises json.JSONDecodeError on malformed input.
+    """
+    reader = codecs.getincrementaldecoder('utf-8-sig')()
+    buf = ''
+    pos = 0
+    eof = False
+    after_comma = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = stream.read(read_size)
+        if not chunk:
+            eof = True
+            buf = buf[pos:] + reader.decode(b'', final=True)
+        else:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            buf = buf[pos:] + reader.decode(chunk)
+        pos = 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_ws()
+    if pos >= len(buf) or buf[pos] != '[':
+        raise json.JSONDecodeError("Expected a JSON array", buf, pos)
+    pos += 1
+    while True:
+        skip_ws()
+        if pos >= len(buf):
+            raise json.JSONDecodeError("Unterminated JSON array", buf, pos)
+        if buf[pos] == ']':
+            if after_comma:
+                raise json.JSONDecodeError("Trailing comma in JSON array", buf, pos)
+            return
+        while True:
+            try:
+                value, end = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof or len(buf) - pos > MAX_ELEMENT_SIZE:
+                    raise
+                fill()
+                continue
+            # A number cut by the read boundary ("2.5" of "2.5e3") decodes
+            # fine, so only accept a value once its delimiter is visible.
+            if not eof and (end == len(buf) or buf[end] not in _DELIMITERS):
+                if len(buf) - pos > MAX_ELEMENT_SIZE:
+                    break
+                fill()
+                continue
+            break
+        yield value
+        pos = end
+        skip_ws()
+        if pos >= len(buf):
+            raise json.JSONDecodeError("Unterminated JSON array", buf, pos)
+        if buf[pos] == ',':
+            pos += 1
+            after_comma = True
+        elif buf[pos] == ']':
+            return
+        else:
+            raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+        # Keep the buffer from growing with everything already consumed.
+        if pos > read_size:
+            buf = buf[pos:]
+            pos = 0
+
+
+class StreamedSession:
+    """Result of stream_statistics: accumulators plus parse bookkeeping."""
+
+    def __init__(self):
+        self.stats = RunningStatistics()
+        self.hasher = SessionHasher()
+        self.total = 0
+        self.dropped = {}
+
+    @property
+    def count(self):
+        return self.stats.count
+
+    @property
+    def dropped_count(self):
+        return sum(self.dropped.values())
+
+    def add(self, entries):
+        parsed = parse_session(entries)
+        self.stats.update(parsed.positions)
+        self.hasher.update(parsed.positions)
+        self.total += parsed.total
+        for reason, n in parsed.dropped.items():
+            self.dropped[reason] = self.dropped.get(reason, 0) + n
+        return parsed
+
+    @property
+    def digest(self):
+        """cache.session_digest of all valid samples seen so far."""
+        return self.hasher.hexdigest()
+
+    def features(self):
+        return self.stats.features()
+
+
+def stream_statistics(stream, chunk_rows=CHUNK_ROWS, read_size=READ_SIZE):
+    """Compute calculate_statistics features from a JSON upload or request body
+    without decoding the whole document.
+
+    ``stream`` is any object with ``read(n)``: an UploadedFile, the
+    HttpRequest itself, or an open file.
+    """
+    session = StreamedSession()
+    entries = []
+    for entry in iter_json_array(stream, read_size=read_size):
+        entries.append(entry)
+        if len(entries) >= chunk_rows:
+            session.add(entries)
+            entries = []
+    if entries:
+        session.add(entries)
+    return session
@@ -0,0 +1,75 @@
+import warnings
+from datetime import timedelta
+import numpy as np
+
+SUMMARY_STREAMS = (
+    'HeadPosition', 'HeadForward', 'HeadRotation',
+    'LeftHandPosition', 'RightHandPosition',
+)
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def _number(value):
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def axis_statistics(arrays, streams=SUMMARY_STREAMS):
+    """{stream: {axis: {mean, std, min, max, p5 ... p95}}} of a storage.SessionArrays.
+
+    The streams present are laid side by side in one (N, 3 * streams) block,
+    NaN where a sample lacks a stream, and every statistic is a single
+    NaN-aware reduction over its columns. Min and max come out of the same
+    percentile call as the quartiles.
+    """
+    present = [name for name in streams if arrays.has(name)]
+    if not present or not arrays.count:
+        return {}
+    block = np.hstack([arrays.stream(name) for name in present])
+    with warnings.catch_warnings():
+        # A stream present on no valid sample leaves an all-NaN column.
+        warnings.simplefilter('ignore', RuntimeWarning)
+        mean = np.nanmean(block, axis=0)
+        std = np.nanstd(block, axis=0)
+        quantiles = np.nanpercentile(block, (0, *PERCENTILES, 100), axis=0)
+    names = ['min', *(f'p{p}' for p in PERCENTILES), 'max']
+    result = {}
+    for s, name in enumerate(present):
+        result[name] = {}
+        for k, axis in enumerate('xyz'):
+            column = 3 * s + k
+            stats = {'mean': _number(mean[column]), 'std': _number(std[column])}
+            stats.update((label, _number(q)) for label, q in zip(names, quantiles[:, column]))
+            result[name][axis] = stats
+    return result
+
+
+def session_summary(arrays, streams=SUMMARY_STREAMS):
+    """Timing and per-axis statistics of a session, as stored with its classification.
+
+    ``first_recorded``/``last_recorded`` are the dateTime strings of the first
+    and last samples with a parseable time; ``duration`` is their difference
+    and ``sampling_rate`` the timed samples per second over it.
+    """
+    timed = np.flatnonzero(~np.isnat(arrays.timestamps))
+    summary = {
+        'sample_count': arrays.count,
+        'first_recorded': 'N/A',
+        'last_recorded': 'N/A',
+        'duration': 'N/A',
+        'duration_seconds': None,
+        'sampling_rate': None,
+    }
+    if len(timed):
+        first, last = int(timed[0]), int(timed[-1])
+        elapsed_ms = int((arrays.timestamps[last] - arrays.timestamps[first]) / np.timedelta64(1, 'ms'))
+        summary.update(
+            first_recorded=arrays.date_times[first],
+            last_recorded=arrays.date_times[last],
+            duration=str(timedelta(milliseconds=elapsed_ms)),
+            duration_seconds=elapsed_ms / 1000,
+        )
+        if elapsed_ms > 0:
+            summary['sampling_rate'] = (len(timed) - 1) / (elapsed_ms / 1000)
+    summary['axis_stats'] = axis_statistics(arrays, streams)
+    return summary
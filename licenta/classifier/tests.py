@@ -1,3 +1,1468 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+import warnings
+from joblib import dump, load
+from sklearn.ensemble import RandomForestClassifier
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from . import patient_stats
 
-# Create your tests here.
+from .analysis import analyse_session, cached_analysis
+from .async_api import _run_view
+from .batch import save_batch_results
+from .batching import MicroBatcher
+from .charts import minmax_indices
+from .cache import ResultCache, result_cache, session_digest
+from .live import LiveStream, StreamBusy
+from .features import extract, feature_columns, FEATURE_EXTRACTORS, FeatureBlock, load_block
+from .forest import CompiledForest
+from .inference import cascade, predict_with_confidence
+from .history import HistoryWriter
+from .models import calculate_statistics, ClassificationHistory, PatientSession, PatientSessionSummary
+from .payloads import PayloadStore, payload_store, unpacked_sessions
+from .pagination import decode_cursor, keyset_page
+from .parsing import parse_session, DROP_MISSING_KEY, DROP_INVALID_VALUE, DROP_INVALID_ENTRY
+from .registry import ModelRegistry, registry
+from .storage import pack_session, SessionArrays, session_arrays, unpack_session
+from .summaries import PERCENTILES, session_summary
+from .training import FeatureStore
+from .streaming import RunningStatistics, iter_json_array, stream_statistics
+
+SAMPLE_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'sample_data.json')
+
+
+def legacy_positions(data):
+    # The per-entry loop the views and API used before parse_session existed.
+    processed_positions = []
+    for entry in data:
+        try:
+            pos = entry['HeadPosition']
+            forw = entry['HeadForward']
+            poz_ml = [float(pos['x']), float(pos['y']), float(pos['z'])]
+            forz_ml = [float(forw['x']), float(forw['y']), float(forw['z'])]
+            processed_positions.append(poz_ml + forz_ml)
+        except (KeyError, ValueError):
+            continue
+    return np.array(processed_positions)
+
+
+def make_session(n, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(size=(n, 6))
+    return [
+        {
+            'id': i,
+            'dateTime': '2025-05-28 10:52:27Z',
+            'HeadPosition': {'x': row[0], 'y': row[1], 'z': row[2]},
+            'HeadForward': {'x': row[3], 'y': row[4], 'z': row[5]},
+        }
+        for i, row in enumerate(values.tolist())
+    ]
+
+
+class TempPayloadStoreMixin:
+    """Keeps explore-page payloads written by a test in a throwaway directory."""
+
+    def setUp(self):
+        super().setUp()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(CLASSIFIER_PAYLOAD_STORE={'DIRECTORY': tmp.name, 'TTL': 3600})
+        override.enable()
+        self.addCleanup(override.disable)
+        # History ids are reused between tests, so start with no unpacked sessions.
+        unpacked_sessions().clear()
+
+
+def open_in_explore(client, data):
+    session = client.session
+    session['explore_payload'] = 'p:' + payload_store().put(pack_session(data))
+    session.save()
+
+
+class ParseSessionTests(SimpleTestCase):
+    def test_matches_legacy_loop_on_clean_session(self):
+        data = make_session(500)
+        parsed = parse_session(data)
+        self.assertEqual(parsed.positions.shape, (500, 6))
+        self.assertTrue(parsed.positions.flags['C_CONTIGUOUS'])
+        self.assertEqual(parsed.dropped_count, 0)
+        np.testing.assert_array_equal(
+            calculate_statistics(parsed.positions),
+            calculate_statistics(legacy_positions(data)),
+        )
+
+    def test_matches_legacy_loop_with_bad_rows(self):
+        data = make_session(200, seed=1)
+        data[3] = {'id': 3, 'Message': 'calibration'}
+        data[10]['HeadForward']['y'] = 'not a number'
+        data[11]['HeadPosition']['x'] = '1.25'
+        del data[20]['HeadPosition']['z']
+        parsed = parse_session(data)
+        self.assertEqual(parsed.total, 200)
+        self.assertEqual(parsed.count, 197)
+        self.assertEqual(parsed.dropped, {DROP_MISSING_KEY: 2, DROP_INVALID_VALUE: 1})
+        np.testing.assert_array_equal(
+            calculate_statistics(parsed.positions),
+            calculate_statistics(legacy_positions(data)),
+        )
+
+    def test_sample_data_file(self):
+        with open(SAMPLE_DATA_PATH) as fh:
+            data = json.load(fh)
+        parsed = parse_session(data)
+        self.assertEqual(parsed.dropped, {DROP_MISSING_KEY: 1})
+        np.testing.assert_array_equal(
+            calculate_statistics(parsed.positions),
+            calculate_statistics(legacy_positions(data)),
+        )
+
+    def test_invalid_entries_and_float32(self):
+        data = make_session(5) + [None, {'HeadPosition': None, 'HeadForward': {}}]
+        parsed = parse_session(data, dtype=np.float32)
+        self.assertEqual(parsed.positions.dtype, np.float32)
+        self.assertEqual(parsed.count, 5)
+        self.assertEqual(parsed.dropped, {DROP_INVALID_ENTRY: 2})
+
+    def test_rejects_non_list(self):
+        with self.assertRaises(ValueError):
+            parse_session({'HeadPosition': {}})
+
+
+class StreamingStatisticsTests(SimpleTestCase):
+    def test_matches_full_parse_for_any_chunking(self):
+        data = make_session(3000, seed=2)
+        data[7] = {'id': 7, 'Message': 'paused'}
+        payload = json.dumps(data, indent=4).encode('utf-8')
+        expected = calculate_statistics(parse_session(data).positions)
+        for read_size, chunk_rows in [(7, 5), (1000, 64), (64 * 1024, 4096)]:
+            session = stream_statistics(io.BytesIO(payload), chunk_rows=chunk_rows, read_size=read_size)
+            self.assertEqual(session.count, 2999)
+            self.assertEqual(session.dropped, {DROP_MISSING_KEY: 1})
+            np.testing.assert_allclose(session.features(), expected, rtol=1e-12, atol=1e-15)
+
+    def test_running_statistics_merge(self):
+        block = np.random.default_rng(3).normal(size=(100, 6))
+        left, right = RunningStatistics(), RunningStatistics()
+        left.update(block[:30])
+        right.update(block[30:])
+        left.merge(right)
+        np.testing.assert_allclose(left.features(), calculate_statistics(block))
+
+    def test_iter_json_array_errors(self):
+        self.assertEqual(list(iter_json_array(io.BytesIO(b' [ ] '))), [])
+        self.assertEqual(list(iter_json_array(io.BytesIO(b'[1, 2.5e3,"a"]'), read_size=1)), [1, 2500.0, 'a'])
+        for bad in [b'{}', b'[1, 2', b'[1,]', b'[1 2]', b'[{"a": }]']:
+            with self.assertRaises(json.JSONDecodeError):
+                list(iter_json_array(io.BytesIO(bad), read_size=3))
+
+
+class SessionStorageTests(SimpleTestCase):
+    def test_round_trip_sample_data(self):
+        with open(SAMPLE_DATA_PATH) as fh:
+            data = json.load(fh)
+        arrays = unpack_session(pack_session(data))
+        self.assertEqual(arrays.to_json_list(), data)
+        self.assertEqual(arrays.to_json_list(1, 3), data[1:3])
+        np.testing.assert_array_equal(arrays.positions(), parse_session(data).positions)
+        self.assertEqual(str(arrays.timestamps[0]), '2025-05-28T10:52:27.000')
+
+    def test_irregular_samples_round_trip(self):
+        data = make_session(50, seed=4)
+        data[0]['HeadPosition']['x'] = '0.5'
+        data[1]['HeadForward'] = None
+        data[2] = ['not', 'a', 'sample']
+        data[3]['id'] = 'abc'
+        data[4]['HeadPosition']['x'] = 3
+        del data[5]['dateTime']
+        arrays = unpack_session(pack_session(data))
+        self.assertEqual(arrays.to_json_list(), data)
+        np.testing.assert_array_equal(arrays.positions(), parse_session(data).positions)
+        self.assertTrue(np.isnat(arrays.timestamps[5]))
+
+    def test_only_irregular_samples_are_kept_whole(self):
+        data = make_session(1200, seed=5)
+        irregular = {
+            7: ('HeadPosition', {'x': 1.0, 'y': 2.0}),
+            600: ('id', True),
+            601: ('id', 2 ** 70),
+            1100: ('dateTime', None),
+            1101: ('HeadForward', {'x': 1.0, 'y': 2.0, 'w': 3.0}),
+            1102: ('Message', 'Paused'),
+        }
+        for i, (key, value) in irregular.items():
+            data[i][key] = value
+        data[900] = {'id': 900, 'HeadForward': {'z': 0.0, 'y': 1.0, 'x': 0.5}, 'dateTime': 'x',
+                     'HeadPosition': {'x': 1.0, 'y': 2.0, 'z': 3.0}}
+        data[901] = None
+        arrays = session_arrays(data)
+        self.assertEqual(sorted(arrays.extras), sorted([*irregular, 901]))
+        self.assertEqual(arrays.to_json_list(), data)
+        self.assertEqual(unpack_session(pack_session(data)).to_json_list(), data)
+        np.testing.assert_array_equal(arrays.positions(), parse_session(data).positions)
+        self.assertFalse(arrays.valid('HeadPosition')[[7, 901]].any())
+        self.assertTrue(arrays.valid('HeadPosition', 'HeadForward')[[600, 601, 900, 1100, 1102]].all())
+
+        # A first sample with unknown keys sends every sample through the slow path.
+        data.insert(0, {'Message': 'Start'})
+        self.assertEqual(session_arrays(data).to_json_list(), data)
+
+
+class HistoryStorageViewTests(TempPayloadStoreMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('clinician', password='secret-pass-123')
+        self.client.force_login(self.user)
+        with open(SAMPLE_DATA_PATH, 'rb') as fh:
+            self.payload = fh.read()
+
+    def test_upload_is_stored_packed_and_explorable(self):
+        upload = SimpleUploadedFile('sample.json', self.payload, content_type='application/json')
+        response = self.client.post(reverse('index'), {'json_file': upload})
+        self.assertEqual(response.status_code, 200)
+        record = ClassificationHistory.objects.get(user=self.user)
+        self.assertEqual(record.raw_json, '')
+        self.assertEqual(json.loads(record.session_json()), json.loads(self.payload))
+
+        response = self.client.get(reverse('history_explore', args=[record.id]))
+        self.assertRedirects(response, reverse('explore_more'))
+        response = self.client.get(reverse('explore_more'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['data_stats']['sample_count'], 5)
+
+    def test_features_are_stored_and_backfilled(self):
+        upload = SimpleUploadedFile('sample.json', self.payload, content_type='application/json')
+        self.client.post(reverse('index'), {'json_file': upload})
+        record = ClassificationHistory.objects.get(user=self.user)
+        expected = calculate_statistics(parse_session(json.loads(self.payload)).positions)
+        np.testing.assert_array_equal(record.features, expected)
+        self.assertEqual(record.model_version, registry.version('standard'))
+
+        old = ClassificationHistory.objects.create(
+            user=self.user, prediction_label='Atypical', confidence=90.0,
+            samples=pack_session(make_session(30, seed=3)),
+        )
+        empty = ClassificationHistory.objects.create(user=self.user, prediction_label='Typical', confidence=50.0)
+        out = io.StringIO()
+        call_command('backfill_features', chunk_size=1, stdout=out)
+        old.refresh_from_db()
+        empty.refresh_from_db()
+        np.testing.assert_array_equal(old.features, old.compute_features())
+        self.assertIsNone(empty.features)
+        self.assertIn('Stored features for 1 rows; 1 rows', out.getvalue())
+
+        self.client.get(reverse('history_explore', args=[old.id]))
+        self.assertEqual(self.client.session['classification_data']['features'], [old.features])
+
+
+class BatchPredictionApiTests(SimpleTestCase):
+    def setUp(self):
+        with open(SAMPLE_DATA_PATH) as fh:
+            self.sample = json.load(fh)
+        self.other = make_session(40, seed=5)
+
+    def single(self, session, url='predict_api'):
+        return self.client.post(reverse(url), json.dumps(session), content_type='application/json').json()
+
+    def test_json_array_matches_single_requests(self):
+        body = [self.sample, {'id': 'b', 'samples': self.other}, {'id': 'c', 'samples': [{}]}, 'oops']
+        response = self.client.post(reverse('predict_batch_api'), json.dumps(body), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 4)
+        for result, session in [(results[0], self.sample), (results[1], self.other)]:
+            expected = self.single(session)
+            for key in ('prediction', 'prediction_label', 'confidence'):
+                self.assertEqual(result[key], expected[key])
+        self.assertEqual(results[1]['id'], 'b')
+        self.assertEqual(results[2]['status'], 'error')
+        self.assertEqual(results[3]['status'], 'error')
+
+    def test_ndjson_extra_model(self):
+        body = json.dumps(self.sample) + '\n{broken\n' + json.dumps(self.other) + '\n'
+        response = self.client.post(reverse('predict_batch_api') + '?model=extra', body, content_type='application/x-ndjson')
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], ['success', 'error', 'success'])
+        expected = self.single(self.other, url='predict_extra_api')
+        self.assertEqual(results[2]['prediction_label'], expected['prediction_label'])
+        self.assertEqual(results[2]['confidence'], expected['confidence'])
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.get(reverse('predict_batch_api')).status_code, 405)
+        response = self.client.post(reverse('predict_batch_api') + '?model=nope', '[]', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('predict_batch_api'), '[[', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class ModelRegistryTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'model.joblib')
+        self.fit_and_dump(0)
+        self.registry = ModelRegistry(paths={'standard': self.path}, check_interval=0)
+
+    def fit_and_dump(self, seed):
+        rng = np.random.default_rng(seed)
+        model = RandomForestClassifier(n_estimators=3, random_state=seed)
+        model.fit(rng.normal(size=(30, 12)), rng.integers(0, 2, 30))
+        dump(model, self.path)
+        # Make sure the mtime moves even on coarse-grained filesystems.
+        st = os.stat(self.path)
+        os.utime(self.path, ns=(st.st_atime_ns, st.st_mtime_ns + seed * 10 ** 9))
+
+    def test_loads_once_and_reloads_on_change(self):
+        reloaded = []
+        self.registry.add_reload_listener(lambda name, entry: reloaded.append(name))
+        first = self.registry.get('standard')
+        self.assertIs(self.registry.get('standard'), first)
+        self.assertEqual(reloaded, ['standard'])
+        entry = self.registry.entry('standard')
+        self.assertGreater(entry.memory_bytes, 0)
+        self.assertIsNotNone(entry.load_seconds)
+
+        self.fit_and_dump(1)
+        self.assertIsNot(self.registry.get('standard'), first)
+        self.assertNotEqual(self.registry.version('standard'), entry.version)
+        self.assertEqual(reloaded, ['standard', 'standard'])
+
+    def test_broken_artifact_keeps_serving_previous_model(self):
+        model = self.registry.get('standard')
+        with open(self.path, 'wb') as fh:
+            fh.write(b'truncated')
+        os.utime(self.path, ns=(0, 10 ** 9))
+        self.assertIs(self.registry.get('standard'), model)
+        self.assertIsNotNone(self.registry.entry('standard').error)
+
+    def test_missing_artifact(self):
+        registry = ModelRegistry(paths={'standard': self.path + '.missing'}, check_interval=0)
+        self.assertIsNone(registry.get('standard'))
+        self.assertFalse(registry.status()['standard']['loaded'])
+
+
+class CascadeTests(TempPayloadStoreMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        with open(SAMPLE_DATA_PATH, 'rb') as fh:
+            self.payload = fh.read()
+
+    def test_cascade_api_matches_separate_endpoints(self):
+        standard = self.client.post(reverse('predict_api'), self.payload, content_type='application/json').json()
+        extra = self.client.post(reverse('predict_extra_api'), self.payload, content_type='application/json').json()
+        response = self.client.post(reverse('predict_cascade_api'), self.payload, content_type='application/json').json()
+        self.assertEqual(response['prediction_label'], standard['prediction_label'])
+        self.assertEqual(response['confidence'], standard['confidence'])
+        if standard['prediction'] == 1:
+            self.assertEqual(response['secondary']['prediction_label'], extra['prediction_label'])
+            self.assertEqual(response['secondary']['confidence'], extra['confidence'])
+        else:
+            self.assertIsNone(response['secondary'])
+
+    def test_only_atypical_rows_reach_secondary_model(self):
+        primary, secondary = registry.get('standard'), registry.get('extra')
+        features = np.vstack([
+            calculate_statistics(parse_session(make_session(60, seed=seed)).positions)
+            for seed in range(8)
+        ])
+        predictions, confidences, secondaries = cascade(primary, secondary, features)
+        for prediction, result in zip(predictions, secondaries):
+            self.assertEqual(result is None, prediction != 1)
+
+    def test_cascade_without_secondary_model(self):
+        missing = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'missing.pkl')
+        self.enterContext(mock.patch.dict(registry._entries))
+        self.enterContext(mock.patch.object(registry, '_paths', {**registry.paths, 'extra': missing}))
+        registry._entries.pop('extra', None)
+        response = self.client.post(reverse('predict_cascade_api'), self.payload, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['secondary'])
+        response = self.client.post(reverse('predict_batch_api') + '?model=cascade', b'[' + self.payload + b']',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.json()['results'][0]['secondary'])
+
+    def test_explore_reuses_secondary_from_upload(self):
+        upload = SimpleUploadedFile('sample.json', self.payload, content_type='application/json')
+        result = self.client.post(reverse('index'), {'json_file': upload}).json()
+        if result['prediction_label'] != 'Atypical':
+            self.skipTest("sample is not classified as Atypical by the shipped model")
+        self.assertIn('secondary', self.client.session['classification_data'])
+        response = self.client.post(reverse('explore_more'))
+        self.assertIsNotNone(response.context['secondary_prediction_label'])
+
+
+class MicroBatcherTests(SimpleTestCase):
+    class CountingModel:
+        def __init__(self, model):
+            self.model = model
+            self.classes_ = model.classes_
+            self.n_features_in_ = model.n_features_in_
+            self.batch_sizes = []
+
+        def predict_proba(self, features):
+            self.batch_sizes.append(len(features))
+            return self.model.predict_proba(features)
+
+    class FixedRegistry:
+        def __init__(self, model):
+            self.model = model
+
+        def predictor(self, name):
+            return self.model
+
+    def test_concurrent_rows_are_batched_and_fanned_out(self):
+        model = self.CountingModel(registry.get('standard'))
+        batcher = MicroBatcher('standard', max_batch_size=16, max_wait_ms=50,
+                               model_registry=self.FixedRegistry(model))
+        features = np.vstack([
+            calculate_statistics(parse_session(make_session(30, seed=seed)).positions)
+            for seed in range(24)
+        ])
+        with ThreadPoolExecutor(max_workers=24) as pool:
+            results = list(pool.map(lambda row: batcher.predict(row), features))
+        expected_predictions, expected_confidences = predict_with_confidence(model.model, features)
+        for (prediction, confidence), exp_p, exp_c in zip(results, expected_predictions, expected_confidences):
+            self.assertEqual(prediction[0], exp_p)
+            self.assertEqual(confidence[0], exp_c)
+        self.assertEqual(sum(model.batch_sizes), 24)
+        self.assertLess(len(model.batch_sizes), 24)
+        self.assertLessEqual(max(model.batch_sizes), 16)
+        metrics = batcher.metrics()
+        self.assertEqual(metrics['rows'], 24)
+        self.assertEqual(metrics['batches'], len(model.batch_sizes))
+        self.assertIsNotNone(metrics['mean_queue_delay_ms'])
+
+    def test_model_errors_reach_every_caller(self):
+        batcher = MicroBatcher('standard', max_wait_ms=1, model_registry=self.FixedRegistry(None))
+        with self.assertRaises(RuntimeError):
+            batcher.predict(np.zeros(12), timeout=5)
+
+
+class CompiledForestTests(SimpleTestCase):
+    MODEL_FILES = ('classifier_model.joblib', 'classifier_model_extra.pkl')
+
+    def feature_matrix(self, forest, n=2000, seed=6):
+        rng = np.random.default_rng(seed)
+        X = np.hstack([rng.normal(size=(n, 6)), rng.exponential(0.1, size=(n, 6))])
+        # Put some rows exactly on split thresholds to exercise the <= edge.
+        for i in range(min(n, 200)):
+            node = rng.integers(len(forest.threshold))
+            if not forest.is_leaf[node]:
+                X[i, forest.feature[node]] = forest.threshold[node]
+        return X
+
+    def test_parity_with_sklearn_on_shipped_models(self):
+        for filename in self.MODEL_FILES:
+            with self.subTest(model=filename):
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore')
+                    model = load(os.path.join(os.path.dirname(__file__), filename))
+                forest = CompiledForest(model)
+                X = self.feature_matrix(forest)
+                np.testing.assert_array_equal(forest.predict_proba(X), model.predict_proba(X))
+                np.testing.assert_array_equal(forest.predict(X), model.predict(X))
+                X1 = X[:1]
+                self.assertEqual(predict_with_confidence(forest, X1), predict_with_confidence(model, X1))
+
+    def test_registry_serves_compiled_forest(self):
+        self.assertIsInstance(registry.predictor('standard'), CompiledForest)
+        with self.assertRaises(ValueError):
+            registry.predictor('standard').predict_proba(np.zeros((1, 5)))
+
+    def test_large_batches_go_to_sklearn(self):
+        forest = registry.predictor('standard')
+        self.assertEqual(forest.max_rows, 500)
+        X = self.feature_matrix(forest, n=10000)
+        with mock.patch.object(forest.estimator, 'predict_proba', wraps=forest.estimator.predict_proba) as sklearn:
+            forest.predict_proba(X[:500])
+            self.assertFalse(sklearn.called)
+            np.testing.assert_array_equal(forest.predict_proba(X), CompiledForest(forest.estimator).predict_proba(X))
+            self.assertEqual(sklearn.call_count, 1)
+
+
+class ResultCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.data = make_session(300, seed=8)
+
+    def test_digest_ignores_chunking_and_formatting(self):
+        digest = session_digest(parse_session(self.data).positions)
+        for chunk_rows in (1, 7, 4096):
+            streamed = stream_statistics(io.BytesIO(json.dumps(self.data).encode()), chunk_rows=chunk_rows)
+            self.assertEqual(streamed.digest, digest)
+        reformatted = [dict(entry, extra='x') for entry in self.data] + [{'id': 'broken'}]
+        streamed = stream_statistics(io.BytesIO(json.dumps(reformatted, indent=2).encode()))
+        self.assertEqual(streamed.digest, digest)
+        self.assertNotEqual(session_digest(parse_session(self.data[1:]).positions), digest)
+
+    @override_settings(CLASSIFIER_RESULT_CACHE={'MAX_ENTRIES': 2})
+    def test_lru_eviction_and_invalidation_on_reload(self):
+        cache = ResultCache()
+        cache.on_model_loaded('standard', SimpleNamespace(version='standard-old'))
+        old, other = ('standard-old',), ('extra-1',)
+        cache.set(old, 'a', {'prediction': 0})
+        cache.set(old, 'b', {'prediction': 1})
+        self.assertEqual(cache.get(old, 'a'), {'prediction': 0})
+        cache.set(other, 'c', {'prediction': 1})
+        self.assertIsNone(cache.get(old, 'b'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+        cache.on_model_loaded('standard', SimpleNamespace(version='standard-old'))
+        self.assertIsNotNone(cache.get(old, 'a'))
+        cache.on_model_loaded('standard', SimpleNamespace(version='standard-new'))
+        self.assertIsNone(cache.get(old, 'a'))
+        self.assertIsNotNone(cache.get(other, 'c'))
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['invalidated']), (3, 2, 1))
+
+    @override_settings(
+        CACHES={'results': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'results'}},
+        CLASSIFIER_RESULT_CACHE={'SHARED_CACHE': 'results'},
+    )
+    def test_shared_tier_is_seen_by_other_processes(self):
+        scope = ('standard-1',)
+        ResultCache().set(scope, 'a', {'prediction': 1})
+        other = ResultCache()
+        self.assertEqual(other.get(scope, 'a'), {'prediction': 1})
+        self.assertEqual(other.get(scope, 'a'), {'prediction': 1})
+        stats = other.stats()
+        self.assertEqual((stats['shared_hits'], stats['hits'], stats['misses']), (1, 1, 0))
+
+    def test_repeated_upload_is_served_from_cache(self):
+        result_cache.clear()
+        payload = json.dumps(self.data)
+        before = result_cache.stats()
+        first = self.client.post(reverse('predict_api'), payload, content_type='application/json').json()
+        second = self.client.post(reverse('predict_api'), json.dumps(self.data, indent=1), content_type='application/json').json()
+        after = result_cache.stats()
+        self.assertEqual(first, second)
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+        body = json.dumps([self.data, make_session(50, seed=9)])
+        results = self.client.post(reverse('predict_batch_api'), body, content_type='application/json').json()['results']
+        self.assertEqual(results[0]['confidence'], first['confidence'])
+        self.assertEqual(result_cache.stats()['hits'] - after['hits'], 1)
+
+
+class AsyncApiTests(SimpleTestCase):
+    def setUp(self):
+        with open(SAMPLE_DATA_PATH) as fh:
+            self.sample = json.load(fh)
+        self.other = make_session(60, seed=11)
+
+    async def test_async_endpoints_match_sync(self):
+        client = AsyncClient()
+        for sync_name, async_name in [('predict_api', 'predict_async_api'),
+                                      ('predict_extra_api', 'predict_extra_async_api'),
+                                      ('predict_cascade_api', 'predict_cascade_async_api')]:
+            payload = json.dumps(self.other)
+            response = await client.post(reverse(async_name), payload, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            expected = self.client.post(reverse(sync_name), payload, content_type='application/json').json()
+            self.assertEqual(response.json(), expected)
+
+        body = json.dumps(self.sample) + '\n' + json.dumps(self.other) + '\n'
+        url = reverse('predict_batch_async_api') + '?model=extra'
+        response = await client.post(url, body, content_type='application/x-ndjson')
+        expected = self.client.post(url.replace('/async', ''), body, content_type='application/x-ndjson').json()
+        self.assertEqual(response.json(), expected)
+
+        response = await client.get(reverse('predict_async_api'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_detached_request_for_process_pool(self):
+        body = (json.dumps(self.sample) + '\n{broken\n').encode()
+        status, content, content_type = _run_view('predict_batch_api', body, 'application/x-ndjson', 'model=cascade')
+        self.assertEqual(status, 200)
+        self.assertEqual(content_type, 'application/json')
+        results = json.loads(content)['results']
+        self.assertEqual([r['status'] for r in results], ['success', 'error'])
+        status, content, _ = _run_view('predict_api', b'{"not": "a list"}', 'application/json', '')
+        self.assertEqual(status, 400)
+
+
+class BatchAnalysisViewTests(TempPayloadStoreMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('batcher', password='secret-pass-123')
+        self.client.force_login(self.user)
+        self.files = [(f'session-{i}.json', json.dumps(make_session(50 + i, seed=20 + i)).encode()) for i in range(6)]
+        self.files.insert(2, ('broken.json', b'[{"HeadPosition"'))
+        self.files.insert(4, ('empty.json', b'[{}]'))
+
+    def upload(self):
+        uploads = [SimpleUploadedFile(name, content, content_type='application/json') for name, content in self.files]
+        response = self.client.post(reverse('batch_analysis'), {'json_files_batch': uploads})
+        self.assertEqual(response.status_code, 200)
+        return response.context['results']
+
+    def test_parallel_results_keep_order_and_errors(self):
+        result_cache.clear()
+        with self.settings(CLASSIFIER_BATCH_WORKERS=2):
+            parallel = self.upload()
+        result_cache.clear()
+        with self.settings(CLASSIFIER_BATCH_WORKERS=1):
+            serial = self.upload()
+        self.assertEqual(parallel, serial)
+        self.assertEqual([r['filename'] for r in parallel], [name for name, _ in self.files])
+        self.assertEqual(parallel[2]['error'], "Invalid JSON format.")
+        self.assertEqual(parallel[4]['error'], "No valid position data found in the file.")
+        for result, (name, content) in zip(parallel, self.files):
+            if 'error' in result:
+                continue
+            expected = self.client.post(reverse('predict_api'), content, content_type='application/json').json()
+            self.assertEqual((result['prediction'], result['confidence']), (expected['prediction'], expected['confidence']))
+        self.assertEqual(ClassificationHistory.objects.filter(user=self.user).count(), 12)
+
+    def test_history_rows_are_bulk_inserted(self):
+        uploads = [SimpleUploadedFile(name, content, content_type='application/json') for name, content in self.files]
+        atypical = lambda model, features: (np.ones(len(features), dtype=int), [75.0] * len(features))
+        result_cache.clear()
+        with self.settings(CLASSIFIER_BATCH_WORKERS=1, CLASSIFIER_HISTORY_BULK_CHUNK_SIZE=4), \
+                mock.patch('classifier.views.predict_with_confidence', side_effect=atypical), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('batch_analysis'), {'json_files_batch': uploads})
+        result_cache.clear()
+        inserts = [q['sql'] for q in queries.captured_queries
+                   if q['sql'].startswith('INSERT INTO "classifier_classificationhistory"')]
+        self.assertEqual(len(inserts), 2)
+        results = response.context['results']
+        rows = list(ClassificationHistory.objects.filter(user=self.user).order_by('id'))
+        self.assertEqual([r.filename for r in rows], [r['filename'] for r in results if 'error' not in r])
+
+        self.client.post(reverse('batch_explore'), {'batch_id': response.context['batch_id'], 'index': 5})
+        self.assertEqual(self.client.session['explore_payload'], f'h:{rows[5].id}')
+
+
+@override_settings(CLASSIFIER_LIVE_STREAMS={'EMIT_EVERY': 300, 'EMIT_INTERVAL': 3600})
+class LiveStreamApiTests(SimpleTestCase):
+    def setUp(self):
+        self.data = make_session(600, seed=13)
+
+    def start(self, model='standard'):
+        response = self.client.post(reverse('live_start_api') + f'?model={model}')
+        self.assertEqual(response.status_code, 201)
+        return reverse('live_stream_api', args=[response.json()['stream_id']])
+
+    def send(self, url, chunk, query=''):
+        return self.client.post(url + query, json.dumps(chunk), content_type='application/json').json()
+
+    def test_estimates_every_n_samples_and_on_final(self):
+        url = self.start()
+        emitted = [self.send(url, self.data[i * 200:(i + 1) * 200], f'?seq={i}')['emitted'] for i in (0, 1)]
+        self.assertEqual(emitted, [False, True])
+        self.assertEqual(self.client.get(url).json()['estimate']['count'], 400)
+
+        retry = self.send(url, self.data[200:400], '?seq=1')
+        self.assertTrue(retry['duplicate'])
+        self.assertEqual(retry['count'], 400)
+
+        response = self.send(url, self.data[400:] + [{'id': 'broken'}], '?seq=2&final=1')
+        self.assertTrue(response['emitted'])
+        self.assertEqual((response['count'], response['received'], response['dropped']), (600, 601, 1))
+        expected = self.client.post(reverse('predict_api'), json.dumps(self.data), content_type='application/json').json()
+        self.assertEqual(response['estimate']['prediction'], expected['prediction'])
+        self.assertEqual(response['estimate']['confidence'], expected['confidence'])
+
+        stream = LiveStream.load(url.rstrip('/').rsplit('/', 1)[1])
+        full = calculate_statistics(parse_session(self.data).positions)
+        np.testing.assert_allclose(stream.stats.features(), full, rtol=1e-12, atol=1e-12)
+
+        self.assertEqual(self.client.delete(url).status_code, 200)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    @override_settings(CLASSIFIER_LIVE_STREAMS={'EMIT_EVERY': 10 ** 6, 'EMIT_INTERVAL': 0})
+    def test_time_based_emission_and_cascade(self):
+        url = self.start('cascade')
+        response = self.send(url, self.data[:50])
+        self.assertTrue(response['emitted'])
+        self.assertIn('secondary', response['estimate'])
+        self.assertFalse(self.send(url, [{}])['emitted'])
+
+    def test_out_of_order_chunks_are_refused_not_dropped(self):
+        url = self.start()
+        self.send(url, self.data[:100], '?seq=0')
+        response = self.client.post(url + '?seq=2', json.dumps(self.data[200:300]), content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual((response.json()['expected_seq'], response.json()['count']), (1, 100))
+        self.assertEqual(self.send(url, self.data[100:200], '?seq=1')['count'], 200)
+        self.assertEqual(self.send(url, self.data[200:300], '?seq=2')['count'], 300)
+
+    def test_concurrent_chunks_are_all_applied(self):
+        url = self.start()
+        chunks = [self.data[i:i + 50] for i in range(0, 400, 50)]
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = list(pool.map(lambda chunk: self.send(url, chunk), chunks))
+        self.assertTrue(all(r['status'] == 'success' for r in responses))
+        self.assertEqual(self.client.get(url).json()['count'], 400)
+
+    def test_busy_stream(self):
+        url = self.start()
+        stream_id = url.rstrip('/').rsplit('/', 1)[1]
+        with LiveStream.locked(stream_id):
+            with self.assertRaises(StreamBusy):
+                with LiveStream.locked(stream_id, wait=0):
+                    pass
+            with mock.patch('classifier.live.LOCK_WAIT', 0):
+                response = self.client.post(url, json.dumps(self.data[:10]), content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.send(url, self.data[:10])['count'], 10)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.client.post(reverse('live_start_api') + '?model=nope').status_code, 400)
+        self.assertEqual(self.client.get(reverse('live_stream_api', args=['missing'])).status_code, 404)
+        url = self.start()
+        response = self.client.post(url, '[{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class TrainModelsCommandTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.dirs = []
+        for label, name in enumerate(('tipici', 'atipici')):
+            directory = os.path.join(self.tmpdir, name)
+            os.makedirs(directory)
+            for i in range(8):
+                data = make_session(30, seed=100 * label + i)
+                for entry in data:
+                    entry['HeadPosition']['x'] += 3 * label
+                with open(os.path.join(directory, f'{i}.json'), 'w') as fh:
+                    json.dump(data, fh)
+            self.dirs.append(directory)
+        with open(os.path.join(self.dirs[0], 'empty.json'), 'w') as fh:
+            json.dump([{}], fh)
+
+    def train(self, *args):
+        out, err = io.StringIO(), io.StringIO()
+        with self.settings(CLASSIFIER_TRAINING_DATA={'standard': tuple(self.dirs)}):
+            call_command(
+                'train_models', *args, workers=2, n_jobs=1, stdout=out, stderr=err,
+                store_dir=os.path.join(self.tmpdir, 'store'), output_dir=os.path.join(self.tmpdir, 'out'),
+            )
+        return out.getvalue(), err.getvalue()
+
+    def test_trains_and_reuses_parsed_files(self):
+        out, err = self.train()
+        self.assertIn('standard: 17 files (0 cached, 17 parsed, 0 removed, 1 without samples)', out)
+        for stage in ('features', 'fit', 'evaluate', 'save'):
+            self.assertIn(stage, out)
+        self.assertIn('extra: no training data configured', err)
+        model = load(os.path.join(self.tmpdir, 'out', 'standard.joblib'))
+        self.assertEqual(model.n_features_in_, 12)
+
+        with open(os.path.join(self.dirs[1], '0.json'), 'a') as fh:
+            fh.write(' ')
+        out, _ = self.train('--model', 'standard')
+        self.assertIn('(16 cached, 1 parsed', out)
+        retrained = load(os.path.join(self.tmpdir, 'out', 'standard.joblib'))
+        X = np.random.default_rng(0).normal(size=(20, 12))
+        np.testing.assert_array_equal(model.predict_proba(X), retrained.predict_proba(X))
+
+    def test_feature_set_is_recorded_in_the_model(self):
+        out, _ = self.train('--model', 'standard', '--features', 'head_moments,hand_moments')
+        self.assertIn('features head_moments, hand_moments', out)
+        model = load(os.path.join(self.tmpdir, 'out', 'standard.joblib'))
+        self.assertEqual(model.feature_set_, ('head_moments', 'hand_moments'))
+        self.assertEqual(model.n_features_in_, 24)
+        with self.assertRaises(CommandError):
+            self.train('--model', 'standard', '--features', 'head_moments,nope')
+
+
+class FeatureStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.dirs = [os.path.join(self.tmpdir, name) for name in ('neg', 'pos')]
+        for directory in self.dirs:
+            os.makedirs(directory)
+        self.store = FeatureStore(os.path.join(self.tmpdir, 'store'))
+
+    def write(self, label, name, data):
+        with open(os.path.join(self.dirs[label], name), 'w') as fh:
+            json.dump(data, fh)
+
+    def expected(self):
+        rows = {}
+        for label, directory in enumerate(self.dirs):
+            for name in sorted(os.listdir(directory)):
+                with open(os.path.join(directory, name)) as fh:
+                    positions = parse_session(json.load(fh)).positions
+                if len(positions):
+                    rows[(label, name)] = calculate_statistics(positions)
+        return np.array(list(rows.values())), np.array([label for label, _ in rows])
+
+    def check(self, features, labels):
+        expected_features, expected_labels = self.expected()
+        np.testing.assert_array_equal(features, expected_features)
+        np.testing.assert_array_equal(labels, expected_labels)
+        stored_features, stored_labels, _ = self.store.load()
+        np.testing.assert_array_equal(stored_features, expected_features)
+        np.testing.assert_array_equal(stored_labels, expected_labels)
+
+    def test_incremental_updates(self):
+        for i in range(3):
+            self.write(0, f'{i}.json', make_session(20, seed=i))
+            self.write(1, f'{i}.json', make_session(20, seed=10 + i))
+        self.write(1, 'empty.json', [{}])
+        features, labels, stats = self.store.update(self.dirs, workers=2)
+        self.assertEqual((stats['parsed'], stats['empty']), (7, 1))
+        self.check(features, labels)
+
+        self.write(0, '1.json', make_session(25, seed=99))
+        self.write(1, '3.json', make_session(20, seed=13))
+        os.remove(os.path.join(self.dirs[0], '2.json'))
+        path = os.path.join(self.dirs[1], '0.json')
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+        features, labels, stats = self.store.update(self.dirs)
+        self.assertEqual((stats['files'], stats['parsed'], stats['removed']), (7, 2, 1))
+        self.check(features, labels)
+
+        _, _, stats = self.store.update(self.dirs)
+        self.assertEqual(stats['parsed'], 0)
+
+    def test_interrupted_save_keeps_the_previous_store(self):
+        for label in (0, 1):
+            self.write(label, 'a.json', make_session(20, seed=label))
+        features, labels, _ = self.store.update(self.dirs)
+        self.write(0, 'a.json', make_session(20, seed=7))
+        with mock.patch('classifier.training.np.savez', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                self.store.update(self.dirs)
+        stored_features, stored_labels, entries = self.store.load()
+        np.testing.assert_array_equal(stored_features, features)
+        np.testing.assert_array_equal(stored_labels, labels)
+        self.assertEqual(sorted(os.listdir(self.store.directory)), ['store.npz'])
+
+
+class ChartDataTests(TempPayloadStoreMixin, TestCase):
+    def test_minmax_indices_keep_every_bucket_extreme(self):
+        values = np.random.default_rng(4).normal(size=10007)
+        keep = minmax_indices(values, 100)
+        self.assertLessEqual(len(keep), 2 * 100 + 2)
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertEqual((keep[0], keep[-1]), (0, len(values) - 1))
+        size = -(-len(values) // 100)
+        for start in range(0, len(values), size):
+            bucket = values[start:start + size]
+            kept = values[keep[(keep >= start) & (keep < start + size)]]
+            self.assertEqual((kept.min(), kept.max()), (bucket.min(), bucket.max()))
+        np.testing.assert_array_equal(minmax_indices(values[:150], 100), np.arange(150))
+
+    def test_minmax_indices_skip_all_nan_buckets(self):
+        values = np.random.default_rng(5).normal(size=10000)
+        values[2000:6000] = np.nan
+        keep = minmax_indices(values, 100)
+        inside = keep[(keep >= 2000) & (keep < 6000)]
+        self.assertEqual(len(inside), 0)
+        self.assertEqual(np.nanmax(values[keep]), np.nanmax(values))
+
+    def test_explore_page_fetches_downsampled_series(self):
+        data = make_session(5000, seed=21)
+        del data[10]['HeadForward']
+        open_in_explore(self.client, data)
+
+        response = self.client.get(reverse('explore_more'))
+        self.assertNotIn('raw_json_list', response.context)
+        self.assertEqual(response.context['chart_data_url'], reverse('explore_chart_data'))
+        self.assertLess(len(response.content), len(json.dumps(data, indent=4)) * 1.5)
+
+        payload = self.client.get(reverse('explore_chart_data') + '?width=50').json()
+        self.assertEqual((payload['count'], payload['width']), (5000, 50))
+        position = payload['streams']['HeadPosition']
+        self.assertLessEqual(len(position['x']['index']), 102)
+        xs = [entry['HeadPosition']['x'] for entry in data]
+        self.assertEqual(max(position['x']['value']), max(xs))
+        self.assertEqual(min(position['x']['value']), min(xs))
+        for index, value in zip(position['x']['index'], position['x']['value']):
+            self.assertEqual(xs[index - 1], value)
+        forward = payload['streams']['HeadForward']['path']
+        self.assertNotIn(11, forward['index'])
+        self.assertEqual(len(forward['x']), len(forward['index']))
+
+        self.assertEqual(self.client.get(reverse('explore_chart_data') + '?width=abc').status_code, 400)
+
+
+class ExploreSamplesTests(TempPayloadStoreMixin, TestCase):
+    def setUp(self):
+        self.data = make_session(1000, seed=22)
+        for i, entry in enumerate(self.data):
+            entry['dateTime'] = f'2025-05-28T10:{i // 60:02d}:{i % 60:02d}Z'
+        self.data[5] = {'id': 5, 'note': 'extra key'}
+        super().setUp()
+        open_in_explore(self.client, self.data)
+
+    def test_explore_page_does_not_embed_samples(self):
+        response = self.client.get(reverse('explore_more'))
+        self.assertEqual(response.context['samples_url'], reverse('explore_samples'))
+        self.assertNotIn(b'"HeadPosition": {', response.content)
+
+    def test_pages_by_offset(self):
+        first = self.client.get(reverse('explore_samples') + '?limit=300').json()
+        self.assertEqual((first['count'], first['first'], first['next_offset']), (1000, 0, 300))
+        self.assertEqual(first['samples'], self.data[:300])
+        last = self.client.get(reverse('explore_samples') + '?offset=900&limit=300').json()
+        self.assertEqual(last['samples'], self.data[900:])
+        self.assertIsNone(last['next_offset'])
+        self.assertEqual(self.client.get(reverse('explore_samples') + '?offset=x').status_code, 400)
+
+    def test_later_pages_do_not_unpack_again(self):
+        with mock.patch('classifier.views.unpack_session', wraps=unpack_session) as unpack:
+            for offset in (0, 200, 400):
+                page = self.client.get(reverse('explore_samples') + f'?offset={offset}').json()
+                self.assertEqual(page['samples'], self.data[offset:offset + 200])
+        self.assertEqual(unpack.call_count, 1)
+        payload_store().evict(time.time() + 10 ** 6)
+        self.assertEqual(self.client.get(reverse('explore_samples')).status_code, 404)
+
+    def test_pages_by_time_range(self):
+        url = reverse('explore_samples') + '?start=2025-05-28T10:01:00Z&end=2025-05-28T10:02:59&limit=100'
+        page = self.client.get(url).json()
+        self.assertEqual(page['window'], [60, 180])
+        self.assertEqual(page['samples'], self.data[60:160])
+        self.assertEqual(page['next_offset'], 100)
+        rest = self.client.get(url + '&offset=100').json()
+        self.assertEqual(rest['samples'], self.data[160:180])
+        self.assertEqual(self.client.get(reverse('explore_samples') + '?start=soon').status_code, 400)
+
+    def test_time_range_of_unordered_samples(self):
+        data = make_session(4)
+        for entry, dt in zip(data, ['10:00:02', '10:00:00', '', '10:00:05']):
+            entry['dateTime'] = f'2025-05-28T{dt}' if dt else ''
+        arrays = unpack_session(pack_session(data))
+        self.assertEqual(arrays.time_range(np.datetime64('2025-05-28T10:00:01')), (0, 4))
+        self.assertEqual(arrays.time_range(None, np.datetime64('2025-05-28T10:00:00')), (1, 2))
+        self.assertEqual(arrays.date_times[1:3], ['2025-05-28T10:00:00', ''])
+
+    def test_no_session(self):
+        self.assertEqual(self.client_class().get(reverse('explore_samples')).status_code, 404)
+
+
+class SessionSummaryTests(TempPayloadStoreMixin, TestCase):
+    def test_matches_per_column_numpy(self):
+        data = make_session(600, seed=23)
+        for i, entry in enumerate(data):
+            entry['dateTime'] = f'2025-05-28T10:00:{i // 20:02d}.{(i % 20) * 50:03d}Z'
+            if i % 7 == 0:
+                entry['HeadRotation'] = {'x': float(i), 'y': 1.0, 'z': -float(i)}
+        del data[3]['HeadForward']
+        summary = session_summary(session_arrays(data))
+
+        self.assertEqual(summary['sample_count'], 600)
+        self.assertEqual(summary['first_recorded'], '2025-05-28T10:00:00.000Z')
+        self.assertEqual(summary['duration'], '0:00:29.950000')
+        self.assertAlmostEqual(summary['sampling_rate'], 599 / 29.95)
+        self.assertEqual(set(summary['axis_stats']), {'HeadPosition', 'HeadForward', 'HeadRotation'})
+        forward_x = np.array([e['HeadForward']['x'] for e in data if 'HeadForward' in e])
+        stats = summary['axis_stats']['HeadForward']['x']
+        self.assertAlmostEqual(stats['mean'], forward_x.mean())
+        self.assertAlmostEqual(stats['std'], forward_x.std())
+        self.assertEqual((stats['min'], stats['max']), (forward_x.min(), forward_x.max()))
+        for p in PERCENTILES:
+            self.assertAlmostEqual(stats[f'p{p}'], np.percentile(forward_x, p))
+        self.assertEqual(summary['axis_stats']['HeadRotation']['z']['min'], -595.0)
+
+    def test_untimed_session(self):
+        data = make_session(3)
+        for entry in data:
+            entry['dateTime'] = ''
+        summary = session_summary(session_arrays(data))
+        self.assertEqual((summary['duration'], summary['sampling_rate']), ('N/A', None))
+
+    def test_stored_at_classification_and_not_recomputed(self):
+        user = User.objects.create_user('summary-user', password='secret-pass-123')
+        self.client.force_login(user)
+        with open(SAMPLE_DATA_PATH, 'rb') as fh:
+            payload = fh.read()
+        upload = SimpleUploadedFile('sample.json', payload, content_type='application/json')
+        self.client.post(reverse('index'), {'json_file': upload})
+        record = ClassificationHistory.objects.get(user=user)
+        self.assertEqual(record.summary, session_summary(session_arrays(json.loads(payload))))
+
+        with mock.patch('classifier.views.session_summary', side_effect=AssertionError):
+            response = self.client.get(reverse('explore_more'))
+            self.assertEqual(response.context['data_stats']['sample_count'], 5)
+            self.assertIn('HeadPosition', response.context['axis_stats'])
+            self.client.get(reverse('history_explore', args=[record.id]))
+            self.client.get(reverse('explore_more'))
+
+        old = ClassificationHistory.objects.create(
+            user=user, prediction_label='Typical', confidence=60.0,
+            samples=pack_session(make_session(30, seed=3)),
+        )
+        self.client.get(reverse('history_explore', args=[old.id]))
+        old.refresh_from_db()
+        self.assertEqual(old.summary['sample_count'], 30)
+        self.assertEqual(self.client.session['session_summary'], old.summary)
+
+
+class PayloadStoreTests(TempPayloadStoreMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        with open(SAMPLE_DATA_PATH, 'rb') as fh:
+            self.payload = fh.read()
+
+    def test_put_get_and_evict(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PayloadStore(tmp, ttl=60)
+            key = store.put(b'blob')
+            self.assertEqual(store.put(b'blob'), key)
+            self.assertEqual(store.get(key), b'blob')
+            self.assertIsNone(store.get('../../etc/passwd'))
+            path = os.path.join(tmp, key + '.bin')
+            os.utime(path, (0, 0))
+            self.assertEqual(store.evict(), 1)
+            self.assertIsNone(store.get(key))
+
+    def test_payloads_with_the_old_suffix(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = PayloadStore(tmp, ttl=60)
+            for blob in (b'read', b'idle'):
+                with open(os.path.join(tmp, f'{blob.hex():0>32}.npz'), 'wb') as fh:
+                    fh.write(blob)
+            self.assertEqual(store.get(f"{b'read'.hex():0>32}"), b'read')
+            idle = os.path.join(tmp, f"{b'idle'.hex():0>32}.npz")
+            os.utime(idle, (0, 0))
+            self.assertEqual(store.evict(), 1)
+            self.assertEqual(os.listdir(tmp), [f"{b'read'.hex():0>32}.bin"])
+
+    def test_session_only_holds_a_reference(self):
+        data = make_session(3000, seed=24)
+        upload = SimpleUploadedFile('big.json', json.dumps(data).encode(), content_type='application/json')
+        self.client.post(reverse('index'), {'json_file': upload})
+        session = self.client.session
+        self.assertTrue(session['explore_payload'].startswith('p:'))
+        self.assertNotIn('uploaded_json_data', session)
+        self.assertLess(len(session.encode(dict(session.items()))), 10000)
+        page = self.client.get(reverse('explore_samples') + '?offset=2990').json()
+        self.assertEqual(page['samples'], data[2990:])
+
+    def test_history_reference_is_per_user(self):
+        owner = User.objects.create_user('owner', password='secret-pass-123')
+        self.client.force_login(owner)
+        upload = SimpleUploadedFile('sample.json', self.payload, content_type='application/json')
+        self.client.post(reverse('index'), {'json_file': upload})
+        record = ClassificationHistory.objects.get(user=owner)
+        self.assertEqual(self.client.session['explore_payload'], f'h:{record.id}')
+        page = self.client.get(reverse('explore_samples')).json()
+        self.assertEqual(page['samples'], json.loads(self.payload))
+
+        other = User.objects.create_user('other', password='secret-pass-123')
+        self.client.force_login(other)
+        session = self.client.session
+        session['explore_payload'] = f'h:{record.id}'
+        session.save()
+        self.assertEqual(self.client.get(reverse('explore_samples')).status_code, 404)
+
+    def test_batch_explore_posts_only_a_reference(self):
+        files = [(f'session-{i}.json', json.dumps(make_session(400 * (i + 1), seed=30 + i)).encode()) for i in range(3)]
+        uploads = [SimpleUploadedFile(name, content, content_type='application/json') for name, content in files]
+        atypical = lambda model, features: (np.ones(len(features), dtype=int), [75.0] * len(features))
+        result_cache.clear()
+        with self.settings(CLASSIFIER_BATCH_WORKERS=1), \
+                mock.patch('classifier.views.predict_with_confidence', side_effect=atypical):
+            response = self.client.post(reverse('batch_analysis'), {'json_files_batch': uploads})
+        result_cache.clear()
+        self.assertLess(len(response.content), 20000)
+        batch_id = response.context['batch_id']
+        self.assertEqual([r['explore_index'] for r in response.context['results']], [0, 1, 2])
+
+        response = self.client.post(reverse('batch_explore'), {'batch_id': batch_id, 'index': 2})
+        self.assertRedirects(response, reverse('explore_more'), fetch_redirect_response=False)
+        self.assertTrue(self.client.session['explore_payload'].startswith('p:'))
+        self.assertEqual(self.client.session['session_summary']['sample_count'], 1200)
+        self.assertEqual(self.client.session['classification_data']['filename'], 'session-2.json')
+        page = self.client.get(reverse('explore_samples') + '?limit=5').json()
+        self.assertEqual(page['samples'], json.loads(files[2][1])[:5])
+
+        session_key = self.client.session['explore_payload'][2:]
+        failed_batch = save_batch_results([None])
+        for bad in ({'batch_id': batch_id, 'index': 3}, {'batch_id': 'f' * 32, 'index': 0}, {'index': 'x'},
+                    {'batch_id': session_key, 'index': 0}, {'batch_id': failed_batch, 'index': 0}):
+            response = self.client.post(reverse('batch_explore'), bad)
+            self.assertRedirects(response, reverse('batch_analysis'), fetch_redirect_response=False)
+        out = io.StringIO()
+        call_command('evict_payloads', stdout=out)
+        self.assertIn('Removed 0 expired payloads', out.getvalue())
+
+
+@override_settings(CLASSIFIER_HISTORY_PAGE_SIZE=4)
+class HistoryPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('pager', password='secret-pass-123')
+        self.session = PatientSession.objects.create(user=self.user, name='P1')
+        base = timezone.now()
+        self.rows = [
+            ClassificationHistory.objects.create(
+                user=self.user, session=self.session if i % 2 else None,
+                # Pairs of rows share a timestamp, so ties must be broken by id.
+                timestamp=base - timedelta(minutes=i // 2), filename=f'f{i}.json',
+                prediction_label='Typical', confidence=50.0 + i, raw_json='x' * 1000,
+            )
+            for i in range(10)
+        ]
+        self.client.force_login(self.user)
+
+    def test_keyset_pages_cover_every_row_once(self):
+        seen, cursor = [], None
+        while True:
+            records, cursor = keyset_page(ClassificationHistory.objects.filter(user=self.user), cursor)
+            seen.extend(r.id for r in records)
+            if cursor is None:
+                break
+        expected = ClassificationHistory.objects.filter(user=self.user).order_by('-timestamp', '-id')
+        self.assertEqual(seen, [r.id for r in expected])
+        self.assertRaises(ValueError, decode_cursor, 'not-a-cursor')
+
+    def test_dashboard_lists_one_page_without_heavy_columns(self):
+        response = self.client.get(reverse('dashboard'))
+        history = response.context['history']
+        self.assertEqual(len(history), 4)
+        self.assertTrue({'raw_json', 'samples', 'features', 'summary'} <= history[0].get_deferred_fields())
+        second = self.client.get(reverse('dashboard'), {'cursor': response.context['next_cursor']})
+        self.assertEqual(len(second.context['history']), 4)
+        self.assertLess(second.context['history'][0].timestamp, history[0].timestamp)
+        self.assertEqual(len(self.client.get(reverse('dashboard'), {'cursor': '%%%'}).context['history']), 4)
+
+    def test_session_detail_pages_its_own_rows(self):
+        url = reverse('session_detail', args=[self.session.id])
+        first = self.client.get(url)
+        rest = self.client.get(url, {'cursor': first.context['next_cursor']})
+        ids = [r.id for r in first.context['history']] + [r.id for r in rest.context['history']]
+        self.assertEqual(sorted(ids), sorted(r.id for r in self.rows if r.session_id))
+        self.assertIsNone(rest.context['next_cursor'])
+
+
+class PatientSessionSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('trend', password='secret-pass-123')
+        self.session = PatientSession.objects.create(user=self.user, name='P2')
+        self.base = timezone.now()
+
+    def add(self, i, label, confidence, features=None):
+        return ClassificationHistory.objects.create(
+            user=self.user, session=self.session, prediction_label=label, confidence=confidence,
+            timestamp=self.base + timedelta(minutes=i), features=features,
+        )
+
+    def stats(self):
+        return PatientSessionSummary.objects.get(session=self.session)
+
+    def test_kept_current_on_insert_and_delete(self):
+        first = self.add(0, 'Typical', 60.0, [1.0] * 12)
+        self.add(1, 'Atypical', 90.0, [3.0] * 12)
+        last = self.add(2, 'Atypical', 75.0)
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.atypical_count), (3, 2))
+        self.assertAlmostEqual(stats.mean_confidence, 75.0)
+        self.assertEqual((stats.confidence_min, stats.confidence_max), (60.0, 90.0))
+        self.assertEqual(stats.last_classified_at, last.timestamp)
+        self.assertEqual(stats.feature_mean, [2.0] * 12)
+
+        first.delete()
+        last.delete()
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.atypical_count, stats.confidence_min), (1, 1, 90.0))
+        self.assertEqual(stats.last_classified_at, self.base + timedelta(minutes=1))
+        self.assertEqual(stats.feature_mean, [3.0] * 12)
+
+    @override_settings(CLASSIFIER_SESSION_SUMMARIES={'FEATURE_WINDOW': 2})
+    def test_feature_mean_covers_the_latest_rows(self):
+        self.add(0, 'Typical', 60.0, [1.0] * 12)
+        self.add(2, 'Typical', 60.0, [3.0] * 12)
+        self.assertEqual(self.stats().feature_mean, [2.0] * 12)
+        latest = self.add(3, 'Typical', 60.0, [5.0] * 12)
+        self.assertEqual(self.stats().feature_mean, [4.0] * 12)
+        # Rows older than the window do not enter it.
+        self.add(1, 'Typical', 60.0, [9.0] * 12)
+        self.add(4, 'Typical', 60.0)
+        self.assertEqual(self.stats().feature_mean, [4.0] * 12)
+
+        # Deleting a row in the window brings back the next latest one.
+        latest.delete()
+        stats = self.stats()
+        self.assertEqual(stats.feature_count, 2)
+        self.assertEqual(stats.feature_mean, [6.0] * 12)
+        incremental = stats.recent_features
+        patient_stats.rebuild()
+        self.assertEqual(self.stats().recent_features, incremental)
+
+    def test_row_and_summary_are_written_together(self):
+        self.add(0, 'Typical', 60.0)
+        with mock.patch.object(patient_stats, 'add_history', side_effect=RuntimeError('summary failed')):
+            with self.assertRaises(RuntimeError):
+                self.add(1, 'Atypical', 90.0)
+        self.assertEqual(ClassificationHistory.objects.filter(session=self.session).count(), 1)
+        self.assertEqual(self.stats().count, 1)
+
+    def test_queryset_deletes_update_the_summary(self):
+        self.add(0, 'Typical', 60.0, [1.0] * 12)
+        self.add(1, 'Atypical', 90.0, [3.0] * 12)
+        ClassificationHistory.objects.filter(confidence=90.0).delete()
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.atypical_count, stats.confidence_max), (1, 0, 60.0))
+        self.assertEqual(stats.feature_mean, [1.0] * 12)
+
+    def test_session_delete_does_not_load_the_history(self):
+        for i in range(5):
+            record = self.add(i, 'Typical', 60.0, [1.0] * 12)
+        ClassificationHistory.objects.filter(session=self.session).update(samples=b'x' * 100)
+        with CaptureQueriesContext(connection) as queries:
+            self.session.delete()
+        self.assertFalse(ClassificationHistory.objects.filter(id=record.id).exists())
+        self.assertFalse(PatientSessionSummary.objects.exists())
+        self.assertFalse([q['sql'] for q in queries if 'samples' in q['sql']])
+        self.assertLessEqual(len(queries), 3)
+
+    def test_bulk_writer_and_rebuild_agree(self):
+        self.add(0, 'Typical', 55.0, [0.5] * 12)
+        writer = HistoryWriter(chunk_size=2)
+        for i in range(5):
+            writer.add(user=self.user, session=self.session, prediction_label='Atypical' if i % 2 else 'Typical',
+                       confidence=50.0 + i, timestamp=self.base + timedelta(minutes=i + 1), features=[float(i)] * 12)
+        writer.write()
+        incremental = self.stats()
+        self.assertEqual((incremental.count, incremental.atypical_count), (6, 2))
+
+        PatientSessionSummary.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuild_session_summaries', stdout=out)
+        self.assertIn('Rebuilt 1 session summaries', out.getvalue())
+        rebuilt = self.stats()
+        for field in ('count', 'atypical_count', 'confidence_min', 'confidence_max', 'last_classified_at', 'feature_count'):
+            self.assertEqual(getattr(rebuilt, field), getattr(incremental, field))
+        self.assertAlmostEqual(rebuilt.confidence_sum, incremental.confidence_sum)
+        np.testing.assert_allclose(rebuilt.feature_mean, incremental.feature_mean)
+
+    def test_sessions_older_than_their_summary(self):
+        self.add(0, 'Atypical', 80.0, [1.0] * 12)
+        self.add(1, 'Typical', 60.0, [3.0] * 12)
+        # As left by migration 0007: history rows but no summary.
+        PatientSessionSummary.objects.all().delete()
+        self.add(2, 'Atypical', 70.0)
+        stats = self.stats()
+        self.assertEqual((stats.count, stats.atypical_count, stats.feature_count), (3, 2, 2))
+        self.assertAlmostEqual(stats.mean_confidence, 70.0)
+
+        PatientSessionSummary.objects.all().delete()
+        migration = importlib.import_module('classifier.migrations.0009_patientsessionsummary_recent_features')
+        migration.build_windows(django_apps, None)
+        self.assertEqual(self.stats().count, 3)
+        self.assertEqual(self.stats().feature_mean, [2.0] * 12)
+
+    def test_backfill_updates_the_summary(self):
+        self.add(0, 'Typical', 60.0, [1.0] * 12)
+        record = self.add(1, 'Atypical', 80.0)
+        ClassificationHistory.objects.filter(id=record.id).update(samples=pack_session(make_session(30, seed=4)))
+        self.assertEqual(self.stats().feature_count, 1)
+
+        out = io.StringIO()
+        call_command('backfill_features', stdout=out)
+        self.assertIn('1 session summaries rebuilt', out.getvalue())
+        record.refresh_from_db()
+        stats = self.stats()
+        self.assertEqual(stats.feature_count, 2)
+        np.testing.assert_allclose(stats.feature_mean, (np.ones(12) + record.features) / 2)
+
+        ClassificationHistory.objects.filter(id=record.id).update(features=[0.0] * 12)
+        call_command('backfill_features', all=True, stdout=io.StringIO())
+        np.testing.assert_allclose(self.stats().feature_mean, (np.ones(12) + record.features) / 2)
+
+    def test_pages_read_the_summary(self):
+        self.add(0, 'Atypical', 80.0)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('session_detail', args=[self.session.id]))
+        self.assertEqual(response.context['stats'].count, 1)
+        self.assertContains(response, '100%')
+        dashboard = self.client.get(reverse('dashboard'))
+        self.assertContains(dashboard, '1 clasificări, 1 atipice')
+        self.session.delete()
+        self.assertFalse(PatientSessionSummary.objects.exists())
+
+
+def oscillating_session(n, rate=60.0, frequency=2.0, seed=0, stamp_resolution_ms=1):
+    """Head swaying sideways at ``frequency`` Hz, with ms (or coarser) dateTime stamps."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(n) / rate
+    start = np.datetime64('2025-05-28T10:00:00.000')
+    stamps = start + (t * 1000 // stamp_resolution_ms * stamp_resolution_ms).astype('timedelta64[ms]')
+    x = 0.05 * np.sin(2 * np.pi * frequency * t) + rng.normal(scale=0.002, size=n)
+    y = 1.6 + rng.normal(scale=0.002, size=n)
+    z = 0.01 * np.sin(2 * np.pi * 0.1 * t)
+    yaw = 0.2 * np.sin(2 * np.pi * frequency * t)
+    return [
+        {
+            'id': i,
+            'dateTime': str(stamps[i]) + 'Z',
+            'HeadPosition': {'x': x[i], 'y': y[i], 'z': z[i]},
+            'HeadForward': {'x': float(np.sin(yaw[i])), 'y': 0.0, 'z': float(np.cos(yaw[i]))},
+        }
+        for i in range(n)
+    ]
+
+
+class MovementAnalysisTests(TempPayloadStoreMixin, TestCase):
+    def test_finds_frequency_and_direction_quickly(self):
+        arrays = session_arrays(oscillating_session(100_000, frequency=2.5))
+        started = time.perf_counter()
+        result = analyse_session(arrays)
+        elapsed = time.perf_counter() - started
+        self.assertLess(elapsed, 1.0)
+        self.assertAlmostEqual(result['repetition_frequency'], 2.5, delta=0.01)
+        self.assertAlmostEqual(result['sampling_rate'], 60.0, delta=0.1)
+        self.assertEqual(result['directional_bias']['direction'], 'Lateral')
+        self.assertAlmostEqual(result['amplitude_variance']['x'], 0.05 ** 2 / 2, delta=1e-4)
+        self.assertLessEqual(len(result['spectrum']['frequency']), 602)
+
+    def test_coarse_timestamps_are_spread(self):
+        arrays = session_arrays(oscillating_session(3000, frequency=1.5, stamp_resolution_ms=1000))
+        result = analyse_session(arrays)
+        self.assertAlmostEqual(result['repetition_frequency'], 1.5, delta=0.05)
+
+    def test_cached_per_reference_and_rendered(self):
+        loads = []
+        arrays = session_arrays(oscillating_session(600))
+        first = cached_analysis('p:test-ref', lambda: loads.append(1) or arrays)
+        second = cached_analysis('p:test-ref', lambda: loads.append(1) or arrays)
+        self.assertEqual((first, len(loads)), (second, 1))
+        with self.settings(CLASSIFIER_ANALYSIS={'MAX_RATE': 30.0}):
+            slower = cached_analysis('p:test-ref', lambda: loads.append(1) or arrays)
+        self.assertEqual(len(loads), 2)
+        self.assertLess(slower['resampled_points'], first['resampled_points'])
+
+        open_in_explore(self.client, oscillating_session(600, seed=1))
+        session = self.client.session
+        session['classification_data'] = {'prediction': 1, 'prediction_label': 'Atypical', 'confidence': 80.0}
+        session.save()
+        response = self.client.get(reverse('advanced_classification'))
+        self.assertEqual(response.status_code, 200)
+        self.assertAlmostEqual(response.context['advanced_results']['repetition_frequency'], 2.0, delta=0.1)
+        self.assertContains(response, 'Lateral')
+
+        open_in_explore(self.client, make_session(50))
+        response = self.client.get(reverse('advanced_classification'))
+        self.assertIn('error', response.context['advanced_results'])
+
+
+def multi_stream_session(n, seed=0):
+    """make_session plus head rotation and hand positions."""
+    rng = np.random.default_rng(seed)
+    data = make_session(n, seed=seed)
+    rotations = np.cumsum(rng.normal(scale=3.0, size=(n, 3)), axis=0) % 360.0
+    for entry, rotation, left, right in zip(data, rotations.tolist(), rng.normal(size=(n, 3)).tolist(),
+                                            rng.normal(size=(n, 3)).tolist()):
+        entry['HeadRotation'] = dict(zip('xyz', rotation))
+        entry['LeftHandPosition'] = dict(zip('xyz', left))
+        entry['RightHandPosition'] = dict(zip('xyz', right))
+    return data
+
+
+class FeatureExtractorTests(TempPayloadStoreMixin, TestCase):
+    FEATURE_SET = ('head_moments', 'angular_speed', 'hand_head_distance')
+
+    def setUp(self):
+        super().setUp()
+        self.data = multi_stream_session(300, seed=3)
+
+    def test_default_features_match_calculate_statistics(self):
+        with open(SAMPLE_DATA_PATH) as fh:
+            sample = json.load(fh)
+        expected = calculate_statistics(parse_session(sample).positions)
+        np.testing.assert_array_equal(extract(FeatureBlock(session_arrays(sample))), expected)
+        np.testing.assert_array_equal(extract(load_block(sample)), expected)
+        block = FeatureBlock(session_arrays(self.data))
+        for name in FEATURE_EXTRACTORS:
+            self.assertEqual(len(extract(block, (name,))), len(feature_columns((name,))), name)
+
+    def test_extractors_share_the_parsed_columns(self):
+        block = FeatureBlock(session_arrays(self.data))
+        original = SessionArrays.stream
+        with mock.patch.object(SessionArrays, 'stream', autospec=True, side_effect=original) as stream:
+            extract(block, tuple(FEATURE_EXTRACTORS))
+            extract(block, tuple(FEATURE_EXTRACTORS))
+        reads = [call.args[1] for call in stream.call_args_list]
+        self.assertEqual(sorted(reads), sorted(set(reads)))
+
+    def test_angular_speed_wraps_around(self):
+        data = multi_stream_session(3)
+        for entry, yaw in zip(data, (359.0, 1.0, 3.0)):
+            entry['HeadRotation'] = {'x': 0.0, 'y': yaw, 'z': 0.0}
+        np.testing.assert_allclose(extract(FeatureBlock(session_arrays(data)), ('angular_speed',)), [2.0, 0.0])
+
+    def install_model(self, feature_set):
+        rows = [extract(FeatureBlock(session_arrays(multi_stream_session(60, seed=i))), feature_set)
+                for i in range(20)]
+        model = RandomForestClassifier(n_estimators=5, random_state=0)
+        model.fit(np.vstack(rows), [i % 2 for i in range(20)])
+        model.feature_set_ = feature_set
+        path = os.path.join(self.enterContext(tempfile.TemporaryDirectory()), 'model.joblib')
+        dump(model, path)
+        # Cleanups run last-registered first: reload once the paths are restored.
+        self.addCleanup(registry.reload)
+        self.enterContext(mock.patch.object(registry, '_paths', {'standard': path, 'extra': path}))
+        registry.reload()
+        return model
+
+    def test_models_get_the_features_they_declare(self):
+        model = self.install_model(self.FEATURE_SET)
+        self.assertEqual(registry.status()['standard']['feature_set'], list(self.FEATURE_SET))
+        features = extract(FeatureBlock(session_arrays(self.data)), self.FEATURE_SET).reshape(1, -1)
+        expected = predict_with_confidence(model, features)[1][0]
+
+        body = json.dumps(self.data)
+        response = self.client.post(reverse('predict_api'), body, content_type='application/json')
+        self.assertEqual(response.json()['confidence'], expected)
+        response = self.client.post(reverse('predict_batch_api') + '?model=cascade', json.dumps([self.data]),
+                                    content_type='application/json')
+        self.assertEqual(response.json()['results'][0]['confidence'], expected)
+        upload = SimpleUploadedFile('session.json', body.encode(), content_type='application/json')
+        response = self.client.post(reverse('index'), {'json_file': upload})
+        self.assertEqual(response.json()['confidence'], expected)
+
+        self.assertEqual(self.client.post(reverse('live_start_api')).status_code, 400)
+
+    def test_history_keeps_the_default_features(self):
+        model = self.install_model(self.FEATURE_SET)
+        user = User.objects.create_user('sets', password='secret-pass-123')
+        session = PatientSession.objects.create(user=user, name='P3')
+        self.client.force_login(user)
+        body = json.dumps(self.data).encode()
+        self.client.post(reverse('session_detail', args=[session.id]),
+                         {'json_file': SimpleUploadedFile('a.json', body, content_type='application/json')})
+        self.client.post(reverse('batch_analysis'),
+                         {'json_files_batch': [SimpleUploadedFile('b.json', body, content_type='application/json')]})
+        self.client.post(reverse('index'),
+                         {'json_file': SimpleUploadedFile('c.json', body, content_type='application/json')})
+        default = extract(FeatureBlock(session_arrays(self.data)))
+        records = ClassificationHistory.objects.filter(user=user)
+        self.assertEqual(len(records), 3)
+        for record in records:
+            np.testing.assert_array_equal(record.features, default)
+        np.testing.assert_array_equal(PatientSessionSummary.objects.get(session=session).feature_mean, default)
+
+        # Opened from the history, the secondary model still gets its own features.
+        record = records.first()
+        ClassificationHistory.objects.filter(id=record.id).update(prediction_label='Atypical')
+        features = extract(FeatureBlock(session_arrays(self.data)), self.FEATURE_SET).reshape(1, -1)
+        self.client.get(reverse('history_explore', args=[record.id]))
+        response = self.client.post(reverse('explore_more'))
+        self.assertEqual(response.context['secondary_confidence'], predict_with_confidence(model, features)[1][0])
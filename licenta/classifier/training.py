@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from itertools import repeat
+import numpy as np
+from glob import glob
+from django.conf import settings
+from joblib import dump
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+from .features import check_feature_set, DEFAULT_FEATURE_SET, extract, feature_columns, load_block
+from .parsing import parse_session
+from .pools import django_process_pool
+
+# Label 0 and label 1 directories of each model, relative to BASE_DIR.
+DEFAULT_TRAINING_DATA = {
+    'standard': (
+        os.path.join('classifier_data', 'FullData', 'tipici'),
+        os.path.join('classifier_data', 'FullData', 'atipici'),
+    ),
+}
+DEFAULT_STORE_DIR = os.path.join('classifier_data', 'feature_store')
+
+
+def feature_sets():
+    """{model name: feature set to train it on}; DEFAULT_FEATURE_SET when not configured."""
+    configured = getattr(settings, 'CLASSIFIER_FEATURE_SETS', {})
+    return {name: check_feature_set(configured.get(name, DEFAULT_FEATURE_SET)) for name in training_data()}
+
+
+def training_data():
+    """{model name: (label 0 directory, label 1 directory)} as absolute paths."""
+    configured = {**DEFAULT_TRAINING_DATA, **getattr(settings, 'CLASSIFIER_TRAINING_DATA', {})}
+    return {
+        name: tuple(os.path.join(settings.BASE_DIR, d) for d in dirs)
+        for name, dirs in configured.items() if dirs
+    }
+
+
+def load_positions(path):
+    """The parsed (N, 6) sample matrix of one session file."""
+    with open(path, 'r') as file:
+        return parse_session(json.load(file)).positions
+
+
+def _file_hash(content):
+    return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+
+def file_features(path, known_hash=None, feature_set=DEFAULT_FEATURE_SET):
+    """``(content hash, features)`` of one session file, run in a pool worker.
+
+    ``features`` is None when the file has no valid samples and the string
+    'unchanged' when its hash equals ``known_hash``, in which case the file
+    is not parsed at all.
+    """
+    with open(path, 'rb') as fh:
+        content = fh.read()
+    digest = _file_hash(content)
+    if digest == known_hash:
+        return digest, 'unchanged'
+    block = load_block(json.loads(content), feature_set)
+    return digest, extract(block, feature_set) if block.count else None
+
+
+def _write_atomic(path, write):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            write(fh)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class FeatureStore:
+    """The ``feature_set`` features of every file of a training corpus, kept on disk.
+
+    ``store.npz`` holds the feature matrix, one row per usable session, and
+    the index: the feature set plus one entry per file with path, label,
+    mtime, size, content hash and its row in the matrix (null for files
+    without samples). Both are replaced by one atomic rename, so an
+    interrupted save leaves the previous store intact. ``update`` only parses
+    files whose stat changed and whose content hash differs from the index;
+    ``load`` just reads the file.
+    """
+
+    STORE = 'store.npz'
+    # Written by earlier versions as two separately renamed files.
+    LEGACY_FILES = ('features.npy', 'index.json')
+
+    def __init__(self, directory, feature_set=DEFAULT_FEATURE_SET):
+        self.directory = directory
+        self.feature_set = check_feature_set(feature_set)
+        self.width = len(feature_columns(self.feature_set))
+
+    def _empty(self):
+        return np.empty((0, self.width)), np.empty(0, dtype=int), []
+
+    def load(self):
+        """``(features, labels, entries)``; empty arrays if nothing is stored yet."""
+        try:
+            with np.load(os.path.join(self.directory, self.STORE), allow_pickle=False) as archive:
+                features = archive['features']
+                index = json.loads(archive['index'].tobytes().decode('utf-8'))
+            entries = index['files']
+        except (OSError, ValueError, KeyError):
+            return self._empty()
+        if tuple(index.get('feature_set', DEFAULT_FEATURE_SET)) != self.feature_set:
+            # Stored for another feature set; every file is parsed again.
+            return self._empty()
+        labels = np.empty(len(features), dtype=int)
+        for e in entries:
+            if e['row'] is not None:
+                labels[e['row']] = e['label']
+        return features, labels, entries
+
+    def save(self, features, entries):
+        os.makedirs(self.directory, exist_ok=True)
+        index = json.dumps({'feature_set': list(self.feature_set), 'files': entries}).encode('utf-8')
+        _write_atomic(os.path.join(self.directory, self.STORE), lambda fh: np.savez(
+            fh, features=features, index=np.frombuffer(index, dtype=np.uint8),
+        ))
+        for name in self.LEGACY_FILES:
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def update(self, directories, workers=1):
+        """Bring the store in line with the label directories.
+
+        Returns ``(features, labels, stats)`` for the current corpus; ``stats``
+        counts files reused from the store, parsed, removed, and without samples.
+        """
+        old_features, _, old_entries = self.load()
+        known = {e['path']: e for e in old_entries}
+        current = []
+        for label, directory in enumerate(directories):
+            for path in sorted(glob(os.path.join(os.path.abspath(directory), '*.json'))):
+                current.append((path, label))
+
+        entries, todo = [], []
+        for path, label in current:
+            st = os.stat(path)
+            entry = {'path': path, 'label': label, 'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+            previous = known.get(path)
+            if previous is not None and (previous['mtime_ns'], previous['size']) == (st.st_mtime_ns, st.st_size):
+                entry.update(hash=previous['hash'], row=previous['row'])
+            else:
+                todo.append((len(entries), previous['hash'] if previous is not None else None))
+                entry.update(hash=None, row=previous['row'] if previous is not None else None)
+            entries.append(entry)
+
+        if todo:
+            paths = [entries[i]['path'] for i, _ in todo]
+            hashes = [h for _, h in todo]
+            if workers > 1 and len(todo) > 1:
+                with django_process_pool(min(workers, len(todo))) as pool:
+                    results = list(pool.map(file_features, paths, hashes, repeat(self.feature_set),
+                                            chunksize=max(1, len(todo) // (workers * 4))))
+            else:
+                results = [file_features(p, h, self.feature_set) for p, h in zip(paths, hashes)]
+        else:
+            results = []
+
+        fresh = {}
+        reparsed = 0
+        for (i, _), (digest, features) in zip(todo, results):
+            entries[i]['hash'] = digest
+            if isinstance(features, str):
+                continue
+            reparsed += 1
+            entries[i]['row'] = None
+            if features is not None:
+                fresh[i] = features
+
+        rows = []
+        for i, entry in enumerate(entries):
+            if i in fresh:
+                rows.append(fresh[i])
+            elif entry['row'] is not None:
+                rows.append(old_features[entry['row']])
+            else:
+                continue
+            entry['row'] = len(rows) - 1
+        features = np.array(rows, dtype=np.float64).reshape(-1, self.width)
+        labels = np.array([e['label'] for e in entries if e['row'] is not None], dtype=int)
+
+        stats = {
+            'files': len(entries),
+            'cached': len(entries) - reparsed,
+            'parsed': reparsed,
+            'removed': len(set(known) - {path for path, _ in current}),
+            'empty': sum(1 for e in entries if e['row'] is None),
+        }
+        if todo or stats['removed'] or len(entries) != len(old_entries):
+            self.save(features, entries)
+        return features, labels, stats
+
+
+@contextmanager
+def _stage(stages, name):
+    started = time.perf_counter()
+    yield
+    stages.append((name, time.perf_counter() - started))
+
+
+def _corpus_features(directories, workers=1, feature_set=DEFAULT_FEATURE_SET):
+    # Without a store: a throwaway one, so everything is parsed (in parallel).
+    with tempfile.TemporaryDirectory() as tmp:
+        return FeatureStore(tmp, feature_set).update(directories, workers=workers)
+
+
+def train_classifier(directories, n_jobs=None, workers=1, store=None, random_state=42,
+                     feature_set=None):
+    """Fit a forest the way models.train_model does, with per-stage timing.
+
+    The forest is fitted on ``feature_set`` (the store's when a FeatureStore
+    is given, else DEFAULT_FEATURE_SET) and records it as ``feature_set_``,
+    which is what the serving code computes for it. With a FeatureStore,
+    only new or changed files are parsed. Returns a dict with the fitted
+    ``model``, hold-out ``accuracy``, file ``stats`` and ``stages`` as
+    (name, seconds) pairs.
+    """
+    if store is not None:
+        if feature_set is not None and check_feature_set(feature_set) != store.feature_set:
+            raise ValueError("The feature store holds another feature set.")
+        feature_set = store.feature_set
+    else:
+        feature_set = check_feature_set(feature_set or DEFAULT_FEATURE_SET)
+    stages = []
+    with _stage(stages, 'features'):
+        if store is not None:
+            features, labels, stats = store.update(directories, workers=workers)
+        else:
+            features, labels, stats = _corpus_features(directories, workers=workers, feature_set=feature_set)
+    if len(set(labels.tolist())) < 2:
+        raise ValueError("Training needs sessions for both labels.")
+    X_train, X_test, y_train, y_test = train_test_split(features, labels, test_size=0.2, random_state=random_state)
+    with _stage(stages, 'fit'):
+        model = RandomForestClassifier(random_state=random_state, n_jobs=n_jobs)
+        model.fit(X_train, y_train)
+    with _stage(stages, 'evaluate'):
+        accuracy = float(model.score(X_test, y_test))
+    # Scoring in the web app is single-row; do not keep a worker pool setting.
+    model.n_jobs = None
+    model.feature_set_ = feature_set
+    return {'model': model, 'accuracy': accuracy, 'stats': stats, 'stages': stages}
+
+
+def save_model(model, path):
+    """Write atomically, so a registry polling the file never loads half of it."""
+    _write_atomic(os.path.abspath(path), lambda fh: dump(model, fh))
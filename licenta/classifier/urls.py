@@ -1,17 +1,29 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
 from .views import register_view, logout_view, dashboard_view
-from . import views, api
+from . import views, api, async_api
 
 urlpatterns = [
     path('', views.classifier_view, name='index'),
     path('documentation/', views.documentation_view, name='documentation'),
     path('explore-more/', views.explore_more_view, name='explore_more'),
+    path('explore-more/chart-data/', views.explore_chart_data_view, name='explore_chart_data'),
+    path('explore-more/samples/', views.explore_samples_view, name='explore_samples'),
     path('batch-analysis/', views.batch_analysis_view, name='batch_analysis'),  
     path('api/set-explore-session/', views.set_explore_session_api, name='set_explore_session_api'),  
     path('advanced-classification/', views.advanced_classification_view, name='advanced_classification'),
     path('api/predict/', api.predict_api, name='predict_api'),
     path('api/predict-extra/', api.predict_extra_api, name='predict_extra_api'),
+    path('api/predict-batch/', api.predict_batch_api, name='predict_batch_api'),
+    path('api/predict-cascade/', api.predict_cascade_api, name='predict_cascade_api'),
+    path('api/async/predict/', async_api.predict_api, name='predict_async_api'),
+    path('api/async/predict-extra/', async_api.predict_extra_api, name='predict_extra_async_api'),
+    path('api/async/predict-batch/', async_api.predict_batch_api, name='predict_batch_async_api'),
+    path('api/async/predict-cascade/', async_api.predict_cascade_api, name='predict_cascade_async_api'),
+    path('api/live/', api.live_start_api, name='live_start_api'),
+    path('api/live/<str:stream_id>/', api.live_stream_api, name='live_stream_api'),
+    path('api/models/', api.model_status_api, name='model_status_api'),
+    path('api/models/reload/', api.model_reload_api, name='model_reload_api'),
     path('download-script/', views.download_script_view, name='download_script'),
     path('login/', auth_views.LoginView.as_view(template_name='classifier/login.html'), name='login'),
     path('logout/', logout_view, name='logout'),
@@ -1,10 +1,23 @@
 import json
+import logging
 from django.http import JsonResponse, HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 import numpy as np
-from joblib import load
 import os
-from .models import calculate_statistics, ClassificationHistory, PatientSession
+from .analysis import cached_analysis
+from .batch import load_batch_results, prepare_uploads, save_batch_results
+from .charts import chart_series, chart_width
+from .cache import model_scope, result_cache
+from .features import DEFAULT_FEATURE_SET, extract, FeatureBlock
+from .history import HistoryWriter
+from .inference import cascade, predict_with_confidence, result_records
+from .models import ClassificationHistory, PatientSession, PatientSessionSummary
+from .pagination import HISTORY_LIST_FIELDS, keyset_page
+from .payloads import payload_store, unpacked_sessions
+from .registry import registry
+from .summaries import session_summary
+from .storage import pack_arrays, parse_timestamps, session_arrays, unpack_session
 from django.conf import settings
 from django.http import Http404
 from django.contrib.auth.forms import UserCreationForm
@@ -13,47 +26,22 @@ from django.views.decorators.http import require_POST
 from django.contrib.auth.decorators import login_required
 from .forms import PatientSessionForm
 
-model_path = os.path.join(os.path.dirname(__file__), 'classifier_model.joblib')
-try:
-    model = load(model_path)
-except FileNotFoundError:
-    model = None
-
-model_extra_path = os.path.join(os.path.dirname(__file__), 'classifier_model_extra.pkl')
-try:
-    model_extra = load(model_extra_path)
-except FileNotFoundError:
-    print("Error: model_extra.pkl not found.")
-    model_extra = None
-except Exception as e:
-    print(f"Error loading model_extra.pkl: {e}")
-    model_extra = None
+logger = logging.getLogger(__name__)
 
 def documentation_view(request):
     return render(request, 'classifier/documentation.html')
 
 def advanced_classification_view(request):
     classification_data = request.session.get('classification_data', None)
-    
-    if classification_data and classification_data.get('prediction') == 1:
-        advanced_results = {
-            'movement_type': 'Repetitive',
-            'severity_score': 0.75,
-            'pattern_details': {
-                'repetition_frequency': '5.2 Hz',
-                'amplitude_variance': 'High',
-                'directional_bias': 'Lateral',
-            },
-            'recommendations': [
-                'Consider detailed analysis of lateral movement patterns',
-                'Examine head tilt frequency and duration',
-                'Analyze acceleration peaks during movement transitions'
-            ]
-        }
-        
-        classification_data['advanced_results'] = advanced_results
-        request.session['classification_data'] = classification_data
-        
+    reference = request.session.get('explore_payload', None)
+
+    if classification_data and classification_data.get('prediction') == 1 and reference:
+        try:
+            advanced_results = cached_analysis(reference, lambda: _explore_arrays(request))
+        except ValueError:
+            advanced_results = {'error': "Could not decode the stored session data."}
+        if advanced_results is None:
+            return redirect('explore_more')
         return render(request, 'classifier/advanced_analysis.html', {
             'classification_data': classification_data,
             'advanced_results': advanced_results
@@ -61,6 +49,10 @@ def advanced_classification_view(request):
     else:
         return redirect('explore_more') 
 
+def _classify_block(model, block, feature_set):
+    features = extract(block, feature_set).reshape(1, -1)
+    return result_records(features, *predict_with_confidence(model, features))[0]
+
 def classifier_view(request):
     if request.method == "POST":
         json_file = request.FILES.get("json_file")
@@ -69,61 +61,68 @@ def classifier_view(request):
                 json_file_content = json_file.read()
                 data = json.loads(json_file_content)
                 
-                processed_positions = [] 
-                for entry in data:
-                    try:
-                        pos = entry['HeadPosition']
-                        forw = entry['HeadForward']
-                        
-                        poz_ml = [float(pos['x']), float(pos['y']), float(pos['z'])]
-                        forz_ml = [float(forw['x']), float(forw['y']), float(forw['z'])]
-                        processed_positions.append(poz_ml + forz_ml)
-                        
-                    except (KeyError, ValueError) as e:
-                        continue 
+                # One columnar parse serves the features, summary and storage.
+                arrays = session_arrays(data)
+                block = FeatureBlock(arrays)
                 
-                if not processed_positions:
+                if not block.count:
                     return JsonResponse({"error": "No valid position data found in the file for classification"}, status=400)
                 
-                processed_positions_np = np.array(processed_positions)
-                features = calculate_statistics(processed_positions_np).reshape(1, -1)
-                
+                model = registry.predictor('standard')
                 if model is None:
                     return JsonResponse({"error": "Model not loaded. Please train the model first."}, status=500)
                 
-                prediction = model.predict(features)
-                prediction_proba = model.predict_proba(features)[0]
-                prediction_label = "Atypical" if prediction[0] == 1 else "Typical"
-                
-                confidence = prediction_proba[1] if prediction[0] == 1 else prediction_proba[0]
-                confidence_percentage = round(confidence * 100, 1)
+                # Atypical results get the secondary model run on the same
+                # features now, so the explore page does not have to.
+                feature_set = registry.feature_set('standard')
+                extra_feature_set = registry.feature_set('extra')
+                def classify():
+                    features = extract(block, feature_set).reshape(1, -1)
+                    extra_features = None
+                    if extra_feature_set != feature_set:
+                        extra_features = extract(block, extra_feature_set).reshape(1, -1)
+                    return result_records(features, *cascade(model, registry.predictor('extra'), features, extra_features))[0]
+                result = result_cache.lookup(
+                    model_scope('standard', 'extra'), block.digest(feature_set + extra_feature_set), classify
+                )
+                prediction_label = "Atypical" if result["prediction"] == 1 else "Typical"
+                confidence_percentage = result["confidence"]
 
-                request.session['uploaded_json_data'] = json_file_content.decode('utf-8') 
+                summary = session_summary(arrays)
+                samples = pack_arrays(arrays)
 
                 classification_data_for_session = {
-                    "prediction": int(prediction[0]), 
+                    "prediction": result["prediction"], 
                     "prediction_label": prediction_label,
                     "confidence": confidence_percentage,
                     "filename": json_file.name 
                 }
 
                 if prediction_label == "Atypical":
-                    classification_data_for_session["features"] = features.tolist()
+                    classification_data_for_session["features"] = [result["features"]]
+                    if result["secondary"] is not None:
+                        classification_data_for_session["secondary"] = result["secondary"]
                 
                 request.session['classification_data'] = classification_data_for_session
                 
                 if request.user.is_authenticated:
-                    ClassificationHistory.objects.create(
+                    record = ClassificationHistory.objects.create(
                         user=request.user,
                         filename=json_file.name,
                         prediction_label=prediction_label,
                         confidence=confidence_percentage,
-                        raw_json=json_file_content.decode('utf-8')
+                        samples=samples,
+                        features=extract(block).tolist(),
+                        summary=summary,
+                        model_version=registry.version('standard') or ''
                     )
+                    _set_explore_payload(request, f'h:{record.id}', summary)
+                else:
+                    _set_explore_payload(request, 'p:' + payload_store().put(samples), summary)
 
                 return JsonResponse({
                     "message": "Classification completed",
-                    "prediction": int(prediction[0]),
+                    "prediction": result["prediction"],
                     "prediction_label": prediction_label,
                     "confidence": confidence_percentage
                 })
@@ -151,70 +150,108 @@ def batch_analysis_view(request):
             context['form_errors'] = "No files were uploaded."
             return render(request, 'classifier/batch_upload.html', context)
 
-        for json_file in json_files:
-            file_result = {"filename": json_file.name}
+        uploads = [(json_file.name, json_file.read()) for json_file in json_files]
+        # Parsing, features and packing run in parallel worker processes;
+        # the model then scores every file that is not cached in one call.
+        model = registry.predictor('standard')
+        prepared = prepare_uploads(uploads, registry.feature_set('standard'))
+
+        scope = model_scope('standard')
+        records = [None] * len(prepared)
+        pending = []
+        for i, item in enumerate(prepared):
+            if 'error' not in item:
+                records[i] = result_cache.get(scope, item['digest'])
+                if records[i] is None:
+                    pending.append(i)
+        if pending and model is not None:
             try:
-                json_file_content = json_file.read()
-                data = json.loads(json_file_content)
-                
-                processed_positions = []
-                for entry in data:
-                    try:
-                        pos = entry['HeadPosition']
-                        forw = entry['HeadForward']
-                        poz_ml = [float(pos['x']), float(pos['y']), float(pos['z'])]
-                        forz_ml = [float(forw['x']), float(forw['y']), float(forw['z'])]
-                        processed_positions.append(poz_ml + forz_ml)
-                    except (KeyError, ValueError):
-                        continue
-                
-                if not processed_positions:
-                    file_result["error"] = "No valid position data found in the file."
-                    context['results'].append(file_result)
-                    continue
-                
-                processed_positions_np = np.array(processed_positions)
-                features = calculate_statistics(processed_positions_np).reshape(1, -1)
-                
-                if model is None:
-                    file_result["error"] = "Main model not loaded."
-                    context['results'].append(file_result)
-                    continue
-                
-                prediction = model.predict(features)
-                prediction_proba = model.predict_proba(features)[0]
-                prediction_label = "Atypical" if prediction[0] == 1 else "Typical"
-                confidence = prediction_proba[1] if prediction[0] == 1 else prediction_proba[0]
-                confidence_percentage = round(confidence * 100, 1)
-
+                features = np.vstack([prepared[i]['features'] for i in pending])
+                for i, record in zip(pending, result_records(features, *predict_with_confidence(model, features))):
+                    result_cache.set(scope, prepared[i]['digest'], record)
+                    records[i] = record
+            except Exception as e:
+                logger.exception("Error scoring batch in batch_analysis_view")
+                for i in pending:
+                    prepared[i]['error'] = f"Error processing file: {str(e)}"
+
+        # History rows are written together after the loop, in one transaction.
+        writer = HistoryWriter()
+        explore_entries = []
+        explore_sources = []
+        for (filename, _), item, result in zip(uploads, prepared, records):
+            file_result = {"filename": filename}
+            if 'error' in item:
+                file_result["error"] = item['error']
+            elif model is None:
+                file_result["error"] = "Main model not loaded."
+            else:
+                prediction_label = "Atypical" if result["prediction"] == 1 else "Typical"
                 file_result.update({
                     "prediction_label": prediction_label,
-                    "confidence": confidence_percentage,
-                    "prediction": int(prediction[0]),
+                    "confidence": result["confidence"],
+                    "prediction": result["prediction"],
                 })
 
+                record = None
                 if request.user.is_authenticated:
-                    ClassificationHistory.objects.create(
+                    record = writer.add(
                         user=request.user,
-                        filename=json_file.name,
+                        filename=filename,
                         prediction_label=prediction_label,
-                        confidence=confidence_percentage,
-                        raw_json=json_file_content.decode('utf-8')
+                        confidence=result["confidence"],
+                        samples=item['samples'],
+                        features=item['history_features'],
+                        summary=item['summary'],
+                        model_version=registry.version('standard') or ''
                     )
 
                 if prediction_label == "Atypical":
-                    file_result["features_json"] = json.dumps(features.tolist()) 
-                    file_result["raw_json_content_json"] = json.dumps(json.loads(json_file_content.decode('utf-8'))) 
-
-            except json.JSONDecodeError:
-                file_result["error"] = "Invalid JSON format."
-            except Exception as e:
-                print(f"Error processing file {json_file.name} in batch_analysis_view: {str(e)}")
-                file_result["error"] = f"Error processing file: {str(e)}"
+                    # Kept server-side under the batch ID; the explore button
+                    # only posts the ID and this result's position.
+                    explore_sources.append((record, item['samples']))
+                    file_result["explore_index"] = len(explore_entries)
+                    explore_entries.append({
+                        "filename": filename,
+                        "prediction": result["prediction"],
+                        "prediction_label": prediction_label,
+                        "confidence": result["confidence"],
+                        "features": [result["features"]],
+                        "summary": item['summary'],
+                    })
             context['results'].append(file_result)
+
+        writer.write()
+        for entry, (record, samples) in zip(explore_entries, explore_sources):
+            if record is not None and record.pk is not None:
+                entry["reference"] = f'h:{record.pk}'
+            else:
+                entry["reference"] = 'p:' + payload_store().put(samples)
+        if explore_entries:
+            context['batch_id'] = save_batch_results(explore_entries)
             
     return render(request, 'classifier/batch_upload.html', context)
 
+def _set_explore_payload(request, reference, summary):
+    """Point the explore page at a stored session.
+
+    Only the reference goes into the Django session: ``p:<key>`` for the
+    payload store, ``h:<id>`` for a ClassificationHistory row of the user.
+    """
+    request.session['explore_payload'] = reference
+    request.session['session_summary'] = summary
+
+def _set_explore_json(request, json_str):
+    """Store a session posted as JSON text for the explore page; False if it does not decode."""
+    try:
+        arrays = session_arrays(json.loads(json_str))
+    except ValueError:
+        request.session.pop('explore_payload', None)
+        request.session.pop('session_summary', None)
+        return False
+    _set_explore_payload(request, 'p:' + payload_store().put(pack_arrays(arrays)), session_summary(arrays))
+    return True
+
 def set_explore_session_api(request):
     if request.method == "POST":
         try:
@@ -227,7 +264,8 @@ def set_explore_session_api(request):
             if not all([features_json_str, raw_json_content_json_str, filename, prediction_label, confidence_str]):
                 return JsonResponse({"error": "Missing data for explore session."}, status=400)
 
-            request.session['uploaded_json_data'] = raw_json_content_json_str 
+            if not _set_explore_json(request, raw_json_content_json_str):
+                return JsonResponse({"error": "Invalid JSON data in request for explore session."}, status=400)
             request.session['classification_data'] = {
                 "prediction": 1 if prediction_label == "Atypical" else 0,
                 "prediction_label": prediction_label,
@@ -246,77 +284,30 @@ def set_explore_session_api(request):
     return JsonResponse({"error": "Invalid request method. Use POST."}, status=405)
 
 def explore_more_view(request):
-    json_data_str_from_session = request.session.get('uploaded_json_data', None) 
+    has_payload = bool(request.session.get('explore_payload'))
     initial_classification_data = request.session.get('classification_data', None)
 
-    pretty_json_data = None
+    summary = request.session.get('session_summary', None)
+    json_error = None
+    if has_payload and summary is None:
+        # Stored rows whose samples could not be summarized at the time.
+        try:
+            arrays = _explore_arrays(request)
+        except (TypeError, ValueError):
+            json_error = "Error: Could not decode the stored session data."
+        else:
+            has_payload = arrays is not None
+            if has_payload:
+                summary = session_summary(arrays)
+                request.session['session_summary'] = summary
     data_stats = None
     axis_stats = {}
-    if json_data_str_from_session:
-        try:
-            data_to_dump = json.loads(json_data_str_from_session)
-            pretty_json_data = json.dumps(data_to_dump, indent=4)
-            from datetime import datetime
-            import numpy as np
-            if isinstance(data_to_dump, list) and data_to_dump:
-                first_dt = None
-                for entry in data_to_dump:
-                    dt = entry.get('dateTime')
-                    if dt:
-                        first_dt = dt
-                        break
-                last_dt = None
-                for entry in reversed(data_to_dump):
-                    dt = entry.get('dateTime')
-                    if dt:
-                        last_dt = dt
-                        break
-                first_dt = first_dt or 'N/A'
-                last_dt = last_dt or 'N/A'
-                try:
-                    start = datetime.fromisoformat(first_dt.rstrip('Z')) if first_dt != 'N/A' else None
-                    end = datetime.fromisoformat(last_dt.rstrip('Z')) if last_dt != 'N/A' else None
-                    duration = end - start
-                except Exception:
-                    duration = None
-                data_stats = {
-                    'first_recorded': first_dt,
-                    'last_recorded': last_dt,
-                    'sample_count': len(data_to_dump),
-                    'duration': str(duration) if duration is not None else 'N/A'
-                }
-                hp_axes = {'x': [], 'y': [], 'z': []}
-                hf_axes = {'x': [], 'y': [], 'z': []}
-                for entry in data_to_dump:
-                    pos = entry.get('HeadPosition', {})
-                    fwd = entry.get('HeadForward', {})
-                    for a in ['x','y','z']:
-                        try:
-                            hp_axes[a].append(float(pos.get(a, 0)))
-                            hf_axes[a].append(float(fwd.get(a, 0)))
-                        except ValueError:
-                            continue
-                for key, axes in [('HeadPosition', hp_axes), ('HeadForward', hf_axes)]:
-                    stats = {}
-                    for a, vals in axes.items():
-                        if vals:
-                            arr = np.array(vals)
-                            stats[a] = {
-                                'mean': float(arr.mean()),
-                                'std': float(arr.std()),
-                                'min': float(arr.min()),
-                                'max': float(arr.max())
-                            }
-                        else:
-                            stats[a] = {'mean': None, 'std': None, 'min': None, 'max': None}
-                    axis_stats[key] = stats
-        except json.JSONDecodeError:
-            pretty_json_data = "Error: Could not decode JSON data from session."
-        except TypeError: 
-             pretty_json_data = "Error: Invalid type for JSON data in session."
+    if summary is not None and summary['sample_count']:
+        data_stats = {key: value for key, value in summary.items() if key != 'axis_stats'}
+        axis_stats = summary['axis_stats']
 
     context = {
-        'json_data': pretty_json_data,
+        'json_error': json_error,
         'prediction_label': None,
         'confidence': None,
         'filename': None, 
@@ -326,8 +317,9 @@ def explore_more_view(request):
         'secondary_classification_error': None,
         'axis_stats': axis_stats
     }
-    if json_data_str_from_session:
-        context['raw_json_list'] = json_data_str_from_session
+    if has_payload and not json_error:
+        context['chart_data_url'] = reverse('explore_chart_data')
+        context['samples_url'] = reverse('explore_samples')
     if data_stats:
         context['data_stats'] = data_stats
 
@@ -341,22 +333,32 @@ def explore_more_view(request):
     if request.method == "POST":
         context['show_secondary_classify_button'] = False 
 
-        if model_extra is None:
-            context['secondary_classification_error'] = "Secondary classification model (model_extra.pkl) is not loaded."
-        elif not initial_classification_data or initial_classification_data.get('prediction_label') != "Atypical":
+        model_extra = registry.predictor('extra')
+        if not initial_classification_data or initial_classification_data.get('prediction_label') != "Atypical":
             context['secondary_classification_error'] = "Secondary classification is only available for 'Atypical' initial results."
+        elif initial_classification_data.get('secondary'):
+            # Already computed by the cascade at upload time.
+            sec_prediction, sec_confidence_percentage = initial_classification_data['secondary']
+            context['secondary_prediction_label'] = "Autism" if sec_prediction == 1 else "Non-autism disability"
+            context['secondary_confidence'] = sec_confidence_percentage
+        elif model_extra is None:
+            context['secondary_classification_error'] = "Secondary classification model (model_extra.pkl) is not loaded."
         else:
             features_list = initial_classification_data.get('features')
             if features_list:
                 try:
+                    extra_feature_set = registry.feature_set('extra')
+                    # Upload results hold the primary model's features; rows
+                    # opened from the history record the set they hold.
+                    stored_set = tuple(initial_classification_data.get('feature_set') or registry.feature_set('standard'))
+                    if extra_feature_set != stored_set:
+                        features_list = [extract(FeatureBlock(_explore_arrays(request)), extra_feature_set).tolist()]
                     features_np = np.array(features_list).reshape(1, -1) 
                     
-                    secondary_prediction = model_extra.predict(features_np)
-                    secondary_prediction_proba = model_extra.predict_proba(features_np)[0]
+                    secondary_prediction, sec_confidences = predict_with_confidence(model_extra, features_np)
                     
                     sec_pred_label = "Autism" if secondary_prediction[0] == 1 else "Non-autism disability"
-                    sec_confidence = secondary_prediction_proba[1] if secondary_prediction[0] == 1 else secondary_prediction_proba[0]
-                    sec_confidence_percentage = round(sec_confidence * 100, 1)
+                    sec_confidence_percentage = sec_confidences[0]
 
                     context['secondary_prediction_label'] = sec_pred_label
                     context['secondary_confidence'] = sec_confidence_percentage
@@ -374,6 +376,108 @@ def explore_more_view(request):
 
     return render(request, 'classifier/explore_more.html', context)
 
+SAMPLES_PAGE_SIZE = 200
+MAX_SAMPLES_PAGE = 1000
+
+def _explore_arrays(request):
+    """SessionArrays of the session on the explore page, or None if there is none.
+
+    Resolves the reference set by _set_explore_payload; payloads evicted
+    from the store, or history rows deleted since, count as none. References
+    name immutable content, so the unpacked arrays are kept per reference
+    (payloads.unpacked_sessions) for the page, chart and sample requests
+    that follow.
+    """
+    reference = request.session.get('explore_payload', None)
+    if not reference:
+        return None
+    kind, _, key = reference.partition(':')
+    if kind == 'p':
+        if not payload_store().touch(key):
+            return None
+        def load():
+            blob = payload_store().get(key)
+            return unpack_session(blob) if blob is not None else None
+        return unpacked_sessions().get(reference, load)
+    if kind == 'h' and key.isdigit() and request.user.is_authenticated:
+        rows = ClassificationHistory.objects.filter(pk=int(key), user=request.user)
+        if not rows.exists():
+            return None
+        def load():
+            record = rows.only('samples', 'raw_json').first()
+            if record is None:
+                return None
+            arrays = record.session_arrays()
+            if arrays is None and record.raw_json:
+                arrays = session_arrays(json.loads(record.raw_json))
+            return arrays
+        return unpacked_sessions().get(reference, load)
+    return None
+
+def explore_chart_data_view(request):
+    """Downsampled series of the session on the explore page, for its charts."""
+    try:
+        width = chart_width(request.GET.get('width'))
+    except ValueError:
+        return JsonResponse({"error": "width must be an integer"}, status=400)
+    try:
+        arrays = _explore_arrays(request)
+    except (json.JSONDecodeError, ValueError):
+        return JsonResponse({"error": "Could not decode JSON data from session."}, status=400)
+    if arrays is None:
+        return JsonResponse({"error": "No session data to chart."}, status=404)
+    return JsonResponse({
+        "count": arrays.count,
+        "width": width,
+        "streams": chart_series(arrays, width),
+    })
+
+def _time_bound(value):
+    if not value:
+        return None
+    bound = parse_timestamps([value])[0]
+    if np.isnat(bound):
+        raise ValueError(value)
+    return bound
+
+def explore_samples_view(request):
+    """One page of the raw samples of the session on the explore page.
+
+    ``offset``/``limit`` select samples by position; ``start``/``end``
+    (ISO dateTimes) first narrow the window to a time range, in which
+    ``offset`` then counts.
+    """
+    try:
+        offset = max(int(request.GET.get('offset') or 0), 0)
+        limit = min(max(int(request.GET.get('limit') or SAMPLES_PAGE_SIZE), 1), MAX_SAMPLES_PAGE)
+    except ValueError:
+        return JsonResponse({"error": "offset and limit must be integers"}, status=400)
+    try:
+        start = _time_bound(request.GET.get('start'))
+        end = _time_bound(request.GET.get('end'))
+    except ValueError:
+        return JsonResponse({"error": "start and end must be ISO dateTimes"}, status=400)
+    try:
+        arrays = _explore_arrays(request)
+    except (json.JSONDecodeError, ValueError):
+        return JsonResponse({"error": "Could not decode JSON data from session."}, status=400)
+    if arrays is None:
+        return JsonResponse({"error": "No session data to show."}, status=404)
+
+    if start is not None or end is not None:
+        window_start, window_stop = arrays.time_range(start, end)
+    else:
+        window_start, window_stop = 0, arrays.count
+    first = min(window_start + offset, window_stop)
+    stop = min(first + limit, window_stop)
+    return JsonResponse({
+        "count": arrays.count,
+        "window": [window_start, window_stop],
+        "first": first,
+        "samples": arrays.to_json_list(first, stop),
+        "next_offset": stop - window_start if stop < window_stop else None,
+    })
+
 def download_script_view(request):
     script_path = os.path.join(settings.BASE_DIR, 'script', 'script.rar')
     if os.path.exists(script_path):
@@ -401,34 +505,45 @@ def logout_view(request):
 
 @require_POST
 def batch_explore_view(request):
-    features_json_str = request.POST.get('features')
-    raw_json_content_json_str = request.POST.get('raw_json_content')
-    filename = request.POST.get('filename')
-    prediction_label = request.POST.get('prediction_label')
-    confidence_str = request.POST.get('confidence')
-
-    if not all([features_json_str, raw_json_content_json_str, filename, prediction_label, confidence_str]):
+    batch_id = request.POST.get('batch_id', '')
+    try:
+        index = int(request.POST.get('index', ''))
+    except ValueError:
+        return redirect('batch_analysis')
+    entries = load_batch_results(batch_id) if batch_id else None
+    if not entries or not 0 <= index < len(entries) or entries[index] is None:
         return redirect('batch_analysis')
 
-    # Store in session
-    request.session['uploaded_json_data'] = raw_json_content_json_str
+    entry = entries[index]
+    _set_explore_payload(request, entry['reference'], entry['summary'])
     request.session['classification_data'] = {
-        "prediction": 1 if prediction_label == "Atypical" else 0,
-        "prediction_label": prediction_label,
-        "confidence": float(confidence_str),
-        "features": json.loads(features_json_str),
-        "filename": filename
+        "prediction": entry["prediction"],
+        "prediction_label": entry["prediction_label"],
+        "confidence": entry["confidence"],
+        "features": entry["features"],
+        "filename": entry["filename"]
     }
     return redirect('explore_more')
 
+def _history_page(queryset, cursor):
+    """keyset_page of history rows with only the listed columns; a bad cursor restarts at the top."""
+    queryset = queryset.only(*HISTORY_LIST_FIELDS)
+    try:
+        return keyset_page(queryset, cursor)
+    except ValueError:
+        return keyset_page(queryset)
+
 @login_required
 def dashboard_view(request):
     """Dashboard listing patient's sessions and recent classifications"""
-    sessions = PatientSession.objects.filter(user=request.user)
-    history = ClassificationHistory.objects.filter(user=request.user) 
+    sessions = PatientSession.objects.filter(user=request.user).select_related('stats')
+    cursor = request.GET.get('cursor')
+    history, next_cursor = _history_page(ClassificationHistory.objects.filter(user=request.user), cursor)
     return render(request, 'classifier/dashboard.html', {
         'sessions': sessions,
-        'history': history
+        'history': history,
+        'cursor': cursor,
+        'next_cursor': next_cursor
     })
 
 @login_required
@@ -447,7 +562,6 @@ def session_create_view(request):
 @login_required
 def session_detail_view(request, session_id):
     session = get_object_or_404(PatientSession, pk=session_id, user=request.user)
-    history = ClassificationHistory.objects.filter(session=session)
     result = None
     error = None
     if request.method == 'POST':
@@ -455,36 +569,44 @@ def session_detail_view(request, session_id):
         if json_file:
             try:
                 data = json.load(json_file)
-                processed = []
-                for entry in data:
-                    try:
-                        pos = entry['HeadPosition']; forw = entry['HeadForward']
-                        processed.append([float(pos['x']), float(pos['y']), float(pos['z'])] +
-                                         [float(forw['x']), float(forw['y']), float(forw['z'])])
-                    except: continue
-                if not processed:
+                arrays = session_arrays(data)
+                block = FeatureBlock(arrays)
+                if not block.count:
                     raise ValueError('No valid data')
-                features = calculate_statistics(np.array(processed)).reshape(1,-1)
-                pred = model.predict(features)[0]
-                label = 'Atypical' if pred==1 else 'Typical'
-                proba = model.predict_proba(features)[0][pred]
-                confidence = round(proba*100,1)
+                model = registry.predictor('standard')
+                if model is None:
+                    raise ValueError('Model not loaded.')
+                feature_set = registry.feature_set('standard')
+                classified = result_cache.lookup(
+                    model_scope('standard'), block.digest(feature_set),
+                    lambda: _classify_block(model, block, feature_set)
+                )
+                label = 'Atypical' if classified['prediction']==1 else 'Typical'
+                confidence = classified['confidence']
                 ClassificationHistory.objects.create(
                     user=request.user,
                     session=session,
                     filename=json_file.name,
                     prediction_label=label,
                     confidence=confidence,
-                    raw_json=json.dumps(data)
+                    samples=pack_arrays(arrays),
+                    features=extract(block).tolist(),
+                    summary=session_summary(arrays),
+                    model_version=registry.version('standard') or ''
                 )
                 result = {'label': label, 'confidence': confidence}
             except Exception as e:
                 error = str(e)
         else:
             error = 'No file uploaded.'
+    cursor = request.GET.get('cursor')
+    history, next_cursor = _history_page(ClassificationHistory.objects.filter(session=session), cursor)
     return render(request, 'classifier/session_detail.html', {
         'session': session,
+        'stats': PatientSessionSummary.objects.filter(session=session).first(),
         'history': history,
+        'cursor': cursor,
+        'next_cursor': next_cursor,
         'result': result,
         'error': error
     })
@@ -499,7 +621,12 @@ def session_delete_view(request, session_id):
 @login_required
 def history_explore_view(request, history_id):
      record = get_object_or_404(ClassificationHistory, pk=history_id, user=request.user)
-     request.session['uploaded_json_data'] = record.raw_json
+     if record.summary is None:
+         # Rows saved before summaries were stored: compute once and keep it.
+         record.summary = record.compute_summary()
+         if record.summary is not None:
+             record.save(update_fields=['summary'])
+     _set_explore_payload(request, f'h:{record.id}', record.summary)
      classification_data = {
          'prediction': 1 if record.prediction_label == 'Atypical' else 0,
          'prediction_label': record.prediction_label,
@@ -508,20 +635,10 @@ def history_explore_view(request, history_id):
      }
      if record.prediction_label == 'Atypical':
          try:
-             data_list = json.loads(record.raw_json)
-             processed_positions = []
-             for entry in data_list:
-                 try:
-                     pos = entry['HeadPosition']; forw = entry['HeadForward']
-                     processed_positions.append([
-                         float(pos['x']), float(pos['y']), float(pos['z']),
-                         float(forw['x']), float(forw['y']), float(forw['z'])
-                     ])
-                 except (KeyError, ValueError):
-                     continue
-             if processed_positions:
-                 features_np = calculate_statistics(np.array(processed_positions)).reshape(1, -1)
-                 classification_data['features'] = features_np.tolist()
+             features_np = record.feature_vector()
+             if features_np is not None:
+                 classification_data['features'] = features_np.reshape(1, -1).tolist()
+                 classification_data['feature_set'] = list(DEFAULT_FEATURE_SET)
          except Exception:
              pass
      request.session['classification_data'] = classification_data
@@ -124,6 +124,108 @@ STATICFILES_DIRS = []  # Add any additional static file directories here
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Classifier models: seconds between checks of the model artifacts for changes.
+# Override CLASSIFIER_MODEL_PATHS = {'standard': ..., 'extra': ...} to load other files.
+CLASSIFIER_MODEL_CHECK_INTERVAL = 2.0
+
+# Score random forests with the flattened NumPy implementation (classifier/forest.py)
+# instead of calling sklearn per request. Results are identical.
+CLASSIFIER_NATIVE_INFERENCE = True
+# Batches of more rows than this go to sklearn, which is faster for large inputs.
+CLASSIFIER_NATIVE_MAX_ROWS = 500
+
+# Coalesce concurrent /api/predict/ and /api/predict-extra/ calls into one
+# predict_proba call of up to MAX_BATCH_SIZE rows, waiting at most MAX_WAIT_MS.
+# Only useful with a threaded server (e.g. gunicorn --threads).
+CLASSIFIER_MICRO_BATCHING = {
+    'ENABLED': False,
+    'MAX_BATCH_SIZE': 32,
+    'MAX_WAIT_MS': 5,
+}
+
+# Training data of `manage.py train_models`: for each model, the directory of
+# label 0 sessions and the directory of label 1 sessions, relative to BASE_DIR.
+# Models without an entry are skipped.
+CLASSIFIER_TRAINING_DATA = {
+    'standard': ('classifier_data/FullData/tipici', 'classifier_data/FullData/atipici'),
+    # 'extra': ('<non-autism sessions>', '<autism sessions>'),
+}
+
+# Feature extractors (classifier/features.py) each model is trained on by
+# `manage.py train_models`. Trained models record their set, and serving
+# computes only those features; models without an entry use head_moments.
+CLASSIFIER_FEATURE_SETS = {
+    'standard': ('head_moments',),
+    # 'extra': ('head_moments', 'head_velocity', 'angular_speed', 'hand_head_distance'),
+}
+
+# Pool used by the /api/async/ endpoints for parsing and scoring when served
+# over ASGI. KIND is 'thread' or 'process'; processes sidestep the GIL for JSON
+# parsing but each loads its own copy of the models.
+CLASSIFIER_ASYNC_EXECUTOR = {
+    'KIND': 'thread',
+    'MAX_WORKERS': 4,
+}
+
+# Worker processes that parse uploads on the batch analysis page
+# (None = one per CPU, 1 = parse in the request process).
+CLASSIFIER_BATCH_WORKERS = None
+
+# Live classification of sessions still being recorded (/api/live/). A new
+# estimate is emitted every EMIT_EVERY samples or EMIT_INTERVAL seconds. CACHE
+# names the CACHES entry holding stream state; use a shared backend (Redis,
+# Memcached, database) when running more than one worker process.
+CLASSIFIER_LIVE_STREAMS = {
+    'CACHE': 'default',
+    'EMIT_EVERY': 500,
+    'EMIT_INTERVAL': 5.0,
+    'TIMEOUT': 3600,
+}
+
+# Features and predictions of already seen sessions, keyed by a hash of the
+# parsed samples and the model versions. SHARED_CACHE names an entry of CACHES
+# to share results between worker processes (None keeps them per process).
+CLASSIFIER_RESULT_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 1024,
+    'SHARED_CACHE': None,
+    'TIMEOUT': 3600,
+}
+
+# Sessions opened on the explore page are kept here (packed, relative to
+# BASE_DIR) instead of in the Django session, which only holds a reference.
+# Payloads not used for TTL seconds are removed; `manage.py evict_payloads`
+# does the same from cron. Each process keeps up to UNPACKED_BYTES of
+# recently explored sessions unpacked, so paging through them does not
+# decompress the whole session again for every page.
+CLASSIFIER_PAYLOAD_STORE = {
+    'DIRECTORY': 'classifier_data/payloads',
+    'TTL': 24 * 60 * 60,
+    'UNPACKED_BYTES': 64 * 1024 * 1024,
+}
+
+# Classification history rows per page on the dashboard and session pages.
+CLASSIFIER_HISTORY_PAGE_SIZE = 50
+
+# Rows per INSERT when the batch analysis page writes its history rows; all
+# rows of one batch are written in a single transaction.
+CLASSIFIER_HISTORY_BULK_CHUNK_SIZE = 200
+
+# Patient session summaries (classifier/patient_stats.py): the feature average
+# shown on the session page covers the FEATURE_WINDOW latest classifications.
+CLASSIFIER_SESSION_SUMMARIES = {
+    'FEATURE_WINDOW': 20,
+}
+
+# Movement analysis on the advanced classification page. Sessions are
+# resampled at their own rate, at most MAX_RATE Hz; results are kept in the
+# CACHE entry of CACHES for TIMEOUT seconds.
+CLASSIFIER_ANALYSIS = {
+    'CACHE': 'default',
+    'TIMEOUT': 24 * 60 * 60,
+    'MAX_RATE': 120.0,
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 